@@ -7,5 +7,91 @@ class Config:
     "let's budget",
     "money talk"]
 
+    # Storage
+    DATABASE_PATH = 'data/user_finance.db'
+    DB_CACHED_STATEMENTS = 256
+    WRITE_BATCH_SIZE = 500
+    WRITE_FLUSH_INTERVAL = 0.25  # seconds a buffered transaction may wait before commit
+    IMPORT_CHUNK_SIZE = 5000
+    IMPORT_COMMIT_ROWS = 100000
+    CLASSIFIER_CACHE_SIZE = 4096  # descriptions whose category is remembered in memory
+
+    # Analytics
+    ANALYTICS_ANOMALY_Z = 2.0
+    ANALYTICS_HISTORY_MONTHS = 12
+    ANALYTICS_MIN_SHARE = 0.1  # below this share of a usual month spent by today, add the usual rest instead
+    # Reports aggregate from a memory-mapped columnar copy of the ledger (<database>.snapshot/)
+    LEDGER_SNAPSHOT = True
+    SNAPSHOT_CHUNK_ROWS = 100000
+
+    # Reports
+    REPORTS_DIR = 'data/reports'
+    EXPORT_CHUNK_ROWS = 10000
+
+    # Charts
+    CHART_CACHE_DIR = 'data/charts'
+    CHART_CACHE_SIZE = 32
+
+    # Chart/report jobs run on a process pool so the conversation keeps going
+    BACKGROUND_REPORTS = True
+    REPORT_WORKERS = 2
+    MAX_PENDING_REPORT_JOBS = 4  # per ledger, so one user's reports never hold up another's
+    # Batch PDFs are written inline below this many: a PDF takes well under 1 ms, while
+    # starting a spawn pool costs ~250 ms
+    REPORT_POOL_MIN_REPORTS = 2000
+
+    # Speech recognition
+    VOSK_MODEL_PATH = "vosk-model-small-en-us-0.15"
+    VOSK_MODEL_URL = "https://alphacephei.com/vosk/models/vosk-model-small-en-us-0.15.zip"
+    SAMPLE_RATE = 16000
+    BLOCK_SIZE = 1600  # 100 ms blocks so silence is noticed quickly
+    # Decode against a phrase list built from the command vocabulary (asr_grammar.py);
+    # utterances below the confidence floor are re-decoded with the open vocabulary
+    ASR_GRAMMAR = False
+    ASR_GRAMMAR_MIN_CONFIDENCE = 0.7
+
+    # Endpointing: end the utterance on trailing silence instead of Vosk's own timeout
+    ENDPOINTING = True
+    ENDPOINT_SILENCE_MS = 500
+    SPEECH_START_MS = 100
+    VAD_MIN_RMS = 300.0
+    VAD_NOISE_RATIO = 3.0
+    PARTIAL_STABLE_BLOCKS = 3  # identical partial hypotheses before routing starts speculatively
+    PRELOAD_ASR_MODEL = True
+    SHOW_LISTEN_LATENCY = True
+
+    # Speech output
+    BARGE_IN = True
+    # Talking over playback only interrupts it when this much louder than the echo, for this many blocks
+    BARGE_IN_ENERGY_RATIO = 2.5
+    BARGE_IN_BLOCKS = 3
+    TTS_TIMING = False
+    # Fixed and repeated responses are rendered to WAV once and played back directly
+    TTS_CACHE = True
+    TTS_CACHE_DIR = 'data/speech'
+    TTS_CACHE_SIZE = 64
+    TTS_CACHE_MIN_USES = 2  # times a response is synthesized before it is cached
+
+    # Latency tracing ('debug stats' voice command)
+    TRACING = False
+    TRACE_BUFFER_SIZE = 5000
+    TRACE_EXPORT_PATH = 'data/traces.jsonl'
+
+    # Start-up
+    WARM_UP_IN_BACKGROUND = True
+    WARM_UP_MODULES = ['pandas', 'matplotlib.pyplot', 'fpdf']
+    STARTUP_PROFILE = False
+
+    # Multi-user service (service.py): one ledger per user under SERVICE_DATA_DIR
+    SERVICE_HOST = '127.0.0.1'
+    SERVICE_PORT = 8765
+    SERVICE_DATA_DIR = 'data/users'
+    SERVICE_MAX_OPEN_USERS = 64  # ledgers kept open; least recently used are closed
+    SERVICE_DB_WORKERS = 8
+    SERVICE_ASR_WORKERS = 2
+    SERVICE_MAX_QUEUED = 256  # commands in flight before new ones get 503
+    SERVICE_MAX_PENDING_REPORT_JOBS = 64  # across all users; each ledger still gets MAX_PENDING_REPORT_JOBS
+    SERVICE_MAX_BODY_BYTES = 10 * 1024 * 1024
+
 
 app_config = Config()
\ No newline at end of file
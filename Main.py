@@ -1,35 +1,144 @@
 # main.py - Main application
-from voice_engine import VoiceEngine
-from finance_logic import FinanceLogic
+import sys
+import threading
+import time
+
+_process_start = time.perf_counter()
+
+from startup_profile import StartupProfile
 from Config import app_config
+from tracing import tracer
+
+GREETING = "Hello! I'm your AI Finance Coach. Let's chat about your finances!"
+GOODBYE = "Goodbye! Keep tracking your financial goals!"
 
 
 class FinanceCoach:
-    def __init__(self):
+    def __init__(self, profile=None):
         print("🚀 Starting AI Finance Coach...")
-        self.voice_engine = VoiceEngine()
-        self.finance_logic = FinanceLogic()
-        print("✅ All systems ready!")
+        self.profile = profile or StartupProfile(_process_start, enabled=False)
+        with self.profile.stage("init VoiceEngine"):
+            VoiceEngine = self.profile.timed_import('voice_engine').VoiceEngine
+            self.voice_engine = VoiceEngine()
+
+        # Everything below the greeting warms up on its own thread
+        self.finance_logic = None
+        self._ready = threading.Event()
+        self._warm_up_error = None
+        if app_config.WARM_UP_IN_BACKGROUND:
+            self._warm_up_thread = threading.Thread(target=self._warm_up, name="warm-up", daemon=True)
+            self._warm_up_thread.start()
+        else:
+            self._warm_up_thread = None
+            self._warm_up()
+
+    def _warm_up(self):
+        """Build the finance logic, load the speech model and pre-import chart/report libraries"""
+        try:
+            with self.profile.stage("init FinanceLogic"):
+                finance_logic = self.profile.timed_import('finance_logic')
+                self.finance_logic = finance_logic.FinanceLogic()
+                self.finance_logic.announce = self.voice_engine.speak
+                self.voice_engine.on_stable_partial = self.finance_logic.prepare
+            self.voice_engine.warm_speech_cache([GREETING, GOODBYE] + finance_logic.FIXED_RESPONSES)
+            self._ready.set()
+            print("✅ All systems ready!")
+
+            if app_config.PRELOAD_ASR_MODEL:
+                try:
+                    with self.profile.stage("load speech model"):
+                        self.voice_engine.preload_model(background=False)
+                except Exception as e:
+                    print(f"❌ Could not preload speech model: {e}")
+
+            try:
+                with self.profile.stage("load analytics"):
+                    self.finance_logic.analytics.refresh()
+            except ImportError as e:
+                print(f"⚠️ Analytics unavailable: {e}")
+
+            for module_name in app_config.WARM_UP_MODULES:
+                try:
+                    self.profile.timed_import(module_name)
+                except ImportError as e:
+                    print(f"⚠️ Could not warm up {module_name}: {e}")
+        except Exception as e:
+            self._warm_up_error = e
+            print(f"❌ Start-up failed: {e}")
+        finally:
+            self._ready.set()
+
+    def wait_until_ready(self):
+        """Block until FinanceLogic exists; the rest of the warm-up may still be running"""
+        self._ready.wait()
+        if self.finance_logic is None:
+            raise RuntimeError(f"Finance logic unavailable: {self._warm_up_error}")
 
     def process_command(self, command):
+        self.wait_until_ready()
         return self.finance_logic.process_command(command)
 
     def run(self):
-        self.voice_engine.speak("Hello! I'm your AI Finance Coach. Let's chat about your finances!")
+        self.voice_engine.speak(GREETING)
+        self.profile.mark("greeting queued")
+
+        try:
+            while True:
+                tracer.begin_turn()
+                with tracer.span('listen'):
+                    command = self.voice_engine.listen()
+
+                if command in ['stop', 'exit', 'quit']:
+                    break
 
-        while True:
-            command = self.voice_engine.listen()
+                with tracer.span('execute'):
+                    response = self.process_command(command)
+                self.voice_engine.speak(response)
+                self.voice_engine.record_response()
+                print()  # Empty line for readability
 
-            if command in ['stop', 'exit', 'quit']:
-                break
+            self.voice_engine.speak(GOODBYE)
+            self.voice_engine.wait_until_done()
+        finally:
+            stats = self.voice_engine.get_latency_stats()
+            if stats and app_config.SHOW_LISTEN_LATENCY:
+                print(f"⏱️ Listen latency: {stats}")
+            response_stats = self.voice_engine.get_response_latency_stats()
+            if response_stats and app_config.SHOW_LISTEN_LATENCY:
+                print(f"⏱️ End of speech to response: {response_stats}")
+            tts_stats = self.voice_engine.get_tts_stats()
+            if tts_stats and app_config.TTS_TIMING:
+                print(f"⏱️ Speech output: {tts_stats}")
+            if tracer.enabled and tracer.spans:
+                count = tracer.export_jsonl(app_config.TRACE_EXPORT_PATH)
+                print(f"⏱️ {count} trace spans written to {app_config.TRACE_EXPORT_PATH}")
+            self.close()
 
-            response = self.process_command(command)
-            self.voice_engine.speak(response)
-            print()  # Empty line for readability
+    def profile_startup(self):
+        """Speak the greeting, wait for every warm-up stage and print the timing breakdown"""
+        self.voice_engine.speak(GREETING)
+        self.profile.mark("greeting queued")
+        self.voice_engine.wait_until_done()
+        if self.voice_engine.first_audio_at is not None:
+            self.profile.mark("first audio", self.voice_engine.first_audio_at)
+        if self._warm_up_thread is not None:
+            self._warm_up_thread.join()
+        self.profile.report()
+        self.close()
 
-        self.voice_engine.speak("Goodbye! Keep tracking your financial goals!")
+    def close(self):
+        self.voice_engine.close()
+        if self._warm_up_thread is not None:
+            self._warm_up_thread.join(timeout=5)
+        if self.finance_logic is not None:
+            self.finance_logic.close()
 
 
 if __name__ == "__main__":
-    coach = FinanceCoach()
-    coach.run()
+    # python Main.py --profile-startup prints an import/init breakdown instead of chatting
+    profiling = '--profile-startup' in sys.argv[1:] or app_config.STARTUP_PROFILE
+    coach = FinanceCoach(StartupProfile(_process_start, enabled=profiling))
+    if profiling:
+        coach.profile_startup()
+    else:
+        coach.run()
@@ -0,0 +1,51 @@
+# test_amount_parser.py - Spoken and written amounts parse to the values people mean
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from amount_parser import parse_amount
+
+CASES = [
+    # Plain numbers, dollars and cents
+    ("i spent two hundred forty five dollars and fifty cents on groceries", 245.5),
+    ("i paid $1,250.75 for rent", 1250.75),
+    ("i earned five thousand three hundred", 5300.0),
+    ("fifty cents", 0.5),
+    ("i spent 20 dollars on 2 movies", 20.0),
+    ("i saved one point five thousand dollars", 1500.0),
+    ("one hundred and five", 105.0),
+    ("a hundred dollars", 100.0),
+    ("two thousand nineteen", 2019.0),
+    # Digit pairs
+    ("nineteen ninety nine", 1999.0),
+    ("twenty twenty four", 2024.0),
+    ("nineteen oh five", 1905.0),
+    # Prices: a lone digit and a pair is dollars and cents unless a currency word says otherwise
+    ("three fifty", 3.5),
+    ("four ninety nine", 4.99),
+    ("nine ninety-nine", 9.99),
+    ("five twenty", 5.2),
+    ("seven oh five", 7.05),
+    ("i spent three fifty on coffee at bluebird diner", 3.5),
+    ("three fifty dollars", 350.0),
+    # "<n> dollars <m>"
+    ("five dollars fifty", 5.5),
+    ("nine dollars ninety nine", 9.99),
+    ("forty dollars 5 minutes ago", 40.0),
+    ("ten dollars and five dollars", 10.0),
+]
+
+
+class TestParseAmount(unittest.TestCase):
+    def test_phrases(self):
+        for phrase, expected in CASES:
+            with self.subTest(phrase=phrase):
+                self.assertEqual(parse_amount(phrase), expected)
+
+    def test_no_amount(self):
+        self.assertIsNone(parse_amount("what's my balance"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+# test_category_classifier.py - Merchant keys and learning from category corrections
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from category_classifier import CategoryClassifier, merchant_key
+
+CASES = [
+    # The name after "at"/"from"
+    ("i spent three fifty on coffee at bluebird diner", "bluebird diner"),
+    ("i spent 10 at bluebird diner", "bluebird diner"),
+    ("paid twenty dollars at the ziggy hardware for nails", "ziggy hardware"),
+    ("ACH PAYMENT FROM ACME CORP 0412", "acme corp"),
+    # Bank statement descriptions
+    ("POS WALGREENS #1234 SAN JOSE CA", "walgreens"),
+    ("ZIGGY HARDWARE 12", "ziggy hardware"),
+    ("WALGREENS SAN JOSE", "walgreens"),
+]
+
+
+class TestMerchantKey(unittest.TestCase):
+    def test_descriptions(self):
+        for text, expected in CASES:
+            with self.subTest(text=text):
+                self.assertEqual(merchant_key(text), expected)
+
+    def test_keywords_are_skipped(self):
+        classifier = CategoryClassifier()
+        self.assertEqual(merchant_key("coffee bluebird diner 3.50", classifier.builtin), "bluebird diner")
+
+
+class TestLearning(unittest.TestCase):
+    def test_correction_teaches_the_merchant(self):
+        classifier = CategoryClassifier()
+        self.assertEqual(classifier.classify("i spent 10 at bluebird diner"), 'other')
+        self.assertEqual(classifier.learn("i spent three fifty on coffee at bluebird diner", 'groceries'),
+                         "bluebird diner")
+        self.assertEqual(classifier.classify("i spent 10 at bluebird diner"), 'groceries')
+
+    def test_keywords_alone_teach_nothing(self):
+        classifier = CategoryClassifier()
+        self.assertIsNone(classifier.learn("i spent 12 on pizza", 'entertainment'))
+        self.assertEqual(classifier.classify("pizza"), 'groceries')
+
+
+if __name__ == "__main__":
+    unittest.main()
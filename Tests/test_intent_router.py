@@ -0,0 +1,40 @@
+# test_intent_router.py - Utterances route to the intent the user meant
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from intent_router import default_router
+
+CASES = [
+    ("what's my balance", 'balance'),
+    ("i spent 50 dollars on groceries", 'add_expense'),
+    ("i earned 2000 dollars", 'add_income'),
+    ("show me a spending chart", 'visualization'),
+    ("export to excel", 'reporting'),
+    # Job control only at the start of an utterance, after fillers like "please"
+    ("cancel the report", 'cancel_job'),
+    ("please cancel", 'cancel_job'),
+    ("is my report ready", 'job_status'),
+    ("what's the job status", 'job_status'),
+    ("i paid 30 dollars to cancel my gym membership", 'add_expense'),
+    ("i spent 40 dollars on a gift, is it ready to wrap", 'add_expense'),
+    # Corrections likewise
+    ("that was medical", 'correct_category'),
+    ("ok that was medical", 'correct_category'),
+    ("i spent 20 on coffee that was great", 'add_expense'),
+]
+
+
+class TestRoute(unittest.TestCase):
+    def test_intents(self):
+        for utterance, intent in CASES:
+            with self.subTest(utterance=utterance):
+                self.assertEqual(default_router.route(utterance).intent, intent)
+
+    def test_slots(self):
+        self.assertEqual(default_router.route("i spent 20 dollars on groceries").slots, {'category': 'groceries'})
+
+
+if __name__ == "__main__":
+    unittest.main()
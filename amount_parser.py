@@ -0,0 +1,205 @@
+# amount_parser.py - Spoken and written money amounts ("two hundred forty five dollars and fifty cents")
+import re
+
+UNITS = {
+    'zero': 0, 'oh': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11,
+    'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16,
+    'seventeen': 17, 'eighteen': 18, 'nineteen': 19,
+}
+TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fourty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90,
+}
+MAGNITUDES = {'thousand': 1_000, 'grand': 1_000, 'million': 1_000_000, 'billion': 1_000_000_000}
+HUNDRED = 'hundred'
+
+DOLLAR_WORDS = frozenset(['dollar', 'dollars', 'buck', 'bucks', 'usd'])
+CENT_WORDS = frozenset(['cent', 'cents'])
+NUMBER_WORDS = frozenset(UNITS) | frozenset(TENS) | frozenset(MAGNITUDES) | {HUNDRED}
+
+TOKEN_PATTERN = re.compile(r"\$?\d[\d,]*(?:\.\d+)?k?\$?|[a-z]+")
+DIGITS_PATTERN = re.compile(r"^\$?(\d[\d,]*(?:\.\d+)?)(k?)(\$?)$")
+
+
+def _digit_value(token):
+    """Value of a digit token like '$1,250.75' or '5k', or None"""
+    match = DIGITS_PATTERN.match(token)
+    if not match:
+        return None
+    digits, kilo, _ = match.groups()
+    digits = digits.replace(',', '')
+    if digits.endswith('.') or not digits:
+        return None
+    value = float(digits)
+    return value * 1000 if kilo else value
+
+
+def _is_number_start(tokens, i):
+    token = tokens[i]
+    if token[0] == '$' or token[0].isdigit():
+        return _digit_value(token) is not None
+    if token in UNITS or token in TENS:
+        return True
+    # "a hundred dollars", "a thousand"
+    return token == 'a' and i + 1 < len(tokens) and (tokens[i + 1] == HUNDRED or tokens[i + 1] in MAGNITUDES)
+
+
+def _parse_decimal(tokens, i):
+    """Digits after 'point': 'point five' -> 0.5, 'point two five' -> 0.25"""
+    digits = ''
+    while i < len(tokens):
+        token = tokens[i]
+        if token in UNITS and UNITS[token] < 10:
+            digits += str(UNITS[token])
+        elif token in TENS:
+            digits += str(TENS[token])
+        elif token.isdigit():
+            digits += token
+        else:
+            break
+        i += 1
+    return (float('0.' + digits) if digits else 0.0), i
+
+
+def _parse_number(tokens, i):
+    """Parse one number expression starting at tokens[i]; returns (value, next_index, price_like)
+
+    Numbers are read in digit groups the way years and prices are spoken: a teen/tens word
+    after a finished group, or after a lone leading digit, starts a new pair, and "oh" pads
+    one: "nineteen ninety nine" -> 1999, "four ninety nine" -> 499, "seven oh five" -> 705.
+    price_like is True for a lone digit followed by one pair, which is usually dollars and
+    cents ("three fifty"); the caller decides how to read it.
+    """
+    total = 0.0
+    current = 0.0
+    group = 0  # the spoken two-digit group being built, since the last hundred/magnitude
+    lead = None  # value of a lone leading digit word ("three" in "three fifty")
+    price_like = False
+    seen = False
+    n = len(tokens)
+
+    while i < n:
+        token = tokens[i]
+        digit_value = _digit_value(token) if (token[0] == '$' or token[0].isdigit()) else None
+
+        if digit_value is not None:
+            if seen and current:
+                break  # "50 20" - a second, separate number
+            current += digit_value
+            group, lead, price_like = 0, None, False
+        elif token in TENS or (token in UNITS and UNITS[token] >= 10):
+            value = TENS.get(token) or UNITS[token]
+            if group >= 10 or current == lead:
+                price_like = current == lead and not total
+                current = current * 100 + value
+                group, lead = value, None
+            else:
+                current += value
+                group += value
+        elif token == 'oh' and (group >= 10 or current == lead) and i + 1 < n \
+                and 1 <= UNITS.get(tokens[i + 1], 0) <= 9:
+            # "nineteen oh five", "seven oh five"
+            price_like = current == lead and not total
+            current = current * 100 + UNITS[tokens[i + 1]]
+            group, lead = 10, None  # a finished group
+            i += 1
+        elif token in UNITS:
+            if not seen and UNITS[token]:
+                lead = UNITS[token]
+            current += UNITS[token]
+            group += UNITS[token]
+        elif token == HUNDRED:
+            current = (current or 1) * 100
+            group, lead, price_like = 0, None, False
+        elif token in MAGNITUDES:
+            total += (current or 1) * MAGNITUDES[token]
+            current = 0.0
+            group, lead, price_like = 0, None, False
+        elif token == 'a' and not seen and i + 1 < n and (tokens[i + 1] == HUNDRED or tokens[i + 1] in MAGNITUDES):
+            pass
+        elif token == 'and' and seen and i + 1 < n and tokens[i + 1] in NUMBER_WORDS \
+                and not _ends_in_cents(tokens, i + 1):
+            pass  # "one hundred and five"
+        elif token == 'point' and seen and i + 1 < n:
+            price_like = False
+            fraction, i = _parse_decimal(tokens, i + 1)
+            current += fraction
+            if i < n and tokens[i] in MAGNITUDES:
+                # "one point five million"
+                total += current * MAGNITUDES[tokens[i]]
+                current = 0.0
+                i += 1
+            break
+        else:
+            break
+        seen = True
+        i += 1
+
+    return total + current, i, price_like
+
+
+def _ends_in_cents(tokens, i):
+    """True when the number expression starting at i is followed by 'cents'"""
+    while i < len(tokens) and (tokens[i] in NUMBER_WORDS or tokens[i] == 'and'):
+        i += 1
+    return i < len(tokens) and tokens[i] in CENT_WORDS
+
+
+def _parse_candidate(tokens, i):
+    """Parse '<number> [dollars] [[and] <number> [cents]]' at i; returns (amount, has_currency, next_index)
+
+    A price-like number with no currency word is dollars and cents ("three fifty" -> 3.50);
+    with one, the words say what it counts ("three fifty dollars" -> 350, "... cents" -> 3.50).
+    """
+    has_currency = tokens[i][0] == '$' or tokens[i].endswith('$')
+    value, i, price_like = _parse_number(tokens, i)
+
+    if i < len(tokens) and tokens[i] in CENT_WORDS:
+        return value / 100, True, i + 1
+
+    said_dollars = i < len(tokens) and tokens[i] in DOLLAR_WORDS
+    if said_dollars:
+        has_currency = True
+        i += 1
+
+    # "... dollars and fifty cents" / "... dollars fifty cents" / "... dollars fifty"
+    j = i + 1 if i < len(tokens) and tokens[i] == 'and' else i
+    if j < len(tokens) and _is_number_start(tokens, j):
+        cents, k, _ = _parse_number(tokens, j)
+        if k < len(tokens) and tokens[k] in CENT_WORDS:
+            return value + cents / 100, True, k + 1
+        # A bare spoken 10-99 after "dollars" is the cents ("five dollars fifty"); single words
+        # and digits are left alone ("forty dollars 5 minutes ago", "ten dollars and five dollars")
+        if said_dollars and tokens[j] in NUMBER_WORDS and 10 <= cents < 100 and cents == int(cents) \
+                and not (k < len(tokens) and tokens[k] in DOLLAR_WORDS):
+            return value + cents / 100, True, k
+
+    if price_like and not said_dollars:
+        return value / 100, True, i
+    return value, has_currency, i
+
+
+def extract_amounts(text):
+    """All (amount, has_currency) pairs found in the text, in order"""
+    tokens = TOKEN_PATTERN.findall(text.lower().replace('-', ' '))
+    amounts = []
+    i = 0
+    while i < len(tokens):
+        if _is_number_start(tokens, i):
+            amount, has_currency, i = _parse_candidate(tokens, i)
+            amounts.append((round(amount, 2), has_currency))
+        else:
+            i += 1
+    return amounts
+
+
+def parse_amount(text):
+    """Best money amount in the text: the first one with a currency marker, else the first number"""
+    amounts = extract_amounts(text)
+    if not amounts:
+        return None
+    for amount, has_currency in amounts:
+        if has_currency:
+            return amount
+    return amounts[0][0]
@@ -0,0 +1,325 @@
+# analytics.py - Vectorized spending analytics over a per-category daily matrix of the ledger
+import calendar
+import math
+import threading
+from datetime import date
+
+import numpy as np
+
+from Config import app_config
+
+# Expense totals per (category, day), read through idx_transactions_type_category
+DAILY_TOTALS_SQL = '''
+SELECT COALESCE(category, 'other'), date, SUM(amount) FROM transactions
+WHERE type = 'expense' AND id <= ?
+GROUP BY 1, 2
+'''
+
+NEW_ROWS_SQL = '''
+SELECT id, COALESCE(category, 'other'), date, amount FROM transactions
+WHERE id > ? AND +type = 'expense'  -- unary + keeps the planner on the rowid range
+'''
+
+# Kept exact by triggers; the matrix must agree with it month by month
+MONTH_TOTALS_SQL = "SELECT category, month, total FROM category_month_totals WHERE type = 'expense' AND count > 0"
+
+
+def _days(dates):
+    """ISO 'YYYY-MM-DD' strings -> int64 day numbers (days since 1970-01-01)"""
+    return np.array([d[:10] for d in dates], dtype='datetime64[D]').astype(np.int64)
+
+
+def _day_number(day):
+    return int(np.datetime64(day, 'D').astype(np.int64))
+
+
+def rolling_average(values, window):
+    """Trailing mean over `window` points; the first window-1 entries are NaN"""
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    if window <= 0 or len(values) < window:
+        return out
+    sums = np.cumsum(np.insert(values, 0, 0.0))
+    out[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+class LedgerAnalytics:
+    """Expense totals held as a (category x day) matrix, loaded once and topped up with new rows.
+
+    After topping up, the matrix's (category, month) sums are checked against
+    category_month_totals; if they disagree a row was edited, deleted or re-categorized and
+    the matrix is reloaded.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.categories = []
+        self._codes = {}
+        self.first_day = None
+        self.daily = np.zeros((0, 0))
+        self.last_id = 0
+        self.loaded = False
+        self._seen = None  # (connection, data_version, total_changes) at the last check
+        self._lock = threading.Lock()
+
+    # --- loading -------------------------------------------------------------------------
+
+    def refresh(self):
+        """Bring the matrix up to date: append rows added since the last call, reload on any other change"""
+        with self._lock:
+            conn = self.db.conn
+            # Nothing committed by anyone since the last check: skip the queries
+            seen = (conn, conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+            if self.loaded and seen == self._seen:
+                return
+            self._seen = seen
+            # One read transaction, so new rows and the monthly totals come from the same state
+            began = not conn.in_transaction
+            if began:
+                conn.execute('BEGIN')
+            try:
+                max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+                if not self.loaded or max_id < self.last_id:
+                    self._reload(conn, max_id)
+                    return
+                if max_id > self.last_id:
+                    self._append_new_rows(conn)
+                if not self._consistent(conn):
+                    self._reload(conn, max_id)
+            finally:
+                if began:
+                    conn.rollback()
+
+    def _reload(self, conn, max_id):
+        rows = conn.execute(DAILY_TOTALS_SQL, (max_id,)).fetchall()
+        self.categories, self._codes = [], {}
+        self.first_day, self.daily = None, np.zeros((0, 0))
+        self._add(rows)
+        self.last_id = max_id
+        self.loaded = True
+
+    def _append_new_rows(self, conn):
+        rows = conn.execute(NEW_ROWS_SQL, (self.last_id,)).fetchall()
+        if not rows:
+            return
+        self.last_id = max(row[0] for row in rows)
+        self._add([row[1:] for row in rows])
+
+    def _consistent(self, conn):
+        """True when every (category, month) sum in the matrix matches category_month_totals"""
+        expected = conn.execute(MONTH_TOTALS_SQL).fetchall()
+        if self.first_day is None or not self.categories:
+            return not expected
+        months, matrix = self._monthly_matrix()
+        columns = {str(month): i for i, month in enumerate(months)}
+        covered = np.zeros(matrix.shape, dtype=bool)
+        for category, month, total in expected:
+            code, column = self._codes.get(category), columns.get(month)
+            if code is None or column is None:
+                if not math.isclose(total, 0.0, abs_tol=0.005):
+                    return False
+                continue
+            # Both sides are float sums in different orders; allow for rounding on large ledgers
+            if not math.isclose(matrix[code, column], total, rel_tol=1e-9, abs_tol=0.005):
+                return False
+            covered[code, column] = True
+        # ... and nothing in the matrix that SQLite no longer has
+        return not np.any((np.abs(matrix) > 0.005) & ~covered)
+
+    def _add(self, rows):
+        """Fold (category, date, amount) rows into the matrix, growing it as needed"""
+        rows = [row for row in rows if row[1] and row[2] is not None]
+        if not rows:
+            return
+        categories, dates, amounts = zip(*rows)
+        codes = np.fromiter((self._code(category) for category in categories), dtype=np.int64, count=len(rows))
+        days = _days(dates)
+        self._grow(days.min(), days.max())
+        np.add.at(self.daily, (codes, days - self.first_day), np.asarray(amounts, dtype=float))
+
+    def _code(self, category):
+        code = self._codes.get(category)
+        if code is None:
+            code = self._codes[category] = len(self.categories)
+            self.categories.append(category)
+        return code
+
+    def _grow(self, low_day, high_day):
+        rows = len(self.categories)
+        if self.first_day is None:
+            self.first_day = int(low_day)
+            self.daily = np.zeros((rows, int(high_day - low_day) + 1))
+            return
+        before = max(0, self.first_day - int(low_day))
+        after = max(0, int(high_day) - (self.first_day + self.daily.shape[1] - 1))
+        if before or after or rows > self.daily.shape[0]:
+            self.daily = np.pad(self.daily, ((0, rows - self.daily.shape[0]), (before, after)))
+            self.first_day -= before
+
+    # --- series --------------------------------------------------------------------------
+
+    def _rows(self, category):
+        if category is None:
+            return self.daily.sum(axis=0)
+        code = self._codes.get(category)
+        return self.daily[code] if code is not None else np.zeros(self.daily.shape[1])
+
+    def _dates(self):
+        return (self.first_day + np.arange(self.daily.shape[1])).astype('datetime64[D]')
+
+    def daily_series(self, category=None):
+        """(dates, totals) per day from the first to the last expense; category=None sums all"""
+        self.refresh()
+        if self.first_day is None:
+            return np.array([], dtype='datetime64[D]'), np.array([])
+        return self._dates(), self._rows(category)
+
+    def _monthly_matrix(self):
+        """(months, category x month totals)"""
+        months = self._dates().astype('datetime64[M]')
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        return months[starts], np.add.reduceat(self.daily, starts, axis=1)
+
+    def monthly_series(self, category=None):
+        """(months, totals) per calendar month; category=None sums all"""
+        self.refresh()
+        if self.first_day is None or not self.categories:
+            return np.array([], dtype='datetime64[M]'), np.array([])
+        months, matrix = self._monthly_matrix()
+        if category is None:
+            return months, matrix.sum(axis=0)
+        code = self._codes.get(category)
+        return months, matrix[code] if code is not None else np.zeros(len(months))
+
+    def rolling_daily_average(self, window=7, category=None):
+        dates, totals = self.daily_series(category)
+        return dates, rolling_average(totals, window)
+
+    def month_over_month(self, category=None):
+        """(months, change in $, change as a fraction of the previous month) for each month after the first"""
+        months, totals = self.monthly_series(category)
+        if len(totals) < 2:
+            return months[1:], np.array([]), np.array([])
+        delta = np.diff(totals)
+        previous = totals[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.where(previous > 0, delta / previous, np.nan)
+        return months[1:], delta, pct
+
+    # --- forecasts and anomalies ---------------------------------------------------------
+
+    def month_to_date(self, today=None):
+        """{category: spent so far this month} for every known category"""
+        self.refresh()
+        today = today or date.today()
+        spent = self._month_to_date_matrix(today)
+        return dict(zip(self.categories, spent.tolist()))
+
+    def _month_to_date_matrix(self, today):
+        if self.first_day is None:
+            return np.zeros(len(self.categories))
+        start = _day_number(today.replace(day=1)) - self.first_day
+        end = _day_number(today) - self.first_day + 1
+        start, end = max(start, 0), min(end, self.daily.shape[1])
+        if end <= start:
+            return np.zeros(len(self.categories))
+        return self.daily[:, start:end].sum(axis=1)
+
+    def _history(self, today, history_months):
+        """(category x month totals, month start offsets into the matrix) for up to `history_months`
+        months before today's"""
+        months, matrix = self._monthly_matrix()
+        keep = np.flatnonzero(months < np.datetime64(today, 'M'))[-history_months:]
+        starts = months[keep].astype('datetime64[D]').astype(np.int64) - self.first_day
+        return matrix[:, keep], starts, months[keep]
+
+    def _projection(self, today, history_months):
+        """(spent so far, projected month total, history) per category.
+
+        Each category runs at its own usual pace: spending so far is divided by the share of a
+        month's spending it has reached by this day of the month in past months, so rent paid
+        on the 1st projects to one rent, not thirty. A category that has usually spent little
+        by now (under ANALYTICS_MIN_SHARE) adds its usual rest of the month instead, and one
+        with no history is projected at the month-to-date daily rate.
+        """
+        spent = self._month_to_date_matrix(today)
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+        linear = spent / today.day * days_in_month
+        history, starts, months = self._history(today, history_months)
+        if not history.shape[1]:
+            return spent, linear, history
+
+        # Each past month's spending through the same day of the month
+        lengths = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+        width = self.daily.shape[1]
+        cumulative = np.concatenate([np.zeros((len(self.categories), 1)), np.cumsum(self.daily, axis=1)], axis=1)
+        low = np.clip(starts, 0, width)
+        high = np.clip(starts + np.minimum(today.day, lengths), 0, width)
+        by_today = (cumulative[:, high] - cumulative[:, low]).sum(axis=1)
+        totals = history.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(totals > 0, by_today / totals, 0.0)
+            paced = np.where(share >= app_config.ANALYTICS_MIN_SHARE, spent / share,
+                             spent + (totals - by_today) / history.shape[1])
+        return spent, np.where(totals > 0, paced, linear), history
+
+    def forecast_month_end(self, today=None, history_months=None):
+        """{category: (spent so far, projected month total)} at each category's usual pace"""
+        self.refresh()
+        today = today or date.today()
+        if self.first_day is None or not self.categories:
+            return {}
+        spent, projected, _ = self._projection(today, history_months or app_config.ANALYTICS_HISTORY_MONTHS)
+        return {category: (float(s), float(p)) for category, s, p in zip(self.categories, spent, projected)}
+
+    def anomalies(self, today=None, threshold=None, history_months=None):
+        """[(category, z, projected, usual)] whose projected month is `threshold` std devs above its history"""
+        self.refresh()
+        today = today or date.today()
+        threshold = app_config.ANALYTICS_ANOMALY_Z if threshold is None else threshold
+        history_months = history_months or app_config.ANALYTICS_HISTORY_MONTHS
+        if self.first_day is None or not self.categories:
+            return []
+
+        _, projected, history = self._projection(today, history_months)
+        if history.shape[1] < 2:
+            return []
+
+        mean = history.mean(axis=1)
+        std = history.std(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(std > 0, (projected - mean) / std, 0.0)
+
+        flagged = np.flatnonzero(z >= threshold)
+        flagged = flagged[np.argsort(-z[flagged])]
+        return [(self.categories[i], float(z[i]), float(projected[i]), float(mean[i])) for i in flagged]
+
+    # --- spoken answers ------------------------------------------------------------------
+
+    def advice(self, budget_status=(), today=None):
+        """A few spoken tips drawn from anomalies, budget pace and the month-over-month trend"""
+        today = today or date.today()
+        tips = []
+
+        for category, _, projected, usual in self.anomalies(today)[:2]:
+            tips.append(f"Your {category} spending is on pace for ${projected:.2f} this month, "
+                        f"well above your usual ${usual:.2f}.")
+
+        forecasts = self.forecast_month_end(today)
+        for category, limit, _ in budget_status:
+            projected = forecasts.get(category, (0.0, 0.0))[1]
+            if projected > limit:
+                tips.append(f"At this rate you'll go over your {category} budget by ${projected - limit:.2f}.")
+
+        months, delta, pct = self.month_over_month()
+        last_month = pct[months == np.datetime64(today, 'M') - 1]
+        # Only a change that still reads as one after rounding ("0% less" is no tip)
+        if len(last_month) and not np.isnan(last_month[0]) and round(abs(last_month[0]) * 100) >= 1:
+            change = last_month[0]
+            direction = "more" if change > 0 else "less"
+            tips.append(f"Last month you spent {abs(change) * 100:.0f}% {direction} than the month before.")
+
+        if not tips:
+            return "You're on track. Try saving 20% of your income each month!"
+        return " ".join(tips)
@@ -0,0 +1,84 @@
+# asr_grammar.py - Phrase-list grammar for Vosk built from the command vocabulary, with open-vocabulary fallback
+import json
+
+from Config import app_config
+
+# Glue words that appear in commands but not in the intent or slot tables
+COMMAND_WORDS = [
+    "what", "what's", "is", "are", "my", "me", "i", "the", "a", "an", "on", "for", "in", "of", "to",
+    "this", "last", "month", "week", "year", "today", "yesterday", "give", "tell", "show", "make",
+    "set", "add", "new", "some", "please", "left", "much", "many", "did", "do", "have", "and", "point",
+    "yes", "no", "stop", "quit", "exit", "goodbye", "bye", "help", "thanks", "thank", "you",
+]
+
+UNKNOWN = "[unk]"
+
+
+def grammar_phrases():
+    """Every phrase the coach understands, plus each of their words on its own.
+
+    Whole phrases keep multi-word commands likely; single words let the decoder
+    string together amounts and categories that no table lists verbatim.
+    """
+    from amount_parser import NUMBER_WORDS, DOLLAR_WORDS, CENT_WORDS
+    from intent_router import INTENT_TABLE, SLOT_TABLE, tokenize
+    from statement_importer import CATEGORY_MAP
+
+    phrases = set(app_config.WAKE_WORDS)
+    for _, _, intent_phrases in INTENT_TABLE:
+        phrases.update(intent_phrases)
+    for _, _, _, slot_phrases in SLOT_TABLE:
+        phrases.update(slot_phrases)
+
+    words = set(COMMAND_WORDS) | NUMBER_WORDS | DOLLAR_WORDS | CENT_WORDS | set(CATEGORY_MAP.values())
+    for phrase in phrases:
+        words.update(tokenize(phrase))
+    return sorted(phrases | words) + [UNKNOWN]
+
+
+def grammar_json():
+    return json.dumps(grammar_phrases())
+
+
+def make_recognizer(model, sample_rate, grammar=None):
+    """KaldiRecognizer with per-word confidences; constrained to `grammar` (a JSON phrase list) if given"""
+    import vosk
+
+    if grammar is None:
+        recognizer = vosk.KaldiRecognizer(model, sample_rate)
+    else:
+        recognizer = vosk.KaldiRecognizer(model, sample_rate, grammar)
+    recognizer.SetWords(True)
+    return recognizer
+
+
+def parse_result(raw):
+    """(text, mean word confidence) from a Vosk Result()/FinalResult() JSON string"""
+    result = json.loads(raw)
+    words = result.get('result') or []
+    confidence = sum(w.get('conf', 0.0) for w in words) / len(words) if words else 0.0
+    return result.get('text', ''), confidence
+
+
+def needs_fallback(text, confidence, threshold=None):
+    """True for a grammar result with out-of-grammar words or low confidence (silence never falls back)"""
+    threshold = app_config.ASR_GRAMMAR_MIN_CONFIDENCE if threshold is None else threshold
+    return bool(text) and (UNKNOWN in text or confidence < threshold)
+
+
+def decode_open(recognizer, blocks):
+    """Re-decode buffered audio blocks with the open-vocabulary recognizer; returns (text, confidence)"""
+    recognizer.Reset()
+    texts = []
+    confidences = []
+    for data in blocks:
+        if recognizer.AcceptWaveform(data):
+            text, confidence = parse_result(recognizer.Result())
+            if text:
+                texts.append(text)
+                confidences.append(confidence)
+    text, confidence = parse_result(recognizer.FinalResult())
+    if text:
+        texts.append(text)
+        confidences.append(confidence)
+    return ' '.join(texts), (sum(confidences) / len(confidences) if confidences else 0.0)
@@ -0,0 +1,307 @@
+# batch_transcribe.py - Offline voice pipeline: decode recorded WAVs with Vosk, then run the commands
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Config import app_config
+from asr_grammar import grammar_json, make_recognizer, parse_result, needs_fallback, decode_open
+
+# Frames fed to the recognizer per AcceptWaveform call
+DECODE_FRAMES = 4000
+
+_model = None  # one Vosk model per worker process
+_model_error = None
+_grammar = None
+
+
+def _init_worker(model_path):
+    # A failing initializer would break the whole pool; keep the error and report it per file
+    global _model, _model_error, _grammar
+    try:
+        import vosk
+        vosk.SetLogLevel(-1)
+        _model = vosk.Model(model_path)
+        _grammar = grammar_json()
+    except Exception as e:
+        _model_error = f"Could not load speech model {model_path}: {e}"
+
+
+def read_pcm16(path):
+    """Mono 16-bit PCM bytes and sample rate for a WAV file or file object (any subtype soundfile can read)"""
+    try:
+        import soundfile as sf
+    except ImportError:
+        sf = None
+
+    if sf is not None:
+        data, rate = sf.read(path, dtype='int16', always_2d=True)
+        return data[:, 0].tobytes(), rate
+
+    import wave
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM is supported without soundfile")
+        channels = wav.getnchannels()
+        frames = wav.readframes(wav.getnframes())
+        rate = wav.getframerate()
+    if channels > 1:
+        # Keep the first channel: 2 bytes out of every 2 * channels
+        frames = b''.join(frames[i:i + 2] for i in range(0, len(frames), 2 * channels))
+    return frames, rate
+
+
+def transcribe_file(path, grammar=False):
+    """Runs in a worker: decode one file; returns a result dict"""
+    return _transcribe(path, path, grammar)
+
+
+def transcribe_bytes(data, label=None, grammar=False):
+    """Runs in a worker: decode an in-memory WAV (e.g. an uploaded request body)"""
+    import io
+    return _transcribe(io.BytesIO(data), label, grammar)
+
+
+def _transcribe(source, path, grammar=False):
+    """Open-vocabulary decode, or grammar decode with open fallback for unsure utterances"""
+    start = time.perf_counter()
+    fallbacks = 0
+    try:
+        if _model is None:
+            raise RuntimeError(_model_error)
+        pcm, rate = read_pcm16(source)
+        recognizer = make_recognizer(_model, rate, _grammar if grammar else None)
+        open_recognizer = make_recognizer(_model, rate) if grammar else None
+        step = DECODE_FRAMES * 2
+        texts = []
+        blocks = []
+
+        def finish(raw):
+            nonlocal fallbacks
+            text, confidence = parse_result(raw)
+            if open_recognizer is not None and needs_fallback(text, confidence):
+                text, _ = decode_open(open_recognizer, blocks)
+                fallbacks += 1
+            blocks.clear()
+            if text:
+                texts.append(text)
+
+        for offset in range(0, len(pcm), step):
+            data = pcm[offset:offset + step]
+            blocks.append(data)
+            if recognizer.AcceptWaveform(data):
+                finish(recognizer.Result())
+        finish(recognizer.FinalResult())
+        text = ' '.join(texts)
+        audio_seconds = len(pcm) / 2 / rate
+        error = None
+    except Exception as e:
+        text, audio_seconds, error = '', 0.0, f"{type(e).__name__}: {e}"
+    decode_seconds = time.perf_counter() - start
+    return {
+        'audio': path,
+        'mode': 'grammar' if grammar else 'open',
+        'transcript': text,
+        'audio_seconds': audio_seconds,
+        'decode_seconds': decode_seconds,
+        'rtf': decode_seconds / audio_seconds if audio_seconds else None,
+        'fallbacks': fallbacks,
+        'error': error,
+    }
+
+
+def load_items(source):
+    """[{'audio': path} | {'text': utterance}, ...] from a directory of WAVs or a manifest.
+
+    Manifests are JSON lines with 'audio' (relative to the manifest) or 'text', plus an
+    optional 'expected' transcript; any other file is read as one text utterance per line.
+    """
+    if os.path.isdir(source):
+        return [{'audio': os.path.join(source, name)} for name in sorted(os.listdir(source))
+                if name.lower().endswith('.wav')]
+
+    base = os.path.dirname(source)
+    items = []
+    with open(source, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if source.endswith('.jsonl'):
+                item = json.loads(line)
+                if 'audio' in item:
+                    item['audio'] = os.path.join(base, item['audio'])
+            else:
+                item = {'text': line}
+            items.append(item)
+    return items
+
+
+def word_error_rate(expected, actual):
+    """Word-level edit distance divided by the expected length"""
+    ref, hyp = expected.lower().split(), actual.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref) if ref else float(bool(hyp))
+
+
+def decode_all(audio_paths, workers=None, model_path=None, grammar=False):
+    """{path: result} for every file, decoded on a process pool; returns (results, wall seconds)"""
+    workers = workers or os.cpu_count() or 1
+    wall_start = time.perf_counter()
+    decoded = {}
+    if audio_paths:
+        with ProcessPoolExecutor(max_workers=min(workers, len(audio_paths)), initializer=_init_worker,
+                                 initargs=(model_path or app_config.VOSK_MODEL_PATH,),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            for result in pool.map(transcribe_file, audio_paths, [grammar] * len(audio_paths)):
+                decoded[result['audio']] = result
+    return decoded, time.perf_counter() - wall_start
+
+
+def run_batch(source, db=None, workers=None, model_path=None, execute=True, output=None, grammar=False,
+              background_reports=False):
+    """Decode every item on a process pool, then feed transcripts through FinanceLogic in order.
+
+    Commands run against `db`, or a throwaway sample ledger when none is given, so a test batch
+    never writes into the user's own ledger. Reports run inline by default so responses are final.
+    """
+    items = load_items(source)
+    audio_paths = [item['audio'] for item in items if 'audio' in item]
+    decoded, decode_wall = decode_all(audio_paths, workers, model_path, grammar)
+
+    results = []
+    for item in items:
+        result = dict(decoded.get(item.get('audio'), {'audio': None, 'transcript': item.get('text', '')}))
+        if 'expected' in item:
+            result['expected'] = item['expected']
+            result['wer'] = word_error_rate(item['expected'], result['transcript'])
+        results.append(result)
+
+    if execute:
+        from database import Database
+        from finance_logic import FinanceLogic
+        scratch = None
+        if db is None:
+            scratch = tempfile.TemporaryDirectory(prefix='finance-batch-')
+            db = Database(os.path.join(scratch.name, 'batch.db'))
+        logic = FinanceLogic(db, background_reports=background_reports)
+        try:
+            for result in results:
+                if result['transcript'] and not result.get('error'):
+                    start = time.perf_counter()
+                    result['response'] = logic.process_command(result['transcript'])
+                    result['execute_ms'] = (time.perf_counter() - start) * 1000
+        finally:
+            logic.close()
+            if scratch is not None:
+                db.close()
+                scratch.cleanup()
+
+    audio_seconds = sum(r.get('audio_seconds') or 0 for r in results)
+    summary = {
+        'items': len(results),
+        'audio_files': len(audio_paths),
+        'errors': sum(1 for r in results if r.get('error')),
+        'audio_seconds': audio_seconds,
+        'decode_wall_seconds': decode_wall,
+        # Real-time factor of the whole pool: wall time per second of audio (< 1 is faster than real time)
+        'rtf': decode_wall / audio_seconds if audio_seconds else None,
+        'mean_wer': (sum(r['wer'] for r in results if 'wer' in r) / sum(1 for r in results if 'wer' in r)
+                     if any('wer' in r for r in results) else None),
+    }
+
+    for result in results:
+        label = result['audio'] or '(text)'
+        if result.get('error'):
+            print(f"❌ {label}: {result['error']}")
+            continue
+        rtf = f" rtf {result['rtf']:.2f}" if result.get('rtf') else ""
+        wer = f" wer {result['wer']:.2f}" if 'wer' in result else ""
+        print(f"👤 {label}: {result['transcript']!r}{rtf}{wer}")
+        if 'response' in result:
+            print(f"🤖 {result['response']}")
+    rtf = f"{summary['rtf']:.3f}" if summary['rtf'] is not None else "n/a"
+    print(f"✅ {summary['items']} items, {summary['audio_seconds']:.1f} s of audio decoded in "
+          f"{summary['decode_wall_seconds']:.1f} s (real-time factor {rtf}), {summary['errors']} errors")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+            f.write(json.dumps({'summary': summary}) + "\n")
+    return results, summary
+
+
+def compare_modes(source, workers=None, model_path=None):
+    """Decode the same recordings open and grammar-constrained; accuracy and decode time per mode.
+
+    Word error rate needs manifest items with an 'expected' transcript.
+    """
+    items = [item for item in load_items(source) if 'audio' in item]
+    audio_paths = [item['audio'] for item in items]
+    expected = {item['audio']: item['expected'] for item in items if 'expected' in item}
+
+    summaries = {}
+    for mode in ('open', 'grammar'):
+        decoded, wall = decode_all(audio_paths, workers, model_path, grammar=mode == 'grammar')
+        ok = [r for r in decoded.values() if not r['error']]
+        scored = [word_error_rate(expected[r['audio']], r['transcript']) for r in ok if r['audio'] in expected]
+        audio_seconds = sum(r['audio_seconds'] for r in ok)
+        decode_seconds = sum(r['decode_seconds'] for r in ok)
+        summaries[mode] = {
+            'files': len(decoded),
+            'errors': len(decoded) - len(ok),
+            'mean_wer': sum(scored) / len(scored) if scored else None,
+            'exact': sum(1 for wer in scored if wer == 0),
+            'decode_seconds': decode_seconds,  # summed over workers: decode CPU time
+            'rtf': decode_seconds / audio_seconds if audio_seconds else None,
+            'wall_seconds': wall,
+            'fallbacks': sum(r['fallbacks'] for r in ok),
+        }
+
+    print(f"{'mode':<8} {'files':>5} {'errors':>6} {'WER':>6} {'exact':>5} {'decode s':>9} {'RTF':>6} {'fallbacks':>9}")
+    for mode, s in summaries.items():
+        wer = f"{s['mean_wer']:.3f}" if s['mean_wer'] is not None else "n/a"
+        rtf = f"{s['rtf']:.3f}" if s['rtf'] is not None else "n/a"
+        print(f"{mode:<8} {s['files']:>5} {s['errors']:>6} {wer:>6} {s['exact']:>5} "
+              f"{s['decode_seconds']:>9.2f} {rtf:>6} {s['fallbacks']:>9}")
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode recorded commands offline and run them through the coach")
+    parser.add_argument('source', help="directory of .wav files, a .jsonl manifest or a text file of utterances")
+    parser.add_argument('--db', help="ledger to run the commands against (default: a throwaway sample ledger)")
+    parser.add_argument('--workers', type=int, help="decoder processes (default: one per CPU)")
+    parser.add_argument('--model', help="Vosk model directory")
+    parser.add_argument('--no-execute', action='store_true', help="only transcribe")
+    parser.add_argument('--output', help="write per-item results and the summary as JSON lines")
+    parser.add_argument('--grammar', action='store_true',
+                        help="decode against the command grammar, falling back to open vocabulary when unsure")
+    parser.add_argument('--compare', action='store_true',
+                        help="only decode, once open and once with the grammar, and compare WER and decode time")
+    args = parser.parse_args()
+
+    if args.compare:
+        comparison = compare_modes(args.source, args.workers, args.model)
+        sys.exit(1 if any(s['errors'] for s in comparison.values()) else 0)
+
+    from database import Database
+    database = Database(args.db) if args.db else None
+    try:
+        _, batch_summary = run_batch(args.source, database, args.workers, args.model,
+                                     not args.no_execute, args.output, args.grammar)
+    finally:
+        if database is not None:
+            database.close()
+    sys.exit(1 if batch_summary['errors'] else 0)
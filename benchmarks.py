@@ -0,0 +1,568 @@
+# benchmarks.py - Micro-benchmarks for the voice coach hot paths
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from database import Database
+
+from intent_router import default_router
+from amount_parser import parse_amount
+from transaction_writer import TransactionWriter
+
+SAMPLE_UTTERANCES = [
+    "what's my balance",
+    "how much have i spent",
+    "how much money do i have left",
+    "i spent 50 dollars on groceries",
+    "i paid twenty dollars for a movie",
+    "i earned $500 from freelancing",
+    "i saved 100",
+    "show me a spending chart",
+    "create an income vs expenses graph",
+    "generate my monthly report",
+    "export everything to excel",
+    "give me a tax summary",
+    "how is my budget",
+    "any advice for me",
+    "tell me a joke",
+]
+
+
+def legacy_route(command):
+    """The keyword any() chain FinanceLogic.process_command used before the router"""
+    if any(word in command for word in ["chart", "graph", "visualize", "show me"]):
+        return 'visualization'
+    elif any(word in command for word in ["report", "export", "excel", "pdf", "tax"]):
+        return 'reporting'
+    if any(word in command for word in ["balance", "how much", "money left", "my income", "income"]):
+        return 'balance'
+    elif any(word in command for word in ["spending", "expenses", "how much have i spent"]):
+        return 'spending_query'
+    elif any(word in command for word in ["i spent", "i paid", "spent", "paid"]):
+        return 'add_expense'
+    elif any(word in command for word in ["i saved", "i earned", "saved", "earned"]):
+        return 'add_income'
+    elif any(word in command for word in ["budget", "limit"]):
+        return 'budget'
+    elif any(word in command for word in ["advice", "tip"]):
+        return 'advice'
+    return 'fallback'
+
+
+def legacy_route_with_slots(command):
+    """Legacy chain plus the keyword rescans the old handlers did for category/chart/report"""
+    intent = legacy_route(command)
+    slots = {}
+    if "grocery" in command or "food" in command:
+        slots['category'] = "groceries"
+    elif "entertainment" in command or "movie" in command:
+        slots['category'] = "entertainment"
+    elif "transport" in command or "gas" in command:
+        slots['category'] = "transport"
+    elif "rent" in command:
+        slots['category'] = "rent"
+    if "spending" in command:
+        slots['chart'] = 'spending'
+    elif "income" in command or "expense" in command:
+        slots['chart'] = 'income_expense'
+    elif "budget" in command:
+        slots['chart'] = 'budget'
+    elif "summary" in command or "report" in command:
+        slots['chart'] = 'summary'
+    if "monthly report" in command or "month report" in command:
+        slots['report'] = 'monthly'
+    elif "export" in command or "excel" in command:
+        slots['report'] = 'excel'
+    elif "tax" in command or "deduction" in command:
+        slots['report'] = 'tax'
+    elif "report" in command:
+        slots['report'] = 'menu'
+    return intent, slots
+
+
+def _time_calls(func, utterances, rounds, repeat=5):
+    """Calls/sec, best of `repeat` runs (the fastest run is the one least disturbed by other load)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for utterance in utterances:
+                func(utterance)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return (rounds * len(utterances)) / best
+
+
+def bench_router(rounds=2000):
+    """Compare utterances/sec for the compiled router and the legacy chain"""
+    router_rate = _time_calls(default_router.route, SAMPLE_UTTERANCES, rounds)
+    legacy_rate = _time_calls(legacy_route, SAMPLE_UTTERANCES, rounds)
+    legacy_slots_rate = _time_calls(legacy_route_with_slots, SAMPLE_UTTERANCES, rounds)
+
+    print(f"{'utterance':<40} {'legacy':<16} {'router':<16}")
+    for utterance in SAMPLE_UTTERANCES:
+        print(f"{utterance:<40} {legacy_route(utterance):<16} {default_router.route(utterance).intent:<16}")
+    print()
+    print(f"Router: {router_rate:,.0f} utterances/sec")
+    print(f"Legacy (intent only): {legacy_rate:,.0f} utterances/sec")
+    print(f"Legacy (intent + slot rescans): {legacy_slots_rate:,.0f} utterances/sec")
+    return {'router_per_sec': router_rate, 'legacy_per_sec': legacy_rate,
+            'legacy_with_slots_per_sec': legacy_slots_rate}
+
+
+AMOUNT_PHRASES = [
+    "i spent two hundred forty five dollars and fifty cents on groceries",
+    "i paid $1,250.75 for rent",
+    "i earned five thousand three hundred",
+    "fifty cents",
+    "i spent 20 dollars on 2 movies",
+    "i saved one point five thousand dollars",
+    "i paid nineteen ninety nine for the new phone",
+    "i spent five dollars fifty on coffee",
+    "i spent three fifty on coffee",
+    "the book was four ninety nine",
+    "i paid nine ninety-nine for the app",
+    "lunch was seven oh five",
+]
+
+
+def bench_amounts(rounds=5000):
+    """Amount parses/sec - must comfortably keep up with every partial hypothesis"""
+    for phrase in AMOUNT_PHRASES:
+        print(f"{phrase:<70} {parse_amount(phrase)}")
+    rate = _time_calls(parse_amount, AMOUNT_PHRASES, rounds)
+    print(f"\nAmount parser: {rate:,.0f} phrases/sec")
+    return {'amount_parses_per_sec': rate}
+
+
+def _sample_rows(count):
+    categories = ['groceries', 'rent', 'transport', 'entertainment', 'other']
+    return [TransactionWriter.normalize(10 + i % 90, categories[i % len(categories)], f"Row {i}",
+                                        "expense", f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}")
+            for i in range(count)]
+
+
+def bench_writes(rows=5000):
+    """Rows/sec for one durable (fsynced) commit per transaction vs. group commits through TransactionWriter"""
+    data = _sample_rows(rows)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'single.db'))
+        writer = TransactionWriter(db, flush_interval=0)
+        start = time.perf_counter()
+        for row in data:
+            writer.add([row], durable=True)
+        results['single_commit_rows_per_sec'] = rows / (time.perf_counter() - start)
+        writer.close()
+        db.close()
+
+        db = Database(os.path.join(tmp, 'grouped.db'))
+        writer = TransactionWriter(db)
+        start = time.perf_counter()
+        for row in data:
+            writer.add([row])
+        writer.flush()
+        results['group_commit_rows_per_sec'] = rows / (time.perf_counter() - start)
+        results['group_commits'] = writer.commits
+        writer.close()
+        db.close()
+
+    print(f"Single durable (fsynced) commits: {results['single_commit_rows_per_sec']:,.0f} rows/sec")
+    print(f"Group commits:                    {results['group_commit_rows_per_sec']:,.0f} rows/sec "
+          f"({results['group_commits']} commits)")
+    return results
+
+
+def _report_rows(count, years):
+    categories = ['groceries', 'rent', 'charity', 'medical', 'education', 'business']
+    rows = []
+    for i in range(count):
+        date = f"{years[i % len(years)]}-{1 + i % 12:02d}-{1 + i % 28:02d}"
+        if i % 10 == 0:
+            rows.append(TransactionWriter.normalize(2500, 'salary', f"Pay {i}", "income", date))
+        else:
+            rows.append(TransactionWriter.normalize(5 + i % 200, categories[i % len(categories)],
+                                                    f"Row {i}", "expense", date))
+    return rows
+
+
+def bench_reports(rows=50000, years=(2021, 2022, 2023, 2024)):
+    """A year of monthly PDFs and several years of tax summaries: per-period calls vs. batch"""
+    from reporting import FinancialReporter
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'reports.db'))
+        writer = TransactionWriter(db)
+        writer.add(_report_rows(rows, years))
+        writer.close()
+        reporter = FinancialReporter(db, reports_dir=os.path.join(tmp, 'reports'))
+        last_year = years[-1]
+
+        start = time.perf_counter()
+        for month in range(1, 13):
+            reporter.generate_monthly_report(month, last_year)
+        results['monthly_loop_sec'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reporter.generate_monthly_reports((last_year, 1), (last_year, 12))
+        results['monthly_batch_sec'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for year in years:
+            reporter.generate_tax_summary(year)
+        results['tax_loop_sec'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reporter.generate_tax_summaries(years[0], last_year)
+        results['tax_batch_sec'] = time.perf_counter() - start
+        db.close()
+
+    print(f"12 monthly reports, one call each: {results['monthly_loop_sec'] * 1000:,.0f} ms")
+    print(f"12 monthly reports, batch:         {results['monthly_batch_sec'] * 1000:,.0f} ms")
+    print(f"{len(years)} tax summaries, one call each: {results['tax_loop_sec'] * 1000:,.0f} ms")
+    print(f"{len(years)} tax summaries, batch:         {results['tax_batch_sec'] * 1000:,.0f} ms")
+    return results
+
+
+def bench_analytics(rows=2000000, years=(2021, 2022, 2023, 2024)):
+    """Analytics load time, then per-call latency of each query after a small incremental top-up"""
+    from analytics import LedgerAnalytics
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'analytics.db'))
+        writer = TransactionWriter(db, batch_size=50000)
+        writer.add(_report_rows(rows, years))
+        writer.close()
+
+        analytics = LedgerAnalytics(db)
+        start = time.perf_counter()
+        analytics.refresh()
+        results['load_ms'] = (time.perf_counter() - start) * 1000
+
+        writer = TransactionWriter(db)
+        writer.add(_report_rows(100, years[-1:]), durable=True)
+        start = time.perf_counter()
+        analytics.refresh()
+        results['incremental_refresh_ms'] = (time.perf_counter() - start) * 1000
+        writer.close()
+
+        calls = {
+            'daily_series': analytics.daily_series,
+            'monthly_series': analytics.monthly_series,
+            'rolling_daily_average': analytics.rolling_daily_average,
+            'month_over_month': analytics.month_over_month,
+            'forecast_month_end': analytics.forecast_month_end,
+            'anomalies': analytics.anomalies,
+            'advice': analytics.advice,
+        }
+        for name, call in calls.items():
+            start = time.perf_counter()
+            call()
+            results[f'{name}_ms'] = (time.perf_counter() - start) * 1000
+        db.close()
+
+    for name, value in results.items():
+        print(f"{name:<28} {value:>10.1f} ms")
+    return results
+
+
+def bench_snapshot(rows=1000000, years=(2021, 2022, 2023, 2024)):
+    """Monthly and tax report aggregates from the columnar snapshot vs. the pd.read_sql_query path"""
+    from Config import app_config
+    from ledger_generator import populate
+    from ledger_snapshot import LedgerSnapshot
+    from reporting import FinancialReporter
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'snapshot.db'))
+        populate(db, rows, start=date(years[0], 1, 1), years=len(years))
+        last_year = years[-1]
+
+        snapshot = LedgerSnapshot(db)
+        results['build_ms'] = _time_ms(snapshot.refresh)
+        results['reopen_ms'] = _time_ms(LedgerSnapshot(db).refresh)
+        writer = TransactionWriter(db)
+        writer.add(_report_rows(100, years[-1:]), durable=True)
+        writer.close()
+        results['incremental_refresh_ms'] = _time_ms(snapshot.refresh)
+        results['noop_refresh_ms'] = _time_ms(snapshot.refresh, repeat=5)
+
+        reporter = FinancialReporter(db, reports_dir=os.path.join(tmp, 'reports'))
+        paths = {'snapshot': True, 'read_sql': False}
+        answers = {}
+        configured = app_config.LEDGER_SNAPSHOT
+        for path, enabled in paths.items():
+            app_config.LEDGER_SNAPSHOT, reporter._snapshot = enabled, None
+            try:
+                answers[path] = (reporter._month_reports((last_year, 1), (last_year, 12)),
+                                 reporter._tax_totals(years[0], last_year))
+                results[f'{path}_monthly_ms'] = _time_ms(
+                    lambda: reporter._month_reports((last_year, 1), (last_year, 12)), repeat=3)
+                results[f'{path}_tax_ms'] = _time_ms(lambda: reporter._tax_totals(years[0], last_year), repeat=3)
+            except ImportError as e:
+                print(f"⚠️ {path} path skipped: {e}")
+        app_config.LEDGER_SNAPSHOT = configured
+        reporter.close()
+        db.close()
+
+    if len(answers) == 2:
+        (snap_months, snap_tax), (sql_months, sql_tax) = answers['snapshot'], answers['read_sql']
+        results['same_answers'] = (
+            [(m['year'], m['month'], round(m['income'], 2), round(m['expenses'], 2)) for m in snap_months]
+            == [(m['year'], m['month'], round(m['income'], 2), round(m['expenses'], 2)) for m in sql_months]
+            and {y: [(c, round(t, 2)) for c, t in v] for y, v in snap_tax.items()}
+            == {y: [(c, round(t, 2)) for c, t in v] for y, v in sql_tax.items()})
+
+    print(f"{rows:,} rows")
+    for name, value in results.items():
+        print(f"{name:<28} {value:>10.1f} ms" if name.endswith('_ms') else f"{name:<28} {value!s:>10}")
+    return results
+
+
+CLASSIFIER_CITIES = ["SAN JOSE CA", "AUSTIN TX", "BROOKLYN NY", "SEATTLE WA", "DENVER CO"]
+
+# Merchants that appear in neither category_classifier.KEYWORDS nor ledger_generator, so accuracy
+# is measured on names the classifier was not built from
+HELD_OUT_MERCHANTS = [
+    ('groceries', ["Food Lion", "Giant Eagle", "Piggly Wiggly", "Panera Bread", "Chipotle", "Fresh Thyme"]),
+    ('entertainment', ["Regal Cinemas", "Ticketmaster", "Apple Music", "Bowlero", "Dave & Buster's"]),
+    ('transport', ["Valero", "Amtrak", "Greyhound", "Delta Air Lines", "Citgo", "Sunoco"]),
+    ('medical', ["Kaiser Permanente", "Quest Diagnostics", "LabCorp", "MinuteClinic"]),
+    ('education', ["Khan Academy", "Pearson", "Chegg", "Barnes & Noble"]),
+    ('charity', ["Salvation Army", "Goodwill", "St Jude", "Habitat for Humanity"]),
+    ('business', ["Dropbox", "Slack", "Mailchimp", "GoDaddy", "Adobe"]),
+    ('other', ["Best Buy", "IKEA", "Nordstrom", "Petco"]),
+]
+
+
+def _statement_descriptions(count, seed=42):
+    """Bank-style descriptions ("POS DEBIT VALERO #1234 AUSTIN TX") of held-out merchants with their category"""
+    import random
+
+    rng = random.Random(seed)
+    merchants = [(merchant, category) for category, names in HELD_OUT_MERCHANTS for merchant in names]
+    rows = []
+    for _ in range(count):
+        merchant, category = rng.choice(merchants)
+        rows.append((f"POS DEBIT {merchant.upper()} #{rng.randrange(10000)} {rng.choice(CLASSIFIER_CITIES)}",
+                     category))
+    return rows
+
+
+def bench_classifier(count=100000):
+    """Descriptions/sec and held-out accuracy for the category classifier vs. router slot extraction.
+
+    Accuracy is measured twice: from keywords alone, and after learning from a separate labelled
+    statement (other store numbers and cities) the way statement imports do.
+    """
+    from category_classifier import CategoryClassifier
+
+    rows = _statement_descriptions(count)
+    descriptions = [description for description, _ in rows]
+    classifier = CategoryClassifier(cache_size=count)
+
+    def rate(func):
+        start = time.perf_counter()
+        for description in descriptions:
+            func(description)
+        return count / (time.perf_counter() - start)
+
+    def accuracy(func):
+        return sum(func(description) == category for description, category in rows) / count
+
+    results = {'unique_per_sec': rate(classifier.classify)}
+    results['cached_per_sec'] = rate(classifier.classify)  # same descriptions again: all LRU hits
+    results['router_slots_per_sec'] = rate(lambda text: default_router.route(text).slots.get('category', 'other'))
+    results['router_accuracy'] = accuracy(lambda text: default_router.route(text).slots.get('category', 'other'))
+    results['keyword_accuracy'] = accuracy(classifier.classify)
+
+    for description, category in _statement_descriptions(1000, seed=7):
+        classifier.observe(description, category)
+    results['learned_mappings'] = classifier.flush()
+    results['learned_accuracy'] = accuracy(classifier.classify)
+
+    for name, value in results.items():
+        print(f"{name:<24} {value:>12,.3f}" if 'accuracy' in name else f"{name:<24} {value:>12,.0f}")
+    return results
+
+
+# One utterance per intent for the process_command timings
+INTENT_UTTERANCES = {
+    'balance': "what's my balance",
+    'spending_query': "how much have i spent",
+    'add_expense': "i spent 50 dollars on groceries",
+    'add_income': "i earned $500 from freelancing",
+    'budget': "how is my budget",
+    'advice': "any advice for me",
+    'correct_category': "that was groceries",  # re-files the add_expense utterance above
+    'job_status': "is my report ready",
+    'cancel_job': "cancel the report",
+    'debug_stats': "debug stats",
+    'fallback': "tell me a joke",
+}
+
+# (method name, arguments) for each generator timed in the suite; ranges cover populate()'s 2020-2023
+REPORTER_METHODS = [
+    ('generate_monthly_report', ()),
+    ('generate_monthly_reports', ((2023, 1), (2023, 12))),
+    ('generate_tax_summary', ()),
+    ('generate_tax_summaries', (2020, 2023)),
+    ('export_to_excel', ()),
+    ('export_to_parquet', ()),
+    ('export_to_arrow', ()),
+]
+VISUALIZER_METHODS = ['create_spending_chart', 'create_income_expense_chart', 'create_budget_chart',
+                      'show_financial_summary']
+
+SUITE_SIZES = [10000, 100000, 1000000]
+# Next to this file whatever the working directory, so .gitignore's /benchmark_results/ covers it
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_results')
+
+
+def _time_ms(func, repeat=1):
+    """Median wall time of `repeat` calls in ms, or the error if the call fails"""
+    timings = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+    return statistics.median(timings)
+
+
+def _suite_at_size(rows, tmp, seed=42, repeat=5):
+    import ledger_generator
+    from finance_logic import FinanceLogic
+    from reporting import FinancialReporter
+    from visualization import FinanceVisualizer
+    from chart_cache import ChartCache
+
+    results = {}
+    db_path = os.path.join(tmp, f'ledger_{rows}.db')
+    db = Database(db_path)
+    results['bulk_insert_rows_per_sec'] = ledger_generator.populate(db, rows, seed)
+    db.close()
+
+    # Start-up: open the database and build FinanceLogic on an existing ledger
+    start = time.perf_counter()
+    db = Database(db_path)
+    logic = FinanceLogic(db, background_reports=False)  # time the generators inline, not the job submission
+    results['startup_ms'] = (time.perf_counter() - start) * 1000
+    for category, limit in [('groceries', 600.0), ('entertainment', 250.0), ('transport', 300.0)]:
+        logic.set_budget(category, limit, '0000-00')
+
+    results['analytics_load_ms'] = _time_ms(lambda: logic.analytics.refresh())
+    results['process_command_ms'] = {intent: _time_ms(lambda: logic.process_command(utterance), repeat)
+                                     for intent, utterance in INTENT_UTTERANCES.items()}
+    logic.flush()
+
+    reporter = FinancialReporter(db, reports_dir=os.path.join(tmp, 'reports'))
+    results['reporter_ms'] = {name: _time_ms(lambda: getattr(reporter, name)(*args))
+                              for name, args in REPORTER_METHODS}
+
+    # Every render is a cache miss: each call gets a fresh, empty cache directory
+    visualizer = FinanceVisualizer(db, cache=ChartCache(os.path.join(tmp, 'charts')))
+    timings = {}
+    for name in VISUALIZER_METHODS:
+        visualizer.cache.clear()
+        timings[name] = _time_ms(getattr(visualizer, name))
+    results['visualizer_ms'] = timings
+    results['visualizer_cached_ms'] = {name: _time_ms(getattr(visualizer, name), repeat)
+                                       for name in VISUALIZER_METHODS}
+
+    logic.close()
+    db.close()
+    os.remove(db_path)
+    return results
+
+
+def bench_suite(sizes=None, output=None, seed=42):
+    """Every command path at several ledger sizes; results are written to a JSON file"""
+    sizes = sizes or SUITE_SIZES
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'sizes': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            print(f"--- {rows:,} rows ---")
+            report['sizes'][str(rows)] = results = _suite_at_size(rows, tmp, seed)
+            print(json.dumps(results, indent=2))
+
+    output = output or os.path.join(RESULTS_DIR, f"suite_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Results written to {output}")
+    return report
+
+
+def _flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and 'error' not in value:
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare_results(baseline_path, current_path, threshold=1.2):
+    """Print metrics that got slower by more than `threshold`x between two suite files"""
+    with open(baseline_path) as f:
+        baseline = _flatten(json.load(f)['sizes'])
+    with open(current_path) as f:
+        current = _flatten(json.load(f)['sizes'])
+
+    regressions = []
+    for name in sorted(baseline.keys() & current.keys()):
+        old, new = baseline[name], current[name]
+        if not old or not new:
+            continue
+        # Throughput metrics regress when they drop, timings when they grow
+        ratio = old / new if name.endswith('_per_sec') else new / old
+        marker = "❌" if ratio > threshold else "  "
+        print(f"{marker} {name:<60} {old:>12.2f} {new:>12.2f} {ratio:>6.2f}x")
+        if ratio > threshold:
+            regressions.append((name, old, new, ratio))
+    return regressions
+
+
+BENCHMARKS = {
+    'router': bench_router,
+    'amounts': bench_amounts,
+    'writes': bench_writes,
+    'reports': bench_reports,
+    'analytics': bench_analytics,
+    'snapshot': bench_snapshot,
+    'classifier': bench_classifier,
+}
+
+
+if __name__ == "__main__":
+    # python benchmarks.py [name ...]
+    # python benchmarks.py suite [ROWS ...]          (JSON written to benchmark_results/)
+    # python benchmarks.py compare BASELINE.json CURRENT.json
+    args = sys.argv[1:]
+    if args[:1] == ['suite']:
+        bench_suite([int(size) for size in args[1:]] or None)
+    elif args[:1] == ['compare']:
+        sys.exit(1 if compare_results(args[1], args[2]) else 0)
+    else:
+        for name in args or list(BENCHMARKS):
+            print(f"=== {name} ===")
+            BENCHMARKS[name]()
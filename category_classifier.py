@@ -0,0 +1,257 @@
+# category_classifier.py - Category for a free-text description: keyword/merchant trie plus learned mappings
+import re
+import threading
+from functools import lru_cache
+
+from Config import app_config
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+# Words plus the digit runs that split a merchant name from store numbers, cities and dates
+KEY_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?|\d+")
+
+DEFAULT_CATEGORY = 'other'
+
+# (category, phrases) - category names, everyday words and common merchants
+KEYWORDS = [
+    ('groceries', ["grocery", "groceries", "food", "supermarket", "market", "produce", "bakery", "butcher",
+                   "whole foods", "trader joe's", "safeway", "costco", "kroger", "aldi", "lidl", "publix",
+                   "wegmans", "sprouts", "corner market", "instacart", "restaurant", "restaurants", "cafe",
+                   "coffee", "starbucks", "pizza", "lunch", "dinner", "breakfast", "doordash", "grubhub"]),
+    ('entertainment', ["entertainment", "movie", "movies", "cinema", "theatre", "theater", "concert",
+                       "tickets", "netflix", "spotify", "hulu", "disney", "steam", "playstation", "xbox",
+                       "nintendo", "amc", "games", "game", "music", "streaming", "bar", "club"]),
+    ('transport', ["transport", "transportation", "gas", "fuel", "petrol", "parking", "toll", "tolls", "bus",
+                   "train", "subway", "metro", "taxi", "uber", "lyft", "shell", "chevron", "exxon", "mobil",
+                   "bp", "car wash", "metro card", "flight", "airline", "airlines"]),
+    ('rent', ["rent", "mortgage", "landlord", "apartment rent", "housing", "lease"]),
+    ('medical', ["medical", "doctor", "dentist", "dental", "hospital", "clinic", "pharmacy", "prescription",
+                 "medicine", "health", "urgent care", "cvs", "walgreens", "rite aid", "dental clinic",
+                 "optometrist", "therapy", "therapist"]),
+    ('education', ["education", "tuition", "school", "college", "university", "course", "courses", "class",
+                   "classes", "books", "textbook", "textbooks", "bookstore", "coursera", "udemy", "edx",
+                   "community college", "training"]),
+    ('charity', ["charity", "donation", "donations", "donate", "donated", "red cross", "food bank", "shelter",
+                 "local shelter", "church", "unicef", "nonprofit", "fundraiser"]),
+    ('business', ["business", "office", "office depot", "staples", "aws", "zoom", "fedex", "ups", "software",
+                  "subscription", "coworking", "client", "supplies", "domain", "hosting"]),
+    ('other', ["other", "misc", "miscellaneous"]),
+]
+
+# Bank-statement noise that never identifies a merchant
+NOISE_WORDS = frozenset([
+    'pos', 'debit', 'credit', 'purchase', 'card', 'ach', 'payment', 'online', 'recurring', 'visa', 'mastercard',
+    'checkcard', 'www', 'com', 'inc', 'llc', 'ltd', 'co', 'the', 'a', 'an', 'at', 'on', 'for', 'to', 'of', 'and',
+    'i', 'my', 'me', 'spent', 'paid', 'pay', 'bought', 'buy', 'dollar', 'dollars', 'buck', 'bucks', 'cents',
+    'that', 'was', 'it', 'is', 'should', 'be', 'change', 'recategorize', 'category', 'wrong', 'some',
+])
+
+# Learned mappings outrank built-in keywords; corrections outrank what imports taught us
+RANKS = {'keyword': 1, 'import': 2, 'correction': 3}
+
+# Words kept in a learned merchant key
+MAX_KEY_TOKENS = 2
+# "... at bluebird diner", "... from acme corp": the merchant name follows these
+MERCHANT_MARKERS = frozenset(['at', 'from'])
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _name_after(tokens, i):
+    """Merchant words starting at tokens[i]: noise ahead of the name is skipped, noise or a number ends it"""
+    from amount_parser import NUMBER_WORDS
+
+    words = []
+    for token in tokens[i:]:
+        if token[0].isdigit() or token in NUMBER_WORDS or token in MERCHANT_MARKERS:
+            break
+        if token in NOISE_WORDS:
+            if words:
+                break
+            continue
+        words.append(token)
+        if len(words) == MAX_KEY_TOKENS:
+            break
+    return words
+
+
+def merchant_key(text, keywords=frozenset()):
+    """The merchant name in a description, used as the learned phrase.
+
+    A name after "at"/"from" wins: "i spent three fifty on coffee at bluebird diner" keys on
+    "bluebird diner". Otherwise it is the name leading the description, skipping noise and the
+    given keyword words ahead of it. Numbers (store numbers, amounts, dates) end the name:
+    "POS WALGREENS #1234 SAN JOSE CA" and "ZIGGY HARDWARE 12" key on "walgreens" and
+    "ziggy hardware". A name with no number after it may run into the city ("WALGREENS SAN
+    JOSE"), so only its first word is kept.
+    """
+    from amount_parser import NUMBER_WORDS
+
+    tokens = KEY_PATTERN.findall(text.lower())
+    for i in range(len(tokens) - 1, -1, -1):
+        if tokens[i] in MERCHANT_MARKERS:
+            words = _name_after(tokens, i + 1)
+            if words:
+                return ' '.join(words)
+
+    words = []
+    for token in tokens:
+        if token[0].isdigit() or token in NUMBER_WORDS:
+            if words:
+                return ' '.join(words[:MAX_KEY_TOKENS])
+        elif words or (token not in NOISE_WORDS and token not in keywords):  # only skipped ahead of the name
+            words.append(token)
+    return ' '.join(words[:1])
+
+
+class CategoryClassifier:
+    """Token trie over keyword and learned phrases; the longest, highest-ranked match wins.
+
+    Learned phrases persist in the category_mappings table of the ledger database.
+    """
+
+    def __init__(self, db=None, cache_size=None):
+        self.db = db
+        self.root = {}
+        self.learned = {}  # phrase -> (category, source)
+        self._pending = {}  # phrase -> category, observed during an import and not yet saved
+        self._lock = threading.Lock()
+        self.builtin = set()  # keyword phrases and category names; never remapped by learning
+        for category, phrases in KEYWORDS:
+            self.builtin.add(category)
+            for phrase in phrases:
+                self._add(phrase, category, 'keyword')
+        self._add_slot_phrases()
+        if db is not None:
+            for phrase, category, source in db.conn.execute(
+                    "SELECT phrase, category, source FROM category_mappings"):
+                self._add(phrase, category, source)
+                self.learned[phrase] = (category, source)
+        self._cached = lru_cache(maxsize=cache_size or app_config.CLASSIFIER_CACHE_SIZE)(self._classify)
+
+    def _add_slot_phrases(self):
+        # Anything the voice router already treats as a category stays one
+        from intent_router import SLOT_TABLE
+
+        for slot, value, _, phrases in SLOT_TABLE:
+            if slot == 'category':
+                self.builtin.add(value)
+                for phrase in phrases:
+                    self._add(phrase, value, 'keyword')
+
+    def _add(self, phrase, category, source):
+        tokens = tokenize(phrase)
+        if not tokens:
+            return
+        if source == 'keyword':
+            self.builtin.add(' '.join(tokens))
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        # One payload per phrase: a higher-ranked source replaces a lower one
+        current = node.get(None)
+        if current is None or RANKS[source] >= current[1]:
+            node[None] = (category, RANKS[source])
+
+    # --- classification ------------------------------------------------------------------
+
+    def classify(self, text, default=DEFAULT_CATEGORY):
+        """Category for a description or utterance (default when nothing matches)"""
+        if not text:
+            return default
+        return self._cached(text.lower()) or default
+
+    def _classify(self, text):
+        tokens = TOKEN_PATTERN.findall(text)
+        root = self.root
+        n_tokens = len(tokens)
+        best = None  # (rank, length, -start, category)
+        for start in range(n_tokens):
+            node = root.get(tokens[start])
+            end = start + 1
+            while node is not None:
+                payload = node.get(None)
+                if payload is not None:
+                    candidate = (payload[1], end - start, -start, payload[0])
+                    if best is None or candidate > best:
+                        best = candidate
+                if end == n_tokens:
+                    break
+                node = node.get(tokens[end])
+                end += 1
+        return best[3] if best else None
+
+    def classify_many(self, texts, default=DEFAULT_CATEGORY):
+        return [self.classify(text, default) for text in texts]
+
+    # --- learning ------------------------------------------------------------------------
+
+    def learnable(self, phrase):
+        return bool(phrase) and phrase not in self.builtin
+
+    def learn(self, description, category, source='correction'):
+        """Map a transaction description's merchant key to category from now on; persisted immediately.
+
+        Returns the learned phrase, or None when the key is empty or a built-in keyword.
+        """
+        phrase = merchant_key(description, self.builtin)
+        if not self.learnable(phrase):
+            return None
+        with self._lock:
+            self._remember(phrase, category, source)
+            if self.db is not None:
+                self._save([(phrase, category, source)])
+        return phrase
+
+    def observe(self, text, category):
+        """Note a description whose category we were told (e.g. a bank label); saved by flush()"""
+        phrase = merchant_key(text, self.builtin)
+        if self.learnable(phrase) and self.learned.get(phrase, (None, None))[0] != category:
+            self._pending[phrase] = category
+
+    def flush(self):
+        """Learn and persist observed mappings; corrections are never overridden"""
+        with self._lock:
+            rows = [(phrase, category, 'import') for phrase, category in self._pending.items()
+                    if self.learned.get(phrase, (None, None))[1] != 'correction']
+            self._pending.clear()
+            for phrase, category, source in rows:
+                self._remember(phrase, category, source)
+            if rows and self.db is not None:
+                self._save(rows)
+        return len(rows)
+
+    def discard(self):
+        """Forget observed mappings (the import they came from was rolled back)"""
+        with self._lock:
+            self._pending.clear()
+
+    def _remember(self, phrase, category, source):
+        self.learned[phrase] = (category, source)
+        self._add(phrase, category, source)
+        self._cached.cache_clear()
+
+    def _save(self, rows):
+        conn = self.db.conn
+        with conn:
+            conn.executemany(
+                "INSERT INTO category_mappings (phrase, category, source) VALUES (?, ?, ?) "
+                "ON CONFLICT(phrase) DO UPDATE SET category = excluded.category, source = excluded.source, "
+                "hits = hits + 1",
+                rows)
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+
+_classifier_lock = threading.Lock()
+
+
+def get_classifier(db):
+    """The classifier for a Database, built on first use and kept on it (so it goes when the Database does)"""
+    with _classifier_lock:
+        classifier = db.classifier
+        if classifier is None:
+            classifier = db.classifier = CategoryClassifier(db)
+        return classifier
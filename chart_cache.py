@@ -0,0 +1,109 @@
+# chart_cache.py - Rendered-chart cache keyed by a fingerprint of the data behind each chart
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from Config import app_config
+
+
+def fingerprint(name, data):
+    """Stable digest of a chart name plus the rows/parameters it is drawn from"""
+    return hashlib.sha1(repr((name, data)).encode('utf-8')).hexdigest()[:16]
+
+
+class ChartCache:
+    """Bounded LRU of rendered PNGs; a chart is only re-drawn when its data fingerprint changes.
+
+    Other rendered files (e.g. synthesized speech) can use it with a different extension.
+    """
+
+    def __init__(self, directory=None, max_entries=None, extension='.png'):
+        self.directory = directory or app_config.CHART_CACHE_DIR
+        self.max_entries = max_entries or app_config.CHART_CACHE_SIZE
+        self.extension = extension
+        self.entries = OrderedDict()  # fingerprint key -> path, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """Adopt charts rendered by earlier runs, oldest first, so a restart still hits"""
+        files = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(self.extension) and not filename.startswith('.'):
+                path = os.path.join(self.directory, filename)
+                files.append((os.path.getmtime(path), filename[:-len(self.extension)], path))
+        for _, key, path in sorted(files):
+            self.entries[key] = path
+        self._evict()
+
+    def get(self, name, data):
+        """Cached file for (name, data), or None; counts as a hit or a miss"""
+        key = f"{name}-{fingerprint(name, data)}"
+        with self._lock:
+            path = self.entries.get(key)
+            if path is not None and os.path.exists(path):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return path
+            self.misses += 1
+        return None
+
+    def get_or_render(self, name, data, render):
+        """Return the file for (name, data), calling render(path) only on a miss"""
+        path = self.get(name, data)
+        if path is not None:
+            return path
+
+        key = f"{name}-{fingerprint(name, data)}"
+        path = os.path.join(self.directory, f"{key}{self.extension}")
+        # Render to a private temp file and rename it into place, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{key}-", suffix=self.extension, dir=self.directory)
+        os.close(fd)
+        try:
+            render(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self.entries[key] = path
+            self.entries.move_to_end(key)
+            self._evict()
+        return path
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            _, path = self.entries.popitem(last=False)
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            while self.entries:
+                _, path = self.entries.popitem(last=False)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
@@ -0,0 +1,63 @@
+# database.py - Shared SQLite access layer (one connection per thread, same pragmas everywhere)
+import sqlite3
+import threading
+
+import db_schema
+from Config import app_config
+
+
+class Database:
+    """Owns every connection to one database file: one per thread, created on first use"""
+
+    def __init__(self, path=None):
+        self.path = path or app_config.DATABASE_PATH
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._migrated = False
+        self.classifier = None  # category_classifier.get_classifier() builds it on first use
+
+    @property
+    def conn(self):
+        """The calling thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def _open(self):
+        # check_same_thread=False only so close() can release every thread's connection
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               cached_statements=app_config.DB_CACHED_STATEMENTS)
+        db_schema.apply_pragmas(conn)
+        with self._lock:
+            if not self._migrated:
+                db_schema.migrate(conn)
+                self._migrated = True
+            self._connections.append(conn)
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.conn.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        return self.conn.executemany(sql, rows)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    @property
+    def connection_count(self):
+        return len(self._connections)
+
+    def close(self):
+        """Close every connection this database has handed out"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
@@ -0,0 +1,276 @@
+# db_schema.py - Versioned schema migrations and connection settings for the finance database
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+from ledger_aggregates import REBUILD_STATEMENTS, BUDGET_STATUS_SQL, BUDGET_START_MONTH
+
+CURRENT_MONTH_SQL = "strftime('%Y-%m', 'now', 'localtime')"
+
+
+def _add_to_totals(row):
+    """Trigger body: fold one transaction row (NEW/OLD) into the aggregate tables"""
+    return f'''
+        INSERT INTO type_totals (type, total, count)
+        VALUES (COALESCE({row}.type, 'unknown'), COALESCE({row}.amount, 0), 1)
+        ON CONFLICT(type) DO UPDATE SET total = total + excluded.total, count = count + 1;
+        INSERT INTO category_month_totals (type, category, month, total, count)
+        VALUES (COALESCE({row}.type, 'unknown'), COALESCE({row}.category, 'other'),
+                substr({row}.date, 1, 7), COALESCE({row}.amount, 0), 1)
+        ON CONFLICT(type, category, month) DO UPDATE SET total = total + excluded.total, count = count + 1;
+    '''
+
+
+def _remove_from_totals(row):
+    """Trigger body: take one transaction row (NEW/OLD) back out of the aggregate tables"""
+    return f'''
+        UPDATE type_totals SET total = total - COALESCE({row}.amount, 0), count = count - 1
+        WHERE type = COALESCE({row}.type, 'unknown');
+        UPDATE category_month_totals SET total = total - COALESCE({row}.amount, 0), count = count - 1
+        WHERE type = COALESCE({row}.type, 'unknown') AND category = COALESCE({row}.category, 'other')
+        AND month = substr({row}.date, 1, 7);
+        DELETE FROM category_month_totals
+        WHERE type = COALESCE({row}.type, 'unknown') AND category = COALESCE({row}.category, 'other')
+        AND month = substr({row}.date, 1, 7) AND count <= 0;
+    '''
+
+
+# Each migration runs once, in order, and bumps PRAGMA user_version to its number.
+MIGRATIONS = [
+    (1, [
+        '''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            amount REAL,
+            category TEXT,
+            description TEXT,
+            date TEXT,
+            type TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS budget (
+            category TEXT PRIMARY KEY,
+            monthly_limit REAL,
+            current_spent REAL DEFAULT 0
+        )
+        ''',
+    ]),
+    (2, [
+        # Dates are compared as ISO 'YYYY-MM-DD' text, so strip any time part
+        "UPDATE transactions SET date = substr(date, 1, 10) WHERE length(date) > 10",
+        # Covering indexes: every aggregate query is answered from the index alone
+        "CREATE INDEX IF NOT EXISTS idx_transactions_type_date "
+        "ON transactions(type, date, category, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_type_category "
+        "ON transactions(type, category, date, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_category_date "
+        "ON transactions(category, date, type, amount)",
+        "ANALYZE",
+    ]),
+    (3, [
+        # Materialized aggregates so balance/spending never rescan the ledger
+        '''
+        CREATE TABLE IF NOT EXISTS type_totals (
+            type TEXT PRIMARY KEY,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS category_month_totals (
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            month TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (type, category, month)
+        ) WITHOUT ROWID
+        ''',
+        f"CREATE TRIGGER IF NOT EXISTS trg_transactions_insert AFTER INSERT ON transactions "
+        f"BEGIN {_add_to_totals('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_transactions_delete AFTER DELETE ON transactions "
+        f"BEGIN {_remove_from_totals('OLD')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_transactions_update "
+        f"AFTER UPDATE OF amount, category, date, type ON transactions "
+        f"BEGIN {_remove_from_totals('OLD')} {_add_to_totals('NEW')} END",
+    ] + REBUILD_STATEMENTS),
+    (4, [
+        # Imported statement rows are deduplicated on their natural key
+        "ALTER TABLE transactions ADD COLUMN source TEXT NOT NULL DEFAULT 'manual'",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_import_key "
+        "ON transactions(date, amount, description) WHERE source = 'import'",
+    ]),
+    (5, [
+        # Monthly limits become a history: a limit applies from its month until the next change.
+        # Spending per category and month already lives in category_month_totals.
+        '''
+        CREATE TABLE IF NOT EXISTS budget_limits (
+            category TEXT NOT NULL,
+            effective_month TEXT NOT NULL,
+            monthly_limit REAL NOT NULL,
+            PRIMARY KEY (category, effective_month)
+        ) WITHOUT ROWID
+        ''',
+        f"INSERT OR IGNORE INTO budget_limits (category, effective_month, monthly_limit) "
+        f"SELECT category, '{BUDGET_START_MONTH}', monthly_limit FROM budget WHERE monthly_limit IS NOT NULL",
+        "DROP TABLE budget",
+        # 'budget' is now the current month's status, so existing readers see live numbers
+        f"CREATE VIEW budget AS {BUDGET_STATUS_SQL.format(month=CURRENT_MONTH_SQL)}",
+    ]),
+    (6, [
+        # Merchant phrase -> category, learned from corrections and categorized imports
+        '''
+        CREATE TABLE IF NOT EXISTS category_mappings (
+            phrase TEXT PRIMARY KEY,
+            category TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT 'correction',
+            hits INTEGER NOT NULL DEFAULT 1
+        ) WITHOUT ROWID
+        ''',
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# In WAL mode NORMAL only fsyncs at checkpoints: fine for bulk writes, which can be replayed,
+# but a commit we confirm to the user must survive power loss, so it runs with FULL.
+SYNCHRONOUS_BULK = "PRAGMA synchronous = NORMAL"
+SYNCHRONOUS_DURABLE = "PRAGMA synchronous = FULL"
+
+PRAGMAS = [
+    "PRAGMA busy_timeout = 5000",  # first, so switching a fresh file to WAL waits for other openers
+    "PRAGMA journal_mode = WAL",
+    SYNCHRONOUS_BULK,
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+]
+
+TAX_CATEGORIES = ('charity', 'medical', 'education', 'business')
+
+
+def apply_pragmas(conn):
+    """Per-connection settings: WAL, relaxed fsync and a bigger page cache"""
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+
+
+@contextmanager
+def durable_transaction(conn):
+    """Like `with conn:`, but the commit fsyncs the WAL so it survives power loss.
+
+    SQLite only changes the safety level outside a transaction, so enter this before writing.
+    """
+    conn.execute(SYNCHRONOUS_DURABLE)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.execute(SYNCHRONOUS_BULK)
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION; returns the versions applied.
+
+    Each step takes the write lock (BEGIN IMMEDIATE) and re-reads user_version under it, so
+    connections migrating the same fresh file at once apply every step exactly once.
+    """
+    applied = []
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return applied
+    for version, statements in MIGRATIONS:
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version:
+                conn.commit()  # another connection applied it
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+def connect(path, **kwargs):
+    """Open a connection with the standard pragmas and an up-to-date schema"""
+    conn = sqlite3.connect(path, **kwargs)
+    apply_pragmas(conn)
+    migrate(conn)
+    return conn
+
+
+def month_range(year, month):
+    """Half-open ISO date range [first of month, first of next month)"""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+
+def year_range(year):
+    """Half-open ISO date range [Jan 1, Jan 1 of next year)"""
+    return date(year, 1, 1).isoformat(), date(year + 1, 1, 1).isoformat()
+
+
+def explain_query_plan(conn, sql, params=()):
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def assert_uses_index(conn, sql, params, index_name):
+    """Raise AssertionError unless SQLite plans the query through index_name"""
+    plan = explain_query_plan(conn, sql, params)
+    if not any(index_name in step for step in plan):
+        raise AssertionError(f"Expected {index_name} for query:\n{sql}\nPlan: {plan}")
+    return plan
+
+
+# Hot queries and the index each one must use
+INDEXED_QUERIES = [
+    ("type totals",
+     "SELECT total FROM type_totals WHERE type = ?",
+     ('income',), 'sqlite_autoindex_type_totals'),
+    ("category totals",
+     "SELECT category, total FROM category_month_totals WHERE type = ? AND month = ?",
+     ('expense', '2024-01'), 'PRIMARY KEY'),
+    ("balance",
+     "SELECT SUM(amount) FROM transactions WHERE type = ?",
+     ('income',), 'idx_transactions_type_'),
+    ("spending by category",
+     "SELECT category, SUM(amount) FROM transactions WHERE type = ? GROUP BY category",
+     ('expense',), 'idx_transactions_type_category'),
+    ("monthly report",
+     "SELECT * FROM transactions WHERE type IN ('income', 'expense') AND date >= ? AND date < ?",
+     month_range(2024, 1), 'idx_transactions_type_date'),
+    ("tax summary",
+     "SELECT category, SUM(amount) FROM transactions WHERE type = 'expense' "
+     "AND category IN (?, ?, ?, ?) AND date >= ? AND date < ? GROUP BY category",
+     TAX_CATEGORIES + year_range(2024), 'idx_transactions_type_category'),
+    ("budget limit",
+     "SELECT monthly_limit FROM budget_limits WHERE category = ? AND effective_month <= ? "
+     "ORDER BY effective_month DESC LIMIT 1",
+     ('groceries', '2024-01'), 'PRIMARY KEY'),
+]
+
+
+def verify_query_plans(conn):
+    """Assert every hot query is served by an index; returns {name: plan}"""
+    return {name: assert_uses_index(conn, sql, params, index)
+            for name, sql, params, index in INDEXED_QUERIES}
+
+
+if __name__ == "__main__":
+    from Config import app_config
+
+    conn = connect(app_config.DATABASE_PATH)
+    print(f"Schema version: {get_schema_version(conn)}")
+    for name, plan in verify_query_plans(conn).items():
+        print(f"✅ {name}: {' | '.join(plan)}")
+    conn.close()
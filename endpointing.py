@@ -0,0 +1,111 @@
+# endpointing.py - Energy-based voice activity detection and end-of-utterance detection
+import math
+from array import array
+
+from Config import app_config
+
+SILENCE, SPEECH, END = 'silence', 'speech', 'end'
+
+
+def frame_rms(data):
+    """RMS level of a block of little-endian int16 samples"""
+    samples = array('h', data)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class Endpointer:
+    """Tracks speech/silence over int16 blocks and declares END after enough trailing silence.
+
+    The speech threshold adapts to the room: it is the larger of VAD_MIN_RMS and
+    VAD_NOISE_RATIO times a running estimate of the background level.
+    """
+
+    def __init__(self, sample_rate=None, silence_ms=None, start_ms=None, min_rms=None, noise_ratio=None):
+        self.sample_rate = sample_rate or app_config.SAMPLE_RATE
+        self.silence_ms = app_config.ENDPOINT_SILENCE_MS if silence_ms is None else silence_ms
+        self.start_ms = app_config.SPEECH_START_MS if start_ms is None else start_ms
+        self.min_rms = app_config.VAD_MIN_RMS if min_rms is None else min_rms
+        self.noise_ratio = noise_ratio or app_config.VAD_NOISE_RATIO
+        self.noise_level = None
+        self.reset()
+
+    def reset(self):
+        """Start a new utterance; the noise estimate carries over between turns"""
+        self.state = SILENCE
+        self.voiced_ms = 0.0
+        self.silent_ms = 0.0
+        self.speech_end_at = None
+
+    @property
+    def threshold(self):
+        if self.noise_level is None:
+            return self.min_rms
+        return max(self.min_rms, self.noise_level * self.noise_ratio)
+
+    def feed(self, data, captured_at=None):
+        """Classify one block; returns SILENCE, SPEECH or END (END once per utterance)"""
+        block_ms = len(data) / 2 / self.sample_rate * 1000
+        level = frame_rms(data)
+        voiced = level >= self.threshold
+
+        if not voiced:
+            # Slow-moving background estimate, only updated on non-speech blocks
+            self.noise_level = level if self.noise_level is None else 0.95 * self.noise_level + 0.05 * level
+
+        if self.state == SILENCE:
+            self.voiced_ms = self.voiced_ms + block_ms if voiced else 0.0
+            if self.voiced_ms >= self.start_ms:
+                self.state = SPEECH
+                self.silent_ms = 0.0
+                self.speech_end_at = captured_at
+        elif self.state == SPEECH:
+            if voiced:
+                self.silent_ms = 0.0
+                self.speech_end_at = captured_at  # capture time of the last voiced block
+            else:
+                self.silent_ms += block_ms
+                if self.silent_ms >= self.silence_ms:
+                    self.state = END
+        return self.state
+
+    @property
+    def in_speech(self):
+        return self.state == SPEECH
+
+
+class BargeInDetector:
+    """Decides when the user is talking over our own playback.
+
+    The microphone hears the speaker too, so a VAD hit or a partial transcript is not enough.
+    A block only counts when it is BARGE_IN_ENERGY_RATIO times louder than the playback level
+    heard so far (a slowly decaying peak), and BARGE_IN_BLOCKS such blocks are needed in a row.
+    The first BARGE_IN_BLOCKS blocks of each stretch of playback only measure its level.
+    """
+
+    ECHO_DECAY = 0.98  # per block, so the peak follows the playback down between sentences
+
+    def __init__(self, ratio=None, blocks=None, min_rms=None):
+        self.ratio = ratio or app_config.BARGE_IN_ENERGY_RATIO
+        self.blocks = blocks or app_config.BARGE_IN_BLOCKS
+        self.min_rms = app_config.VAD_MIN_RMS if min_rms is None else min_rms
+        self.echo_level = 0.0
+        self.start()
+
+    def start(self):
+        """A new stretch of playback began"""
+        self.loud_blocks = 0
+        self.warmup = self.blocks
+
+    def feed(self, data):
+        """Classify one block captured during playback; True once the user is clearly talking"""
+        level = frame_rms(data)
+        if self.warmup:
+            self.warmup -= 1
+        elif level >= max(self.min_rms, self.echo_level * self.ratio):
+            self.loud_blocks += 1
+            return self.loud_blocks >= self.blocks
+        self.loud_blocks = 0
+        self.echo_level = max(level, self.echo_level * self.ECHO_DECAY)
+        return False
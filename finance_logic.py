@@ -1,42 +1,69 @@
 # finance_logic.py - Financial intelligence
-import sqlite3
 from datetime import datetime
+import db_schema
+import ledger_aggregates
+from database import Database
+from intent_router import default_router
+from amount_parser import parse_amount
+from category_classifier import get_classifier
+from transaction_writer import TransactionWriter
+from Config import app_config
+from tracing import tracer
+
+# chart/report slot -> report_jobs.JOB_TYPES kind
+CHART_JOBS = {
+    'spending': 'spending_chart',
+    'income_expense': 'income_expense_chart',
+    'budget': 'budget_chart',
+    'summary': 'financial_summary',
+}
+REPORT_JOBS = {
+    'monthly': 'monthly_report',
+    'excel': 'excel_export',
+    'parquet': 'parquet_export',
+    'tax': 'tax_summary',
+}
+
+HELP_PROMPT = "I can help with balance, spending, budget, or adding transactions."
+SAVINGS_TIP = "Try saving 20% of your income each month!"
+# Responses that never change; the voice engine renders them to audio ahead of time
+FIXED_RESPONSES = [HELP_PROMPT, SAVINGS_TIP]
 
 
 class FinanceLogic:
-    def __init__(self):
+    def __init__(self, db=None, jobs=None, seed_sample_data=True, background_reports=None):
+        self.router = default_router
+        self.owns_db = db is None
+        self.db = db or Database()
+        self._reporter = None
+        self._visualizer = None
+        self.owns_jobs = jobs is None
+        self._jobs = jobs
+        # Charts/reports go to the job pool (announced later) or run inline (answered in the response)
+        self.background_reports = (app_config.BACKGROUND_REPORTS if background_reports is None
+                                   else background_reports)
+        self._analytics = None
+        self._prepared = None  # (command, IntentMatch) routed speculatively from a partial result
+        self._last_expense = None  # (spoken expense, row) of the last voice expense, for corrections
+        self.announce = print  # how finished background jobs are reported; Main points this at speak()
         self.setup_database()
-        self.setup_sample_data()
+        if seed_sample_data:
+            self.setup_sample_data()
         print("💰 Finance Logic initialized!")
 
-    def setup_database(self):
-        self.conn = sqlite3.connect('data/user_finance.db')
-        self.cursor = self.conn.cursor()
-
-        # Transactions table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY,
-                amount REAL,
-                category TEXT,
-                description TEXT,
-                date TEXT,
-                type TEXT
-            )
-        ''')
-
-        # Budget table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS budget (
-                category TEXT PRIMARY KEY,
-                monthly_limit REAL,
-                current_spent REAL DEFAULT 0
-            )
-        ''')
+    @property
+    def conn(self):
+        return self.db.conn
 
-        self.conn.commit()
+    def setup_database(self):
+        # Schema and pragmas are handled by the shared Database on first connection
+        self.writer = TransactionWriter(self.db)
 
     def setup_sample_data(self):
+        # Seed an empty ledger only; re-running the inserts would duplicate rows on every start
+        if self.conn.execute('SELECT 1 FROM transactions LIMIT 1').fetchone():
+            return
+
         # Sample transactions
         sample_data = [
             (3000.00, 'salary', 'Monthly Salary', '2024-01-15', 'income'),
@@ -44,200 +71,296 @@ class FinanceLogic:
             (150.00, 'groceries', 'Weekly Shopping', '2024-01-05', 'expense')
         ]
 
-        self.cursor.executemany(
-            'INSERT OR IGNORE INTO transactions VALUES (NULL, ?, ?, ?, ?, ?)',
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO transactions (amount, category, description, date, type) VALUES (?, ?, ?, ?, ?)',
             sample_data
         )
 
-        # Sample budget
+        self.conn.commit()
+
+        # Sample budget (spent amounts come from the ledger)
         sample_budget = [
-            ('groceries', 400.0, 150.0),
-            ('entertainment', 200.0, 45.0),
-            ('transport', 150.0, 120.0)
+            ('groceries', 400.0),
+            ('entertainment', 200.0),
+            ('transport', 150.0)
         ]
-        self.cursor.executemany('INSERT OR IGNORE INTO budget VALUES (?, ?, ?)', sample_budget)
-
-        self.conn.commit()
+        for category, limit in sample_budget:
+            ledger_aggregates.set_budget_limit(self.conn, category, limit, ledger_aggregates.BUDGET_START_MONTH)
 
     def process_command(self, command):
         command = command.lower()
         print(f"Processing: {command}")
 
-        if any(word in command for word in ["chart", "graph", "visualize", "show me"]):
-            return self.handle_visualization(command)
-        elif any(word in command for word in ["report", "export", "excel", "pdf", "tax"]):
-            return self.handle_reporting(command)
-
-        # First check for general queries
-        if any(word in command for word in ["balance", "how much", "money left", "my income", "income"]):
-            return self.get_balance()
-        elif any(word in command for word in ["spending", "expenses", "how much have i spent"]):
+        # Answers must reflect anything still sitting in the write buffer
+        with tracer.span('flush'):
+            self.writer.flush()
+        with tracer.span('route'):
+            prepared = self._prepared
+            if prepared is not None and prepared[0] == command:
+                match = prepared[1]
+            else:
+                match = self.router.route(command)
+        self._prepared = None
+
+        with tracer.span(f'handler.{match.intent}'):
+            return self._dispatch(command, match)
+
+    def prepare(self, partial):
+        """Route a stable partial hypothesis ahead of the final result and warm what it will need"""
+        command = partial.lower()
+        match = self.router.route(command)
+        self._prepared = (command, match)
+        if match.intent in ('advice', 'budget') and self._analytics is not None:
+            try:
+                self._analytics.refresh()
+            except Exception as e:
+                print(f"⚠️ Speculative analytics refresh failed: {e}")
+        return match
+
+    def _dispatch(self, command, match):
+        if match.intent == 'visualization':
+            return self.handle_visualization(command, match.slots)
+        elif match.intent == 'reporting':
+            return self.handle_reporting(command, match.slots)
+        elif match.intent == 'spending_query':
             return self.get_spending()
-        # Then check for transaction commands
-        elif any(word in command for word in ["i spent", "i paid", "spent", "paid"]):
+        elif match.intent == 'add_expense':
             return self.process_spending_command(command)
-        elif any(word in command for word in ["i saved", "i earned", "saved", "earned"]):
+        elif match.intent == 'correct_category':
+            return self.correct_category(command)
+        elif match.intent == 'add_income':
             return self.process_income_command(command)
-        elif any(word in command for word in ["budget", "limit"]):
+        elif match.intent == 'balance':
+            return self.get_balance()
+        elif match.intent == 'budget':
             return self.get_budget_status()
-        elif any(word in command for word in ["advice", "tip"]):
-            return "Try saving 20% of your income each month!"
+        elif match.intent == 'job_status':
+            return self.jobs.status(self.db.path)
+        elif match.intent == 'cancel_job':
+            return self.cancel_job()
+        elif match.intent == 'debug_stats':
+            return tracer.spoken_summary()
+        elif match.intent == 'advice':
+            return self.get_advice()
         else:
-            return "I can help with balance, spending, budget, or adding transactions."
+            return HELP_PROMPT
 
     def process_spending_command(self, command):
         try:
             print(f"🔍 Processing spending command: {command}")
 
-            # Convert words to numbers (fifty → 50)
-            word_to_number = {
-                'fifty': 50, 'fifteen': 15, 'twenty': 20, 'thirty': 30,
-                'forty': 40, 'sixty': 60, 'seventy': 70, 'eighty': 80,
-                'ninety': 90, 'hundred': 100
-            }
-
-            # Extract amount - look for numbers or number words
-            amount = None
-            words = command.split()
-
-            for i, word in enumerate(words):
-                # Check for number words
-                if word in word_to_number:
-                    amount = word_to_number[word]
-                    break
-                # Check for digits
-                elif word.isdigit():
-                    amount = float(word)
-                    break
-                # Check for numbers with symbols
-                elif any(char.isdigit() for char in word):
-                    # Extract numbers from mixed strings
-                    import re
-                    numbers = re.findall(r'\d+', word)
-                    if numbers:
-                        amount = float(numbers[0])
-                        break
+            # Extract amount - digits, number words, cents and currency markers
+            amount = parse_amount(command)
 
             if amount is None:
                 return "How much did you spend? Please say 'I spent 50 dollars on groceries'"
 
-            # Extract category
-            category = "other"
-            if "grocery" in command or "food" in command:
-                category = "groceries"
-            elif "entertainment" in command or "movie" in command:
-                category = "entertainment"
-            elif "transport" in command or "gas" in command:
-                category = "transport"
-            elif "rent" in command:
-                category = "rent"
+            # Category from keywords, merchants and learned corrections
+            category = self.classifier.classify(command)
 
-            return self.add_transaction(amount, category, "Voice added expense", "expense")
+            row = TransactionWriter.normalize(amount, category, "Voice added expense", "expense")
+            self._last_expense = (command, row)
+            return self.add_transaction(amount, category, "Voice added expense", "expense", date=row[3])
 
         except Exception as e:
             return f"Sorry, I didn't understand. Try 'I spent 50 dollars on groceries'"
 
+    def correct_category(self, command):
+        """'That was medical': move the last spoken expense to the named category and remember the merchant"""
+        if self._last_expense is None:
+            return "There's no recent expense to change"
+        if parse_amount(command) is not None:
+            # "that was 20 dollars ..." is not a category fix; leave the ledger alone
+            return "To change a category just name it, like 'that was medical'"
+        category = self.classifier.classify(command, default=None)
+        if category is None:
+            return "Which category? Say something like 'that was medical'"
+
+        spoken, row = self._last_expense
+        amount, old_category, description, date, type = row
+        self.writer.flush()
+        with db_schema.durable_transaction(self.conn):  # confirmed out loud below
+            self.conn.execute(
+                "UPDATE transactions SET category = ? WHERE id = ("
+                "SELECT MAX(id) FROM transactions WHERE amount = ? AND category = ? AND description = ? "
+                "AND date = ? AND type = ?)",
+                (category, amount, old_category, description, date, type))
+        self._last_expense = (spoken, (amount, category, description, date, type))
+
+        # Learn from the corrected expense's own words ("... at bluebird diner"), never from the correction
+        phrase = self.classifier.learn(spoken, category)
+        if phrase:
+            return f"Got it, ${amount:.2f} moved to {category}. I'll put {phrase} under {category} from now on"
+        return f"Got it, ${amount:.2f} moved to {category}"
+
     def process_income_command(self, command):
         try:
-            # Extract amount - look for $ or numbers
-            if "$" in command:
-                amount_str = command.split("$")[1].split()[0]
-            else:
-                # Look for numbers after "saved" or "earned"
-                words = command.split()
-                for i, word in enumerate(words):
-                    if word in ["saved", "earned"] and i + 1 < len(words):
-                        amount_str = words[i + 1]
-                        break
-                else:
-                    return "How much did you save? Please say 'I saved $100'"
+            amount = parse_amount(command)
+            if amount is None:
+                return "How much did you save? Please say 'I saved $100'"
 
-            amount = float(amount_str)
             return self.add_transaction(amount, "income", "User added income", "income")
 
         except Exception as e:
             return f"Sorry, I didn't understand. Try 'I saved $100'"
 
-    def add_transaction(self, amount, category, description, type):
-        from datetime import datetime
-        date = datetime.now().strftime("%Y-%m-%d")
-
-        self.cursor.execute(
-            'INSERT INTO transactions (amount, category, description, date, type) VALUES (?, ?, ?, ?, ?)',
-            (amount, category, description, date, type)
-        )
-        self.conn.commit()
-        return f"✅ Added {type}: ${amount} for {category}"
-
     def get_balance(self):
-        self.cursor.execute('SELECT SUM(amount) FROM transactions WHERE type="income"')
-        income = self.cursor.fetchone()[0] or 0
-
-        self.cursor.execute('SELECT SUM(amount) FROM transactions WHERE type="expense"')
-        expenses = self.cursor.fetchone()[0] or 0
+        totals = ledger_aggregates.get_type_totals(self.conn)
+        income = totals.get('income') or 0
+        expenses = totals.get('expense') or 0
 
         balance = income - expenses
         return f"Your balance is ${balance:.2f}. Income: ${income:.2f}, Expenses: ${expenses:.2f}"
 
     def get_spending(self):
-        self.cursor.execute('SELECT category, SUM(amount) FROM transactions WHERE type="expense" GROUP BY category')
-        spending = self.cursor.fetchall()
+        spending = ledger_aggregates.get_category_totals(self.conn, 'expense')
 
         response = "Your spending: "
         for category, amount in spending:
             response += f"{category}: ${amount:.2f}. "
         return response
 
-    def get_budget_status(self):
-        self.cursor.execute('SELECT category, monthly_limit, current_spent FROM budget')
-        budget_data = self.cursor.fetchall()
+    def get_budget_status(self, month=None):
+        budget_data = ledger_aggregates.get_budget_status(self.conn, month)
+
+        forecasts = self._forecasts() if month is None else {}
 
         response = "Budget status: "
         for category, limit, spent in budget_data:
             remaining = limit - spent
-            response += f"{category}: ${spent:.2f} of ${limit:.2f}. "
+            response += f"{category}: ${spent:.2f} of ${limit:.2f}"
+            projected = forecasts.get(category, (0.0, 0.0))[1]
+            if projected > limit:
+                response += f", on pace for ${projected:.2f}"
+            response += ". "
         return response
 
-    def add_transaction(self, amount, category, description, type="expense"):
-        from datetime import datetime
-        date = datetime.now().strftime("%Y-%m-%d")
+    def _forecasts(self):
+        try:
+            return self.analytics.forecast_month_end()
+        except ImportError:
+            return {}
 
-        self.cursor.execute(
-            'INSERT INTO transactions (amount, category, description, date, type) VALUES (?, ?, ?, ?, ?)',
-            (amount, category, description, date, type)
-        )
-        self.conn.commit()
+    def get_advice(self):
+        try:
+            analytics = self.analytics
+        except ImportError:
+            return SAVINGS_TIP
+        return analytics.advice(ledger_aggregates.get_budget_status(self.conn))
+
+    @property
+    def classifier(self):
+        """Category classifier shared with statement imports; learned mappings live in this ledger"""
+        return get_classifier(self.db)
+
+    @property
+    def analytics(self):
+        """Spending analytics over this ledger, loaded on first use and topped up incrementally"""
+        if self._analytics is None:
+            from analytics import LedgerAnalytics
+            self._analytics = LedgerAnalytics(self.db)
+        return self._analytics
+
+    def set_budget(self, category, monthly_limit, month=None):
+        """Change a category's monthly limit from this month (or a given 'YYYY-MM') onwards"""
+        ledger_aggregates.set_budget_limit(self.conn, category, monthly_limit, month)
+        return f"Your {category} budget is now ${monthly_limit:.2f} a month"
+
+    def add_transaction(self, amount, category, description, type="expense", date=None, durable=True):
+        """Record one transaction; by default it is committed before the confirmation is returned"""
+        row = TransactionWriter.normalize(amount, category, description, type, date)
+        self.writer.add([row], durable=durable)
         return f"Added {type}: ${amount} for {category} - {description}"
 
-    def handle_visualization(self, command):
-        """Handle visualization requests"""
-        try:
+    def add_transactions(self, transactions, durable=False):
+        """Record many (amount, category, description[, type[, date]]) tuples with group commits"""
+        rows = [TransactionWriter.normalize(*transaction) for transaction in transactions]
+        self.writer.add(rows, durable=durable)
+        return len(rows)
+
+    def flush(self):
+        """Commit any buffered transactions now"""
+        return self.writer.flush()
+
+    @property
+    def reporter(self):
+        """One FinancialReporter per FinanceLogic, sharing its database"""
+        if self._reporter is None:
+            from reporting import FinancialReporter
+            self._reporter = FinancialReporter(self.db)
+        return self._reporter
+
+    @property
+    def visualizer(self):
+        """One FinanceVisualizer per FinanceLogic, sharing its database"""
+        if self._visualizer is None:
             # Import here to avoid circular imports
             from visualization import FinanceVisualizer
-            visualizer = FinanceVisualizer()
+            self._visualizer = FinanceVisualizer(self.db)
+        return self._visualizer
+
+    @property
+    def jobs(self):
+        """Process pool for chart/report jobs (shared if one was passed in), started on the first request"""
+        if self._jobs is None:
+            from report_jobs import JobManager
+            self._jobs = JobManager(self.db.path)
+        return self._jobs
+
+    def submit_job(self, kind):
+        """Start a chart/report job in the background and answer straight away"""
+        job = self.jobs.submit(kind, self.db.path, on_complete=lambda message: self.announce(message))
+        if job is None:
+            return "I'm still working on your other reports. Ask me again when one is ready."
+        return f"I'm building your {job.name}. I'll tell you when it's ready."
+
+    def cancel_job(self):
+        job = self._jobs.cancel(db_path=self.db.path) if self._jobs is not None else None
+        if job is None:
+            return "There's nothing to cancel"
+        return f"Cancelled your {job.name}"
+
+    def close(self):
+        if self._jobs is not None and self.owns_jobs:
+            self._jobs.shutdown()
+        self.writer.close()
+        if self.owns_db:
+            self.db.close()
+
+    def handle_visualization(self, command, slots=None):
+        """Handle visualization requests"""
+        if slots is None:
+            slots = self.router.route(command).slots
+        chart = slots.get('chart')
+
+        if self.background_reports and chart in CHART_JOBS:
+            return self.submit_job(CHART_JOBS[chart])
 
-            if "spending" in command:
+        try:
+            visualizer = self.visualizer
+
+            if chart == 'spending':
                 chart_path = visualizer.create_spending_chart()
                 if chart_path:
                     return f"I created a spending chart! Check '{chart_path}'"
                 else:
                     return "No spending data available for visualization"
 
-            elif "income" in command or "expense" in command:
+            elif chart == 'income_expense':
                 chart_path = visualizer.create_income_expense_chart()
                 if chart_path:
                     return f"I created an income vs expenses chart! Check '{chart_path}'"
                 else:
                     return "No transaction data available"
 
-            elif "budget" in command:
+            elif chart == 'budget':
                 chart_path = visualizer.create_budget_chart()
                 if chart_path:
                     return f"I created a budget chart! Check '{chart_path}'"
                 else:
                     return "No budget data available"
 
-            elif "summary" in command or "report" in command:
+            elif chart == 'summary':
                 chart_path = visualizer.show_financial_summary()
                 if chart_path:
                     return f"I created a comprehensive financial report! Check '{chart_path}'"
@@ -250,35 +373,48 @@ class FinanceLogic:
         except Exception as e:
             return f"Sorry, I couldn't create the visualization: {e}"
 
-    def handle_reporting(self, command):
+    def handle_reporting(self, command, slots=None):
         """Handle reporting requests"""
+        if slots is None:
+            slots = self.router.route(command).slots
+        report = slots.get('report')
+
+        if self.background_reports and report in REPORT_JOBS:
+            return self.submit_job(REPORT_JOBS[report])
+
         try:
-            from reporting import FinancialReporter
-            reporter = FinancialReporter()
+            reporter = self.reporter
 
-            if "monthly report" in command or "month report" in command:
+            if report == 'monthly':
                 filepath, message = reporter.generate_monthly_report()
                 if filepath:
                     return f"{message} File saved: {filepath}"
                 else:
                     return "No data available for monthly report"
 
-            elif "export" in command or "excel" in command:
+            elif report == 'excel':
                 filepath = reporter.export_to_excel()
                 return f"Data exported to Excel! File saved: {filepath}"
 
-            elif "tax" in command or "deduction" in command:
+            elif report == 'parquet':
+                filepath = reporter.export_to_parquet()
+                if filepath:
+                    return f"Transactions exported to Parquet! File saved: {filepath}"
+                else:
+                    return "No transactions to export"
+
+            elif report == 'tax':
                 filepath, message = reporter.generate_tax_summary()
                 if filepath:
                     return f"{message} File saved: {filepath}"
                 else:
                     return "No tax-deductible expenses found"
 
-            elif "report" in command:
-                return "I can generate: monthly reports, Excel exports, or tax summaries"
+            elif report == 'menu':
+                return "I can generate: monthly reports, Excel or Parquet exports, or tax summaries"
 
             else:
-                return "Available reports: monthly report, Excel export, tax summary"
+                return "Available reports: monthly report, Excel export, Parquet export, tax summary"
 
         except Exception as e:
             return f"Sorry, I couldn't generate the report: {e}"
\ No newline at end of file
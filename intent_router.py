@@ -0,0 +1,123 @@
+# intent_router.py - Compiled intent matching for voice commands
+import re
+from collections import namedtuple
+
+# Intent table: (intent, priority, trigger phrases).
+# Higher priority wins; ties go to the longer phrase, then the earlier one.
+INTENT_TABLE = [
+    ('debug_stats', 130, ["debug stats", "debug statistics", "latency stats"]),
+    ('cancel_job', 120, ["cancel", "cancel report", "cancel chart", "stop the report", "stop the chart"]),
+    ('job_status', 110, ["job status", "report status", "chart status", "is my report ready",
+                         "is my chart ready", "is it ready"]),
+    ('visualization', 100, ["chart", "charts", "graph", "graphs", "visualize", "show me"]),
+    ('reporting', 90, ["report", "reports", "export", "excel", "parquet", "pdf", "tax", "taxes"]),
+    ('spending_query', 80, ["how much have i spent", "how much did i spend", "what did i spend",
+                            "spending", "expenses"]),
+    ('add_expense', 70, ["i spent", "i paid", "spent", "paid"]),
+    ('add_income', 70, ["i saved", "i earned", "saved", "earned"]),
+    ('correct_category', 65, ["that was", "that should be", "change that to", "recategorize",
+                              "wrong category"]),
+    ('balance', 60, ["balance", "how much", "money left", "my income", "income"]),
+    ('budget', 50, ["budget", "budgets", "limit"]),
+    ('advice', 40, ["advice", "tip", "tips"]),
+]
+
+# Intents whose phrase only counts at the start of the utterance, after any ANCHOR_FILLERS
+# ("that was medical" is a correction, "i spent 20 on coffee that was great" is not;
+# "cancel the report" cancels a job, "i paid 30 dollars to cancel my gym membership" does not)
+ANCHORED_INTENTS = {'correct_category', 'cancel_job', 'job_status'}
+ANCHOR_FILLERS = frozenset(["please", "ok", "okay", "hey", "um", "uh", "so", "now", "just", "can", "could",
+                            "you", "oh", "no", "wait", "what's", "whats", "what", "tell", "me", "the"])
+
+# Slot table: (slot, value, priority, phrases). The highest priority value per slot is kept.
+SLOT_TABLE = [
+    ('category', 'groceries', 50, ["grocery", "groceries", "food"]),
+    ('category', 'entertainment', 40, ["entertainment", "movie", "movies"]),
+    ('category', 'transport', 30, ["transport", "gas"]),
+    ('category', 'rent', 20, ["rent"]),
+    ('chart', 'spending', 40, ["spending"]),
+    ('chart', 'income_expense', 30, ["income", "expense", "expenses"]),
+    ('chart', 'budget', 20, ["budget"]),
+    ('chart', 'summary', 10, ["summary", "report"]),
+    ('report', 'monthly', 40, ["monthly report", "month report"]),
+    ('report', 'parquet', 35, ["parquet", "arrow"]),
+    ('report', 'excel', 30, ["export", "excel"]),
+    ('report', 'tax', 20, ["tax", "deduction", "deductions"]),
+    ('report', 'menu', 10, ["report"]),
+]
+
+FALLBACK_INTENT = 'fallback'
+
+IntentMatch = namedtuple('IntentMatch', ['intent', 'slots', 'phrase'])
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?|\$?\d[\d,]*(?:\.\d+)?")
+
+
+# route() blanks punctuation with a byte table and splits on whitespace, several times cheaper than
+# the regex; every phrase token is a plain word, and numbers stay in as (never matching) tokens
+PUNCTUATION = b'?!,.;:"()[]{}<>/\\|-_+=*&^%#@~`'
+ROUTE_PUNCTUATION = bytes.maketrans(PUNCTUATION, b' ' * len(PUNCTUATION))
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class IntentRouter:
+    """Phrase index compiled once from the intent and slot tables, keyed by each phrase's first token"""
+
+    def __init__(self, intent_table=INTENT_TABLE, slot_table=SLOT_TABLE, anchored=ANCHORED_INTENTS,
+                 fillers=ANCHOR_FILLERS):
+        self.anchored = frozenset(anchored)
+        self.fillers = frozenset(fillers)
+        # first token -> [(tokens, length, is_intent, name, value, rank, anchored)]
+        self.index = {}
+        for intent, priority, phrases in intent_table:
+            for phrase in phrases:
+                # Priority first, then phrase length; earlier positions win ties in route()
+                self._add(phrase, True, intent, None, priority * 1000, intent in self.anchored)
+        for slot, value, priority, phrases in slot_table:
+            for phrase in phrases:
+                self._add(phrase, False, slot, value, priority, False)
+
+    def _add(self, phrase, is_intent, name, value, rank, anchored):
+        tokens = tokenize(phrase)
+        if is_intent:
+            rank += len(tokens)
+        self.index.setdefault(tokens[0], []).append((tokens, len(tokens), is_intent, name, value, rank, anchored))
+
+    def route(self, text):
+        """Return the best intent and all slots found in a single pass over the tokens"""
+        tokens = text.lower().encode().translate(ROUTE_PUNCTUATION).decode().split()
+        index = self.index
+        # Anchored phrases may start here at the latest: "can you cancel the report"
+        anchor = 0
+        while anchor < len(tokens) and tokens[anchor] in self.fillers:
+            anchor += 1
+        best = None  # (intent, start, length)
+        best_rank = -1
+        slots = {}
+        slot_rank = {}
+
+        for start, token in enumerate(tokens):
+            entries = index.get(token)
+            if entries is None:
+                continue
+            for phrase, length, is_intent, name, value, rank, anchored in entries:
+                if length > 1 and tokens[start:start + length] != phrase:
+                    continue
+                if is_intent:
+                    if rank > best_rank and not (anchored and start > anchor):
+                        best_rank = rank
+                        best = (name, start, length)
+                elif rank > slot_rank.get(name, -1):
+                    slot_rank[name] = rank
+                    slots[name] = value
+
+        if best is None:
+            return IntentMatch(FALLBACK_INTENT, slots, None)
+        name, start, length = best
+        return IntentMatch(name, slots, ' '.join(tokens[start:start + length]))
+
+
+default_router = IntentRouter()
@@ -0,0 +1,150 @@
+# ledger_aggregates.py - Running totals kept current by triggers on the transactions table
+import sys
+from datetime import datetime
+
+# Full recompute of both aggregate tables from the ledger
+REBUILD_STATEMENTS = [
+    "DELETE FROM type_totals",
+    "DELETE FROM category_month_totals",
+    '''
+    INSERT INTO type_totals (type, total, count)
+    SELECT COALESCE(type, 'unknown'), SUM(amount), COUNT(*)
+    FROM transactions GROUP BY 1
+    ''',
+    '''
+    INSERT INTO category_month_totals (type, category, month, total, count)
+    SELECT COALESCE(type, 'unknown'), COALESCE(category, 'other'), substr(date, 1, 7), SUM(amount), COUNT(*)
+    FROM transactions GROUP BY 1, 2, 3
+    ''',
+]
+
+TOLERANCE = 0.005
+
+# Limits recorded with this month apply to every period
+BUDGET_START_MONTH = '0000-00'
+
+# (category, monthly_limit, current_spent) for one month: each category's latest limit at or
+# before the month, and its expense total from category_month_totals. Two key lookups per category.
+BUDGET_STATUS_SQL = '''
+SELECT category, monthly_limit, current_spent FROM (
+    SELECT c.category,
+           (SELECT l.monthly_limit FROM budget_limits l
+            WHERE l.category = c.category AND l.effective_month <= {month}
+            ORDER BY l.effective_month DESC LIMIT 1) AS monthly_limit,
+           COALESCE((SELECT t.total FROM category_month_totals t
+                     WHERE t.type = 'expense' AND t.category = c.category AND t.month = {month}), 0)
+               AS current_spent
+    FROM (SELECT DISTINCT category FROM budget_limits) c
+)
+WHERE monthly_limit > 0
+ORDER BY category
+'''
+
+
+def get_type_totals(conn):
+    """{type: total} for the whole ledger"""
+    return {row[0]: row[1] for row in conn.execute("SELECT type, total FROM type_totals")}
+
+
+def get_type_total(conn, type):
+    row = conn.execute("SELECT total FROM type_totals WHERE type = ?", (type,)).fetchone()
+    return row[0] if row else 0
+
+
+def get_category_totals(conn, type='expense', month=None):
+    """[(category, total)] for one type, optionally restricted to a 'YYYY-MM' month"""
+    if month is None:
+        return conn.execute(
+            "SELECT category, SUM(total) AS total FROM category_month_totals "
+            "WHERE type = ? GROUP BY category HAVING SUM(count) > 0 ORDER BY total DESC",
+            (type,)
+        ).fetchall()
+    return conn.execute(
+        "SELECT category, total FROM category_month_totals "
+        "WHERE type = ? AND month = ? AND count > 0 ORDER BY total DESC",
+        (type, month)
+    ).fetchall()
+
+
+def get_budget_status(conn, month=None):
+    """[(category, monthly_limit, spent)] for a 'YYYY-MM' month (default: this month)"""
+    if month is None:
+        month = datetime.now().strftime('%Y-%m')
+    return conn.execute(BUDGET_STATUS_SQL.format(month='?'), (month, month)).fetchall()
+
+
+def get_budget_history(conn, category):
+    """[(effective_month, monthly_limit)] for one category, oldest first"""
+    return conn.execute(
+        "SELECT effective_month, monthly_limit FROM budget_limits WHERE category = ? ORDER BY effective_month",
+        (category,)
+    ).fetchall()
+
+
+def set_budget_limit(conn, category, monthly_limit, month=None):
+    """Set a category's limit from a 'YYYY-MM' month onwards (default: this month); 0 removes it"""
+    if month is None:
+        month = datetime.now().strftime('%Y-%m')
+    with conn:
+        conn.execute(
+            "INSERT INTO budget_limits (category, effective_month, monthly_limit) VALUES (?, ?, ?) "
+            "ON CONFLICT(category, effective_month) DO UPDATE SET monthly_limit = excluded.monthly_limit",
+            (category, month, monthly_limit)
+        )
+
+
+def rebuild_aggregates(conn):
+    """Recompute every aggregate row from the ledger"""
+    with conn:
+        for statement in REBUILD_STATEMENTS:
+            conn.execute(statement)
+
+
+def verify_aggregates(conn):
+    """Compare the aggregate tables with a full recompute; returns a list of mismatches"""
+    mismatches = []
+
+    expected = {row[0]: (row[1], row[2]) for row in conn.execute(
+        "SELECT COALESCE(type, 'unknown'), SUM(amount), COUNT(*) FROM transactions GROUP BY 1")}
+    actual = {row[0]: (row[1], row[2]) for row in conn.execute(
+        "SELECT type, total, count FROM type_totals WHERE count > 0")}
+    mismatches += _diff('type_totals', expected, actual)
+
+    expected = {row[:3]: (row[3], row[4]) for row in conn.execute(
+        "SELECT COALESCE(type, 'unknown'), COALESCE(category, 'other'), substr(date, 1, 7), "
+        "SUM(amount), COUNT(*) FROM transactions GROUP BY 1, 2, 3")}
+    actual = {row[:3]: (row[3], row[4]) for row in conn.execute(
+        "SELECT type, category, month, total, count FROM category_month_totals WHERE count > 0")}
+    mismatches += _diff('category_month_totals', expected, actual)
+
+    return mismatches
+
+
+def _diff(table, expected, actual):
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        exp_total, exp_count = expected.get(key, (0, 0))
+        act_total, act_count = actual.get(key, (0, 0))
+        if exp_count != act_count or abs((exp_total or 0) - (act_total or 0)) > TOLERANCE:
+            mismatches.append((table, key, (exp_total, exp_count), (act_total, act_count)))
+    return mismatches
+
+
+if __name__ == "__main__":
+    import db_schema
+    from Config import app_config
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'verify'
+    conn = db_schema.connect(app_config.DATABASE_PATH)
+
+    if command == 'rebuild':
+        rebuild_aggregates(conn)
+        print("✅ Aggregates rebuilt")
+
+    problems = verify_aggregates(conn)
+    if problems:
+        for table, key, expected, actual in problems:
+            print(f"❌ {table} {key}: expected {expected}, found {actual}")
+        sys.exit(1)
+    print("✅ Aggregates match the ledger")
+    conn.close()
@@ -0,0 +1,137 @@
+# ledger_generator.py - Seeded synthetic ledgers for benchmarks and demos
+import math
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from Config import app_config
+
+# (category, share of expense rows, median amount, spread, merchants)
+EXPENSE_PROFILE = [
+    ('groceries', 0.30, 45.0, 0.6, ["Whole Foods", "Trader Joe's", "Safeway", "Costco", "Corner Market"]),
+    ('entertainment', 0.15, 25.0, 0.8, ["Netflix", "AMC Theatres", "Spotify", "Steam", "Concert Tickets"]),
+    ('transport', 0.18, 30.0, 0.7, ["Shell", "Chevron", "Uber", "Lyft", "Metro Card"]),
+    ('other', 0.20, 35.0, 0.9, ["Amazon", "Target", "Walmart", "Etsy", "Home Depot"]),
+    ('medical', 0.05, 60.0, 1.0, ["CVS Pharmacy", "Walgreens", "Dental Clinic", "Urgent Care"]),
+    ('education', 0.04, 80.0, 1.0, ["Coursera", "Bookstore", "Udemy", "Community College"]),
+    ('charity', 0.04, 50.0, 0.8, ["Red Cross", "Food Bank", "Local Shelter"]),
+    ('business', 0.04, 120.0, 0.9, ["Office Depot", "AWS", "Zoom", "FedEx"]),
+]
+
+# (description, monthly amount range, day of month)
+MONTHLY_INCOME = [("Monthly Salary", (2500.0, 9000.0), 15)]
+MONTHLY_RENT = ("Apartment Rent", (0.25, 0.4), 1)  # share of salary, day of month
+FREELANCE_CHANCE = 0.3  # per month
+EXPENSES_PER_MONTH = 60  # one household's card swipes; bigger ledgers are more households
+
+
+def generate_ledger(rows, seed=42, start=date(2020, 1, 1), years=4, chunk_size=None):
+    """Yield chunks of exactly `rows` normalized (amount, category, description, date, type) tuples.
+
+    Rows come out in date order. The ledger is that of enough households to make `rows` at
+    EXPENSES_PER_MONTH card expenses each a month over the date range, so income and bills
+    grow with the expenses and the balance stays realistic at any size. Each household gets
+    a salary and rent every month and the odd freelance payment; expenses are spread over
+    every day with per-category lognormal amounts. The monthly rows always come first and
+    the expenses share what is left of `rows`, so even a small ledger has income (only a
+    ledger smaller than its monthly rows is cut short).
+    """
+    rng = random.Random(seed)
+    chunk_size = chunk_size or app_config.IMPORT_CHUNK_SIZE
+    days = max(1, (date(start.year + years, start.month, start.day) - start).days)
+    months = days / 30.44
+    # Each household adds its expenses plus a salary, rent and 0.3 freelance rows a month
+    households = max(1, round(rows / months / (EXPENSES_PER_MONTH + 2 + FREELANCE_CHANCE)))
+
+    categories = [profile[0] for profile in EXPENSE_PROFILE]
+    weights = [profile[1] for profile in EXPENSE_PROFILE]
+    amounts = {profile[0]: (math.log(profile[2]), profile[3]) for profile in EXPENSE_PROFILE}
+    merchants = {profile[0]: profile[4] for profile in EXPENSE_PROFILE}
+    salaries = [round(rng.uniform(*MONTHLY_INCOME[0][1]), 2) for _ in range(households)]
+
+    # Salary, rent and freelance rows for every day that has any
+    fixed = {}
+    day = start
+    for _ in range(days):
+        iso = day.isoformat()
+        today = []
+        for household, salary in enumerate(salaries):
+            if day.day == MONTHLY_INCOME[0][2]:
+                salary = salaries[household] = round(salary * rng.uniform(1.0, 1.004), 2)  # slow raises
+                today.append((salary, 'salary', MONTHLY_INCOME[0][0], iso, 'income'))
+            if day.day == MONTHLY_RENT[2]:
+                today.append((round(salary * rng.uniform(*MONTHLY_RENT[1]), 2), 'rent', MONTHLY_RENT[0], iso,
+                              'expense'))
+            if day.day == 20 and rng.random() < FREELANCE_CHANCE:
+                today.append((round(rng.uniform(200, 1500), 2), 'income', "Freelance Payment", iso, 'income'))
+        if today:
+            fixed[day] = today
+        day += timedelta(days=1)
+    per_day = max(0, rows - sum(len(today) for today in fixed.values())) / days
+
+    # Runs for every row: the random methods are bound once as locals
+    def random_expenses(count, iso, lognormvariate=rng.lognormvariate, choice=rng.choice):
+        expenses = []
+        for category in rng.choices(categories, weights, k=count):
+            mu, sigma = amounts[category]
+            expenses.append((round(lognormvariate(mu, sigma), 2), category, choice(merchants[category]),
+                             iso, 'expense'))
+        return expenses
+
+    chunk = []
+    remaining = rows
+    carry = 0.0
+    day = start
+    for _ in range(days):
+        iso = day.isoformat()
+        carry += per_day
+        count = int(carry)
+        carry -= count
+        chunk.extend(fixed.get(day, ()))
+        chunk.extend(random_expenses(count, iso))
+        if len(chunk) >= remaining:
+            yield chunk[:remaining]
+            return
+        if len(chunk) >= chunk_size:
+            remaining -= len(chunk)
+            yield chunk
+            chunk = []
+        day += timedelta(days=1)
+
+    # Rounding left us short: top up on the last day
+    last_day = (day - timedelta(days=1)).isoformat()
+    chunk.extend(random_expenses(remaining - len(chunk), last_day))
+    if chunk:
+        yield chunk
+
+
+def populate(db, rows, seed=42, start=date(2020, 1, 1), years=4, progress=False):
+    """Write a generated ledger into db with chunked executemany; returns rows/sec"""
+    from transaction_writer import INSERT_SQL
+
+    started = time.perf_counter()
+    written = 0
+    conn = db.conn
+    for chunk in generate_ledger(rows, seed, start, years):
+        conn.executemany(INSERT_SQL, chunk)
+        conn.commit()
+        written += len(chunk)
+        if progress:
+            elapsed = time.perf_counter() - started
+            print(f"  {written:,} / {rows:,} rows ({written / elapsed:,.0f} rows/sec)", end='\r')
+    if progress:
+        print()
+    return written / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    from database import Database
+
+    # python ledger_generator.py ROWS [SEED] [DB_PATH]
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 42
+    database = Database(sys.argv[3] if len(sys.argv) > 3 else None)
+    rate = populate(database, row_count, seed, progress=True)
+    print(f"✅ Generated {row_count:,} transactions into {database.path} ({rate:,.0f} rows/sec)")
+    database.close()
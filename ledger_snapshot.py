@@ -0,0 +1,394 @@
+# ledger_snapshot.py - Columnar, memory-mapped copy of the transactions table for aggregate queries
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from Config import app_config
+
+# One raw little-endian file per column; row i of every column is the same transaction
+COLUMNS = {
+    'id': np.dtype('<i8'),
+    'amount': np.dtype('<f8'),
+    'day': np.dtype('<i4'),       # days since 1970-01-01
+    'category': np.dtype('<i4'),  # index into categories
+    'type': np.dtype('<i1'),      # index into types
+}
+NO_DAY = np.iinfo(np.int32).min  # missing or unparseable date
+NO_MONTH = -1
+
+# NULLs are folded the same way the aggregate triggers fold them; SQLite turns dates into day numbers
+SNAPSHOT_ROWS_SQL = f'''
+SELECT id, COALESCE(amount, 0), COALESCE(CAST(julianday(substr(date, 1, 10)) - 2440587.5 AS INTEGER), {NO_DAY}),
+       COALESCE(category, 'other'), COALESCE(type, 'unknown')
+FROM transactions WHERE id > ? ORDER BY id
+'''
+
+AGGREGATES_SQL = "SELECT type, category, month, total, count FROM category_month_totals WHERE count > 0"
+
+
+def _months(days):
+    """Day numbers -> month numbers (months since 1970-01); NO_MONTH for NO_DAY"""
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    months[days == NO_DAY] = NO_MONTH
+    return months
+
+
+def _month_number(month):
+    """'YYYY-MM' -> months since 1970-01"""
+    try:
+        return (int(month[:4]) - 1970) * 12 + int(month[5:7]) - 1
+    except (TypeError, ValueError):
+        return NO_MONTH
+
+
+def _day_number(iso_date):
+    return int(np.datetime64(iso_date, 'D').astype(np.int64))
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on `path` across processes (report jobs share one snapshot directory)"""
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class LedgerSnapshot:
+    """The ledger as memory-mapped NumPy columns: float64 amounts, int32 days, dictionary-coded
+    category and type. Topped up from the last rowid on every refresh.
+
+    Consistency is checked against category_month_totals (kept exact by triggers): if the
+    per (type, category, month) totals and counts disagree after topping up, a row was
+    edited or deleted and the snapshot is rebuilt. Files are written past the committed
+    row count first and meta.json is replaced last, so a reader never maps a partial row.
+
+    Several processes (report jobs) may share one directory. Refreshes hold a lock file for their
+    whole duration and first catch up with meta.json, so only one process writes at a time and
+    nobody appends to a generation another has replaced. Old generations are unlinked, which
+    leaves any existing read-only mapping of them intact.
+    """
+
+    def __init__(self, db, directory=None, chunk_rows=None):
+        self.db = db
+        self.directory = directory or f"{db.path}.snapshot"
+        self.chunk_rows = chunk_rows or app_config.SNAPSHOT_CHUNK_ROWS
+        self.generation = None
+        self.count = 0
+        self.last_id = 0
+        self.categories, self._category_codes = [], {}
+        self.types, self._type_codes = [], {}
+        self.columns = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+        self.groups = {}  # (type code, category code, month) -> [total, count]
+        self.rebuilds = 0
+        self.loaded = False
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    # --- files ---------------------------------------------------------------------------
+
+    def _path(self, name, generation=None):
+        return os.path.join(self.directory, f"{self.generation if generation is None else generation}.{name}.bin")
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, 'meta.json')
+
+    @property
+    def _lock_path(self):
+        return os.path.join(self.directory, 'lock')
+
+    def _map(self):
+        """Re-map every column read-only over the committed rows"""
+        for name, dtype in COLUMNS.items():
+            if self.count:
+                self.columns[name] = np.memmap(self._path(name), dtype=dtype, mode='r', shape=(self.count,))
+            else:
+                self.columns[name] = np.empty(0, dtype)
+
+    def _write_meta(self):
+        meta = {'generation': self.generation, 'count': self.count, 'last_id': self.last_id,
+                'categories': self.categories, 'types': self.types}
+        tmp_path = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _sync(self):
+        """Catch up with meta.json, as written by an earlier run or another process.
+
+        Rows another process appended to our generation are adopted incrementally; a different
+        generation is adopted whole. False if there is no usable snapshot.
+        """
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            generation, count = meta['generation'], meta['count']
+            if self.loaded and generation == self.generation and count == self.count:
+                return True
+            start = self.count if self.loaded and generation == self.generation and count > self.count else 0
+            self.generation, self.count, self.last_id = generation, count, meta['last_id']
+            self.categories, self.types = meta['categories'], meta['types']
+            self._map()
+        except (OSError, ValueError, KeyError):
+            return False
+        # Names are only ever appended within a generation, so existing codes keep their meaning
+        self._category_codes = {name: code for code, name in enumerate(self.categories)}
+        self._type_codes = {name: code for code, name in enumerate(self.types)}
+        if start == 0:
+            self.groups = {}
+        self._add_groups(start, self.count)
+        return True
+
+    # --- refresh -------------------------------------------------------------------------
+
+    def refresh(self):
+        """Append rows added since the last refresh; rebuild if SQLite no longer agrees"""
+        with self._lock, _file_lock(self._lock_path):
+            conn = self.db.conn
+            # One read transaction, so new rows and the aggregates come from the same state
+            began = not conn.in_transaction
+            if began:
+                conn.execute('BEGIN')
+            try:
+                self.loaded = self._sync()
+                max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+                if not self.loaded or max_id < self.last_id:
+                    self._rebuild(conn)
+                    return
+                if max_id > self.last_id:
+                    self._append(conn)
+                if not self._consistent(conn):
+                    self._rebuild(conn)
+            finally:
+                if began:
+                    conn.rollback()
+
+    def _rebuild(self, conn):
+        """Write a new generation from scratch, then switch meta.json over to it"""
+        old_generation = self.generation
+        # Unique per process, so two processes rebuilding at once never share files
+        self.generation = f"{time.time_ns():x}-{os.getpid()}"
+        self.count, self.last_id = 0, 0
+        self.categories, self._category_codes = [], {}
+        self.types, self._type_codes = [], {}
+        self.groups = {}
+        for name in COLUMNS:
+            open(self._path(name), 'wb').close()
+        self._append(conn)
+        self._map()
+        self._write_meta()
+        self.rebuilds += 1
+        self.loaded = True
+        for name in COLUMNS if old_generation is not None else ():
+            try:
+                os.remove(self._path(name, old_generation))
+            except OSError:
+                pass  # still mapped on Windows
+
+    def _append(self, conn):
+        cursor = conn.execute(SNAPSHOT_ROWS_SQL, (self.last_id,))
+        start = self.count
+        while True:
+            rows = cursor.fetchmany(self.chunk_rows)
+            if not rows:
+                break
+            ids, amounts, days, categories, types = zip(*rows)
+            chunk = {
+                'id': np.array(ids, dtype=COLUMNS['id']),
+                'amount': np.array(amounts, dtype=COLUMNS['amount']),
+                'day': np.array(days, dtype=COLUMNS['day']),
+                'category': self._encode(categories, self.categories, self._category_codes, 'category'),
+                'type': self._encode(types, self.types, self._type_codes, 'type'),
+            }
+            offset = self.count
+            for name, values in chunk.items():
+                with open(self._path(name), 'r+b') as f:
+                    f.seek(offset * COLUMNS[name].itemsize)
+                    f.write(values.astype(COLUMNS[name], copy=False).tobytes())
+            self.count += len(rows)
+            self.last_id = int(ids[-1])
+        if self.count == start:
+            return
+        self._map()
+        self._write_meta()
+        self._add_groups(start, self.count)
+
+    def _add_groups(self, start, end):
+        for key, (total, count) in self._group_totals(start, end).items():
+            group = self.groups.setdefault(key, [0.0, 0])
+            group[0] += total
+            group[1] += count
+
+    @staticmethod
+    def _encode(values, names, codes, column):
+        """Dictionary-encode a chunk of strings, adding unseen ones to names/codes"""
+        unique, inverse = np.unique(np.array(values), return_inverse=True)
+        mapping = np.empty(len(unique), dtype=COLUMNS[column])
+        for i, name in enumerate(unique.tolist()):
+            code = codes.get(name)
+            if code is None:
+                code = codes[name] = len(names)
+                names.append(name)
+            mapping[i] = code
+        return mapping[inverse.ravel()]
+
+    def _group_totals(self, start, end):
+        """{(type, category, month): [total, count]} over rows start..end"""
+        if end <= start:
+            return {}
+        months = _months(self.columns['day'][start:end])
+        low = int(months.min())
+        span = int(months.max()) - low + 1
+        # One dense bin per (type, category, month) combination
+        keys = ((self.columns['type'][start:end].astype(np.int64) * len(self.categories)
+                 + self.columns['category'][start:end]) * span + (months - low))
+        totals = np.bincount(keys, weights=self.columns['amount'][start:end])
+        counts = np.bincount(keys)
+        groups = {}
+        for key in np.flatnonzero(counts):
+            type_category, month = divmod(int(key), span)
+            type_code, category = divmod(type_category, len(self.categories))
+            groups[(type_code, category, month + low)] = [float(totals[key]), int(counts[key])]
+        return groups
+
+    def _consistent(self, conn):
+        expected = {}
+        for type_, category, month, total, count in conn.execute(AGGREGATES_SQL):
+            key = (self._type_codes.get(type_), self._category_codes.get(category), _month_number(month))
+            if None in key:
+                return False
+            expected[key] = (total, count)
+        actual = {key: value for key, value in self.groups.items() if value[1]}
+        if expected.keys() != actual.keys():
+            return False
+        # Both sides are float sums in different orders; allow for rounding on large ledgers
+        return all(actual[key][1] == count and math.isclose(actual[key][0], total, rel_tol=1e-9, abs_tol=0.005)
+                   for key, (total, count) in expected.items())
+
+    # --- queries (views over the mapped columns) -----------------------------------------
+
+    def _mask(self, type=None, start=None, end=None, categories=None):
+        """Boolean row mask; start/end are ISO dates, end exclusive"""
+        mask = np.ones(self.count, dtype=bool)
+        if type is not None:
+            mask &= self.columns['type'] == self._type_codes.get(type, -1)
+        if start is not None:
+            mask &= self.columns['day'] >= _day_number(start)
+        if end is not None:
+            mask &= self.columns['day'] < _day_number(end)
+        if categories is not None:
+            codes = [self._category_codes[c] for c in categories if c in self._category_codes]
+            mask &= np.isin(self.columns['category'], codes)
+        return mask
+
+    def category_totals(self, type='expense', start=None, end=None, categories=None):
+        """{category: total} for one type over [start, end), categories with rows only"""
+        self.refresh()
+        mask = self._mask(type, start, end, categories)
+        codes = self.columns['category'][mask]
+        totals = np.bincount(codes, weights=self.columns['amount'][mask], minlength=len(self.categories))
+        counts = np.bincount(codes, minlength=len(self.categories))
+        return {self.categories[code]: float(totals[code]) for code in sorted(
+            np.flatnonzero(counts), key=lambda code: self.categories[code])}
+
+    def type_totals(self, start=None, end=None):
+        """{type: total} over [start, end)"""
+        self.refresh()
+        mask = self._mask(start=start, end=end)
+        codes = self.columns['type'][mask].astype(np.int64)
+        totals = np.bincount(codes, weights=self.columns['amount'][mask], minlength=len(self.types))
+        counts = np.bincount(codes, minlength=len(self.types))
+        return {self.types[code]: float(totals[code]) for code in np.flatnonzero(counts)}
+
+    def monthly_report_data(self, start, end):
+        """_monthly_report_data-shaped dicts for every month with income or expenses in [start, end).
+
+        start/end are (year, month) pairs, end inclusive.
+        """
+        import db_schema
+
+        self.refresh()
+        mask = self._mask(start=db_schema.month_range(*start)[0], end=db_schema.month_range(*end)[1])
+        mask &= np.isin(self.columns['type'], [self._type_codes.get(t, -1) for t in ('income', 'expense')])
+        rows = np.flatnonzero(mask)
+        months = _months(self.columns['day'][rows])
+        income_code, expense_code = self._type_codes.get('income', -1), self._type_codes.get('expense', -1)
+
+        order = np.argsort(months, kind='stable')
+        months, rows = months[order], rows[order]
+        starts = np.flatnonzero(np.diff(months)) + 1
+
+        reports = []
+        for month_number, month_rows in zip(months[np.r_[0, starts]] if len(rows) else [],
+                                            np.split(rows, starts)):
+            month_number = int(month_number)
+            types = self.columns['type'][month_rows]
+            amounts = self.columns['amount'][month_rows]
+            expense_rows = month_rows[types == expense_code]
+            income = float(amounts[types == income_code].sum())
+            expenses = float(self.columns['amount'][expense_rows].sum())
+            categories = self.columns['category'][expense_rows]
+            by_category = np.bincount(categories, weights=self.columns['amount'][expense_rows],
+                                      minlength=len(self.categories))
+            present = np.bincount(categories, minlength=len(self.categories))
+            reports.append({
+                'month': month_number % 12 + 1,
+                'year': 1970 + month_number // 12,
+                'income': income,
+                'expenses': expenses,
+                'balance': income - expenses,
+                'spending_by_category': {self.categories[code]: float(by_category[code]) for code in sorted(
+                    np.flatnonzero(present), key=lambda code: self.categories[code])},
+                'top_expenses': self._top_expenses(expense_rows),
+            })
+        return reports
+
+    def _top_expenses(self, rows, n=5):
+        """Five largest expenses, described from SQLite (text stays out of the snapshot)"""
+        amounts = self.columns['amount'][rows]
+        top = rows[np.argsort(-amounts, kind='stable')[:n]]
+        ids = [int(i) for i in self.columns['id'][top]]
+        if not ids:
+            return []
+        found = {row[0]: row[1:] for row in self.db.conn.execute(
+            f"SELECT id, description, amount, date FROM transactions WHERE id IN ({','.join('?' * len(ids))})",
+            ids)}
+        return [{'description': found[i][0], 'amount': found[i][1], 'date': found[i][2]}
+                for i in ids if i in found]
+
+    def tax_totals(self, start_year, end_year, categories):
+        """{year: [(category, total)]} of expenses in the given categories, years with rows only"""
+        self.refresh()
+        mask = self._mask('expense', f"{start_year}-01-01", f"{end_year + 1}-01-01", categories)
+        rows = np.flatnonzero(mask)
+        years = 1970 + _months(self.columns['day'][rows]) // 12
+        summaries = {}
+        for year in np.unique(years):
+            year_rows = rows[years == year]
+            codes = self.columns['category'][year_rows]
+            totals = np.bincount(codes, weights=self.columns['amount'][year_rows], minlength=len(self.categories))
+            summaries[int(year)] = [(self.categories[code], float(totals[code])) for code in sorted(
+                np.unique(codes), key=lambda code: self.categories[code])]
+        return summaries
+
+    def close(self):
+        self.columns = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+        self.loaded = False
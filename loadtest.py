@@ -0,0 +1,125 @@
+# loadtest.py - Drive service.py with N concurrent users and report throughput and tail latency
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import threading
+import time
+
+COMMANDS = [
+    "what's my balance",
+    "how much did i spend",
+    "show my budget",
+    "i spent 12 dollars on groceries",
+    "i earned 50 dollars",
+    "give me some advice",
+]
+
+
+async def _request(reader, writer, method, path, body=b''):
+    """One request over a keep-alive connection; returns (status, parsed JSON)"""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _user(host, port, user_id, commands, rng, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(commands):
+            body = json.dumps({'text': rng.choice(COMMANDS)}).encode('utf-8')
+            start = time.perf_counter()
+            status, payload = await _request(reader, writer, 'POST', f"/users/{user_id}/command", body)
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, users, commands, seed=42):
+    """Every user opens one connection and sends its commands back to back"""
+    rng = random.Random(seed)
+    latencies, errors = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(_user(host, port, f"user{i}", commands, random.Random(rng.random()), latencies, errors)
+                           for i in range(users)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else 0.0
+
+    return {
+        'users': users,
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': elapsed,
+        'requests_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': latencies[-1] if latencies else 0.0,
+    }
+
+
+def start_local_service(data_dir, background_reports=None):
+    """Run a FinanceService on a free port in a background thread; returns (service, (host, port))"""
+    from service import FinanceService
+
+    service = FinanceService(data_dir=data_dir, background_reports=background_reports)
+    ready = threading.Event()
+    address = []
+
+    def serve():
+        asyncio.run(service.serve(port=0, ready=lambda addr: (address.append(addr), ready.set())))
+
+    threading.Thread(target=serve, name='finance-service', daemon=True).start()
+    if not ready.wait(30):
+        raise RuntimeError("Service did not start")
+    return service, address[0][:2]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the multi-user finance service")
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 10, 50],
+                        help="concurrent users; one run per value")
+    parser.add_argument('--commands', type=int, default=20, help="commands per user")
+    parser.add_argument('--url', help="host:port of a running service (default: start one on a temp dir)")
+    args = parser.parse_args()
+
+    service = None
+    data_dir = None
+    if args.url:
+        host, port = args.url.rsplit(':', 1)
+        port = int(port)
+    else:
+        # Reports would fork chart jobs into background processes; keep the load on the command path
+        data_dir = tempfile.TemporaryDirectory(prefix='finance-load-')
+        service, (host, port) = start_local_service(data_dir.name, background_reports=False)
+
+    try:
+        print(f"{'users':>6} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  errors")
+        for users in args.users:
+            result = asyncio.run(run_load(host, port, users, args.commands))
+            print(f"{result['users']:>6} {result['requests']:>9} {result['requests_per_sec']:>9.1f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{result['max_ms']:>8.1f}  {result['errors'] or '-'}")
+    finally:
+        if service is not None:
+            service.close()
+        if data_dir is not None:
+            data_dir.cleanup()
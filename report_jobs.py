@@ -0,0 +1,173 @@
+# report_jobs.py - Chart and report generation on a process pool, off the voice loop
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from Config import app_config
+from tracing import tracer
+
+# job kind -> (module, class, method, spoken name)
+JOB_TYPES = {
+    'spending_chart': ('visualization', 'FinanceVisualizer', 'create_spending_chart', "spending chart"),
+    'income_expense_chart': ('visualization', 'FinanceVisualizer', 'create_income_expense_chart',
+                             "income vs expenses chart"),
+    'budget_chart': ('visualization', 'FinanceVisualizer', 'create_budget_chart', "budget chart"),
+    'financial_summary': ('visualization', 'FinanceVisualizer', 'show_financial_summary', "financial summary"),
+    'monthly_report': ('reporting', 'FinancialReporter', 'generate_monthly_report', "monthly report"),
+    'excel_export': ('reporting', 'FinancialReporter', 'export_to_excel', "Excel export"),
+    'parquet_export': ('reporting', 'FinancialReporter', 'export_to_parquet', "Parquet export"),
+    'tax_summary': ('reporting', 'FinancialReporter', 'generate_tax_summary', "tax summary"),
+}
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+def _init_worker():
+    """Pool initializer: charts are only ever written to files, so use the headless backend"""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+    except ImportError:
+        pass
+
+
+def run_job(kind, db_path):
+    """Runs in a worker process: build the generator on its own connection and call it"""
+    import importlib
+    from database import Database
+
+    module_name, class_name, method_name, _ = JOB_TYPES[kind]
+    db = Database(db_path)
+    generator = getattr(importlib.import_module(module_name), class_name)(db)
+    try:
+        return getattr(generator, method_name)()
+    finally:
+        db.close()
+
+
+class Job:
+    def __init__(self, job_id, kind, db_path, on_complete=None):
+        self.id = job_id
+        self.kind = kind
+        self.db_path = db_path
+        self.on_complete = on_complete
+        self.name = JOB_TYPES[kind][3]
+        self.status = QUEUED
+        self.submitted_at = time.perf_counter()
+        self.result = None
+        self.error = None
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+
+class JobManager:
+    """Submits chart/report jobs to a process pool and announces them when they finish"""
+
+    def __init__(self, db_path=None, max_workers=None, max_pending=None, on_complete=None,
+                 max_pending_per_ledger=None):
+        self.db_path = db_path or app_config.DATABASE_PATH
+        self.max_workers = max_workers or app_config.REPORT_WORKERS
+        self.max_pending = max_pending or app_config.MAX_PENDING_REPORT_JOBS
+        self.max_pending_per_ledger = max_pending_per_ledger or app_config.MAX_PENDING_REPORT_JOBS
+        self.on_complete = on_complete
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn, not fork: the parent holds sqlite connections and audio/TTS threads
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def active_jobs(self, db_path=None):
+        with self._lock:
+            return [job for job in self.jobs.values()
+                    if not job.finished and (db_path is None or job.db_path == db_path)]
+
+    def submit(self, kind, db_path=None, on_complete=None):
+        """Queue a job against db_path (default: the manager's); returns None when a pending-job cap is reached.
+
+        One manager can serve several ledgers: each ledger gets at most max_pending_per_ledger unfinished
+        jobs, and all of them together max_pending. on_complete overrides the manager's callback for this job.
+        """
+        db_path = db_path or self.db_path
+        with self._lock:
+            pending = [job.db_path for job in self.jobs.values() if not job.finished]
+            if len(pending) >= self.max_pending or pending.count(db_path) >= self.max_pending_per_ledger:
+                return None
+            job = Job(next(self._ids), kind, db_path, on_complete)
+            self.jobs[job.id] = job
+            job.future = self._get_pool().submit(run_job, kind, db_path)
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        return job
+
+    def _finish(self, job, future):
+        with self._lock:
+            if job.status == CANCELLED:
+                return
+            if future.cancelled():
+                job.status = CANCELLED
+                return
+            error = future.exception()
+            if error is not None:
+                job.status, job.error = FAILED, error
+            else:
+                job.status, job.result = DONE, future.result()
+        tracer.record(f'job.{job.kind}', (time.perf_counter() - job.submitted_at) * 1000, job.submitted_at)
+        on_complete = job.on_complete or self.on_complete
+        if on_complete is not None:
+            on_complete(self.describe(job))
+
+    def describe(self, job):
+        """One spoken sentence about a job's state"""
+        if job.status == DONE:
+            result = job.result
+            if isinstance(result, tuple):
+                result = result[0]
+            if result:
+                return f"Your {job.name} is ready! File saved: {result}"
+            return f"There wasn't enough data for your {job.name}"
+        if job.status == FAILED:
+            return f"Sorry, your {job.name} failed: {job.error}"
+        if job.status == CANCELLED:
+            return f"Your {job.name} was cancelled"
+        if job.future is not None and job.future.running():
+            job.status = RUNNING
+        return f"Your {job.name} is still {job.status}"
+
+    def status(self, db_path=None):
+        """Spoken summary of unfinished jobs, or the most recent one (optionally for one ledger)"""
+        active = self.active_jobs(db_path)
+        if active:
+            return " ".join(self.describe(job) for job in active)
+        with self._lock:
+            jobs = [job_id for job_id, job in self.jobs.items() if db_path is None or job.db_path == db_path]
+            if not jobs:
+                return "You don't have any reports or charts in progress"
+            last = self.jobs[max(jobs)]
+        return self.describe(last)
+
+    def cancel(self, job_id=None, db_path=None):
+        """Cancel one job (default: the newest unfinished one); a job already running finishes silently"""
+        active = self.active_jobs(db_path)
+        if job_id is not None:
+            active = [job for job in active if job.id == job_id]
+        if not active:
+            return None
+        job = active[-1]
+        with self._lock:
+            job.future.cancel()
+            job.status = CANCELLED
+        return job
+
+    def shutdown(self, wait=False):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
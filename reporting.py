@@ -1,15 +1,59 @@
 # reporting.py - Professional financial reports
-import pandas as pd
-import sqlite3
 from datetime import datetime
 import os
+import db_schema
+from database import Database
+from Config import app_config
+
+
+# Columns the monthly report actually uses
+MONTHLY_COLUMNS = "date, type, category, description, amount"
+
+# pyarrow type names for ledger columns; anything else is exported as a string
+ARROW_COLUMN_TYPES = {'id': 'int64', 'amount': 'float64'}
 
 
 class FinancialReporter:
-    def __init__(self):
-        self.conn = sqlite3.connect('data/user_finance.db')
+    def __init__(self, db=None, reports_dir=None):
+        self.owns_db = db is None
+        self.db = db or Database()
+        self.reports_dir = reports_dir or app_config.REPORTS_DIR
+        self._snapshot = None
         print("📄 Financial Reporter initialized!")
 
+    @property
+    def snapshot(self):
+        """Columnar snapshot of the ledger, or None when disabled or NumPy is missing"""
+        if self._snapshot is None and app_config.LEDGER_SNAPSHOT:
+            try:
+                from ledger_snapshot import LedgerSnapshot
+            except ImportError:
+                return None
+            self._snapshot = LedgerSnapshot(self.db)
+        return self._snapshot
+
+    def _month_reports(self, start, end):
+        """Report figures for each month from start to end inclusive ((year, month) pairs) that has data"""
+        if self.snapshot is not None:
+            return self.snapshot.monthly_report_data(start, end)
+
+        import pandas as pd
+
+        # Half-open date range so the type/date index is used
+        (start_year, start_month), (end_year, end_month) = start, end
+        query = f"""
+        SELECT {MONTHLY_COLUMNS} FROM transactions 
+        WHERE type IN ('income', 'expense')
+        AND date >= ? AND date < ?
+        """
+        params = (db_schema.month_range(start_year, start_month)[0],
+                  db_schema.month_range(end_year, end_month)[1])
+        df = pd.read_sql_query(query, self.conn, params=params)
+
+        df['period'] = df['date'].str[:7]
+        return [_monthly_report_data(month_df, int(period[5:7]), int(period[:4]))
+                for period, month_df in df.groupby('period', sort=True)]
+
     def generate_monthly_report(self, month=None, year=None):
         """Generate comprehensive monthly report"""
         if month is None:
@@ -17,157 +61,291 @@ class FinancialReporter:
         if year is None:
             year = datetime.now().year
 
-        # Get monthly data
-        query = f"""
-        SELECT * FROM transactions 
-        WHERE strftime('%Y', date) = '{year}' 
-        AND strftime('%m', date) = '{month:02d}'
-        """
-
-        df = pd.read_sql_query(query, self.conn)
-
-        if df.empty:
+        reports = self._month_reports((year, month), (year, month))
+        if not reports:
             return None, "No data for this month"
 
-        # Calculate metrics
-        income = df[df['type'] == 'income']['amount'].sum()
-        expenses = df[df['type'] == 'expense']['amount'].sum()
-        balance = income - expenses
-
-        # Create report content
-        report = {
-            'month': month,
-            'year': year,
-            'income': income,
-            'expenses': expenses,
-            'balance': balance,
-            'transactions': df.to_dict('records'),
-            'spending_by_category': df[df['type'] == 'expense']
-            .groupby('category')['amount'].sum().to_dict(),
-            'top_expenses': df[df['type'] == 'expense']
-            .nlargest(5, 'amount')[['description', 'amount', 'date']].to_dict('records')
-        }
-
         # Generate PDF report
-        pdf_path = self._create_pdf_report(report)
+        pdf_path = write_pdf_report(reports[0], self.reports_dir)
 
         return pdf_path, f"Monthly report for {month}/{year} generated!"
 
-    def _create_pdf_report(self, report_data):
-        """Create PDF report using fpdf"""
-        from fpdf import FPDF
-
-        pdf = FPDF()
-        pdf.add_page()
-
-        # Title
-        pdf.set_font('Arial', 'B', 16)
-        pdf.cell(0, 10, f"Financial Report - {report_data['month']}/{report_data['year']}", 0, 1, 'C')
-        pdf.ln(10)
-
-        # Summary
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, 'Financial Summary', 0, 1)
-        pdf.set_font('Arial', '', 12)
-
-        pdf.cell(0, 8, f"Income: ${report_data['income']:,.2f}", 0, 1)
-        pdf.cell(0, 8, f"Expenses: ${report_data['expenses']:,.2f}", 0, 1)
-        pdf.cell(0, 8, f"Balance: ${report_data['balance']:,.2f}", 0, 1)
-        pdf.ln(10)
+    def generate_monthly_reports(self, start, end, workers=None):
+        """Reports for every month from start to end inclusive ((year, month) pairs).
 
-        # Spending by category
-        if report_data['spending_by_category']:
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 10, 'Spending by Category', 0, 1)
-            pdf.set_font('Arial', '', 12)
-
-            for category, amount in report_data['spending_by_category'].items():
-                pdf.cell(0, 8, f"{category}: ${amount:,.2f}", 0, 1)
-
-        # Save PDF
-        reports_dir = 'data/reports'
-        os.makedirs(reports_dir, exist_ok=True)
-
-        filename = f"financial_report_{report_data['year']}_{report_data['month']:02d}.pdf"
-        filepath = os.path.join(reports_dir, filename)
-        pdf.output(filepath)
+        One pass covers the whole range; the PDFs are written inline, or on a process pool
+        for very long ranges (REPORT_POOL_MIN_REPORTS). Returns {(year, month): pdf_path}.
+        """
+        reports = self._month_reports(start, end)
+        if not reports:
+            return {}
+        paths = self._write_in_parallel(write_pdf_report, reports, workers)
+        return {(report['year'], report['month']): path for report, path in zip(reports, paths)}
+
+    def _write_in_parallel(self, writer, reports, workers=None):
+        """Run writer(report, reports_dir) for each report, on a process pool only when there are
+        enough of them to pay for starting it"""
+        workers = min(workers or app_config.REPORT_WORKERS, os.cpu_count() or 1)
+        dirs = [self.reports_dir] * len(reports)
+        if workers <= 1 or len(reports) < app_config.REPORT_POOL_MIN_REPORTS:
+            return list(map(writer, reports, dirs))
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(reports)),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            return list(pool.map(writer, reports, dirs))
 
-        return filepath
+    def _create_pdf_report(self, report_data):
+        """Create PDF report using fpdf"""
+        return write_pdf_report(report_data, self.reports_dir)
 
     def export_to_excel(self):
-        """Export all data to Excel"""
-        # Load all data
-        transactions = pd.read_sql_query("SELECT * FROM transactions", self.conn)
-        budget = pd.read_sql_query("SELECT * FROM budget", self.conn)
+        """Export all data to Excel, streaming the ledger in chunks (constant memory)"""
+        import xlsxwriter
 
         # Create Excel file
-        reports_dir = 'data/reports'
-        os.makedirs(reports_dir, exist_ok=True)
+        os.makedirs(self.reports_dir, exist_ok=True)
 
         filename = f"financial_data_export_{datetime.now().strftime('%Y%m%d')}.xlsx"
-        filepath = os.path.join(reports_dir, filename)
-
-        with pd.ExcelWriter(filepath, engine='xlsxwriter') as writer:
-            transactions.to_excel(writer, sheet_name='Transactions', index=False)
-            budget.to_excel(writer, sheet_name='Budget', index=False)
-
-            # Add summary sheet
-            summary_data = {
-                'Metric': ['Total Income', 'Total Expenses', 'Net Balance'],
-                'Amount': [
-                    transactions[transactions['type'] == 'income']['amount'].sum(),
-                    transactions[transactions['type'] == 'expense']['amount'].sum(),
-                    transactions[transactions['type'] == 'income']['amount'].sum() -
-                    transactions[transactions['type'] == 'expense']['amount'].sum()
-                ]
-            }
-            summary_df = pd.DataFrame(summary_data)
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
+        filepath = os.path.join(self.reports_dir, filename)
+
+        # constant_memory flushes each row as it is written, so rows must go out in order
+        workbook = xlsxwriter.Workbook(filepath, {'constant_memory': True})
+        try:
+            totals = {'income': 0.0, 'expense': 0.0}
+
+            def add_to_summary(columns, rows):
+                type_col, amount_col = columns.index('type'), columns.index('amount')
+                for row in rows:
+                    if row[type_col] in totals:
+                        totals[row[type_col]] += row[amount_col] or 0
+
+            self._write_sheet(workbook.add_worksheet('Transactions'),
+                              "SELECT * FROM transactions ORDER BY id", add_to_summary)
+            self._write_sheet(workbook.add_worksheet('Budget'), "SELECT * FROM budget")
+
+            # Add summary sheet (totals gathered during the transactions pass)
+            summary = workbook.add_worksheet('Summary')
+            summary.write_row(0, 0, ['Metric', 'Amount'])
+            summary.write_row(1, 0, ['Total Income', totals['income']])
+            summary.write_row(2, 0, ['Total Expenses', totals['expense']])
+            summary.write_row(3, 0, ['Net Balance', totals['income'] - totals['expense']])
+        finally:
+            workbook.close()
 
         return filepath
 
+    def _chunks(self, query):
+        """(column names, generator of row chunks) for a query, EXPORT_CHUNK_ROWS at a time"""
+        cursor = self.conn.execute(query)
+        columns = [description[0] for description in cursor.description]
+
+        def chunks():
+            while True:
+                rows = cursor.fetchmany(app_config.EXPORT_CHUNK_ROWS)
+                if not rows:
+                    return
+                yield rows
+
+        return columns, chunks()
+
+    def _write_sheet(self, worksheet, query, on_chunk=None):
+        columns, chunks = self._chunks(query)
+        worksheet.write_row(0, 0, columns)
+        row_number = 1
+        for rows in chunks:
+            for row in rows:
+                worksheet.write_row(row_number, 0, row)
+                row_number += 1
+            if on_chunk is not None:
+                on_chunk(columns, rows)
+        return row_number - 1
+
+    def export_to_parquet(self):
+        """Export the ledger as a Parquet file for analytics tools, one row group per chunk"""
+        import pyarrow.parquet as pq
+
+        filepath = self._export_path('parquet')
+        writer = None
+        try:
+            for batch in self._arrow_batches("SELECT * FROM transactions ORDER BY id"):
+                if writer is None:
+                    writer = pq.ParquetWriter(filepath, batch.schema)
+                writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        return filepath if writer is not None else None
+
+    def export_to_arrow(self):
+        """Export the ledger as an Arrow IPC (Feather v2) file, streamed in record batches"""
+        import pyarrow as pa
+
+        filepath = self._export_path('arrow')
+        writer = None
+        try:
+            for batch in self._arrow_batches("SELECT * FROM transactions ORDER BY id"):
+                if writer is None:
+                    writer = pa.ipc.new_file(filepath, batch.schema)
+                writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+        return filepath if writer is not None else None
+
+    def _export_path(self, extension):
+        os.makedirs(self.reports_dir, exist_ok=True)
+        filename = f"transactions_export_{datetime.now().strftime('%Y%m%d')}.{extension}"
+        return os.path.join(self.reports_dir, filename)
+
+    def _arrow_batches(self, query):
+        """Yield one pyarrow RecordBatch per chunk, all sharing a fixed schema"""
+        import pyarrow as pa
+
+        columns, chunks = self._chunks(query)
+        schema = pa.schema([(name, getattr(pa, ARROW_COLUMN_TYPES.get(name, 'string'))()) for name in columns])
+        for rows in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
     def generate_tax_summary(self, year=None):
         """Generate tax preparation summary"""
         if year is None:
             year = datetime.now().year
 
-        query = f"""
-        SELECT category, SUM(amount) as total 
+        totals = self._tax_totals(year, year).get(year)
+        if not totals:
+            return None, "No tax-deductible expenses found"
+
+        txt_filepath = write_tax_summary((year, totals), self.reports_dir)
+        return txt_filepath, f"Tax summary for {year} generated!"
+
+    def generate_tax_summaries(self, start_year, end_year):
+        """Tax summaries for every year from start_year to end_year inclusive, from one pass.
+
+        Returns {year: txt_path} for the years that have deductible expenses.
+        """
+        summaries = sorted(self._tax_totals(start_year, end_year).items())
+        # Text files are tiny; a process pool would cost more than it saves
+        return {summary[0]: write_tax_summary(summary, self.reports_dir) for summary in summaries}
+
+    def _tax_totals(self, start_year, end_year):
+        """{year: [(category, total)]} of deductible expenses, years with any only"""
+        if self.snapshot is not None:
+            return self.snapshot.tax_totals(start_year, end_year, db_schema.TAX_CATEGORIES)
+
+        import pandas as pd
+
+        query = """
+        SELECT substr(date, 1, 4) AS year, category, SUM(amount) as total 
         FROM transactions 
         WHERE type = 'expense' 
-        AND strftime('%Y', date) = '{year}'
-        AND category IN ('charity', 'medical', 'education', 'business')
-        GROUP BY category
+        AND category IN (?, ?, ?, ?)
+        AND date >= ? AND date < ?
+        GROUP BY year, category
+        ORDER BY year, category
         """
 
-        df = pd.read_sql_query(query, self.conn)
+        params = db_schema.TAX_CATEGORIES + (db_schema.year_range(start_year)[0],
+                                             db_schema.year_range(end_year)[1])
+        df = pd.read_sql_query(query, self.conn, params=params)
 
-        if df.empty:
-            return None, "No tax-deductible expenses found"
+        return {int(year): list(zip(year_df['category'], year_df['total']))
+                for year, year_df in df.groupby('year', sort=True)}
 
-        # Create tax summary
-        tax_report = f"Tax Summary for {year}\n"
-        tax_report += "=" * 40 + "\n"
-        total_deductions = 0
+    @property
+    def conn(self):
+        return self.db.conn
 
-        for _, row in df.iterrows():
-            tax_report += f"{row['category'].title()}: ${row['total']:,.2f}\n"
-            total_deductions += row['total']
+    def close(self):
+        if self._snapshot is not None:
+            self._snapshot.close()
+        if self.owns_db:
+            self.db.close()
+
+
+def _monthly_report_data(df, month, year):
+    """Summary figures for one month of transactions (plain Python values, so it pickles cheaply)"""
+    expenses_df = df[df['type'] == 'expense']
+    income = float(df.loc[df['type'] == 'income', 'amount'].sum())
+    expenses = float(expenses_df['amount'].sum())
+    return {
+        'month': month,
+        'year': year,
+        'income': income,
+        'expenses': expenses,
+        'balance': income - expenses,
+        'spending_by_category': {category: float(amount) for category, amount
+                                 in expenses_df.groupby('category')['amount'].sum().items()},
+        'top_expenses': expenses_df.nlargest(5, 'amount')[['description', 'amount', 'date']].to_dict('records'),
+    }
+
+
+def write_pdf_report(report_data, reports_dir):
+    """Create PDF report using fpdf"""
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+
+    # Title
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, f"Financial Report - {report_data['month']}/{report_data['year']}", 0, 1, 'C')
+    pdf.ln(10)
+
+    # Summary
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, 'Financial Summary', 0, 1)
+    pdf.set_font('Arial', '', 12)
+
+    pdf.cell(0, 8, f"Income: ${report_data['income']:,.2f}", 0, 1)
+    pdf.cell(0, 8, f"Expenses: ${report_data['expenses']:,.2f}", 0, 1)
+    pdf.cell(0, 8, f"Balance: ${report_data['balance']:,.2f}", 0, 1)
+    pdf.ln(10)
+
+    # Spending by category
+    if report_data['spending_by_category']:
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 10, 'Spending by Category', 0, 1)
+        pdf.set_font('Arial', '', 12)
 
-        tax_report += "=" * 40 + "\n"
-        tax_report += f"Total Deductions: ${total_deductions:,.2f}\n"
+        for category, amount in report_data['spending_by_category'].items():
+            pdf.cell(0, 8, f"{category}: ${amount:,.2f}", 0, 1)
 
-        # Save to file
-        reports_dir = 'data/reports'
-        os.makedirs(reports_dir, exist_ok=True)
+    # Save PDF
+    os.makedirs(reports_dir, exist_ok=True)
 
-        txt_filename = f"tax_summary_{year}.txt"
-        txt_filepath = os.path.join(reports_dir, txt_filename)
+    filename = f"financial_report_{report_data['year']}_{report_data['month']:02d}.pdf"
+    filepath = os.path.join(reports_dir, filename)
+    pdf.output(filepath)
 
-        with open(txt_filepath, 'w') as f:
-            f.write(tax_report)
+    return filepath
 
-        return txt_filepath, f"Tax summary for {year} generated!"
 
-    def close(self):
-        self.conn.close()
\ No newline at end of file
+def write_tax_summary(summary, reports_dir):
+    """Write one year's [(category, total)] deductions as a text summary"""
+    year, totals = summary
+
+    # Create tax summary
+    tax_report = f"Tax Summary for {year}\n"
+    tax_report += "=" * 40 + "\n"
+    total_deductions = 0
+
+    for category, total in totals:
+        tax_report += f"{category.title()}: ${total:,.2f}\n"
+        total_deductions += total
+
+    tax_report += "=" * 40 + "\n"
+    tax_report += f"Total Deductions: ${total_deductions:,.2f}\n"
+
+    # Save to file
+    os.makedirs(reports_dir, exist_ok=True)
+
+    txt_filename = f"tax_summary_{year}.txt"
+    txt_filepath = os.path.join(reports_dir, txt_filename)
+
+    with open(txt_filepath, 'w') as f:
+        f.write(tax_report)
+
+    return txt_filepath
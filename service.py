@@ -0,0 +1,307 @@
+# service.py - Multi-user asyncio HTTP front end for FinanceLogic
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from Config import app_config
+
+USER_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+ROUTE = re.compile(r'^/users/([^/]+)/(command|messages)$')
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class UserSession:
+    """One user's FinanceLogic, its database and the announcements waiting to be collected"""
+
+    def __init__(self, user_id, db_path, jobs, background_reports=None):
+        from database import Database
+        from finance_logic import FinanceLogic
+
+        self.user_id = user_id
+        self.db = Database(db_path)
+        self.messages = deque(maxlen=50)
+        # Real users start with an empty ledger, not the demo salary/rent/budgets
+        self.logic = FinanceLogic(self.db, jobs=jobs, seed_sample_data=False,
+                                  background_reports=background_reports)
+        self.logic.announce = self.messages.append
+        self.lock = asyncio.Lock()  # FinanceLogic handles one command at a time per user
+        self.active = 0  # requests holding this session; guarded by FinanceService._sessions_lock
+
+    def close(self):
+        self.logic.close()
+        self.db.close()
+
+
+class FinanceService:
+    """Routes each user's commands to their own ledger on bounded executors"""
+
+    def __init__(self, data_dir=None, max_users=None, db_workers=None, asr_workers=None, max_queued=None,
+                 background_reports=None):
+        self.data_dir = data_dir or app_config.SERVICE_DATA_DIR
+        self.background_reports = background_reports  # None: app_config.BACKGROUND_REPORTS
+        self.max_users = max_users or app_config.SERVICE_MAX_OPEN_USERS
+        self.max_queued = max_queued or app_config.SERVICE_MAX_QUEUED
+        self.db_pool = ThreadPoolExecutor(max_workers=db_workers or app_config.SERVICE_DB_WORKERS,
+                                          thread_name_prefix='finance-db')
+        self.asr_workers = asr_workers or app_config.SERVICE_ASR_WORKERS
+        self._asr_pool = None
+        self._jobs = None
+        self.sessions = OrderedDict()  # least recently used first
+        self._sessions_lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=10000)
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    # --- resources -----------------------------------------------------------------------
+
+    @property
+    def jobs(self):
+        """One chart/report process pool shared by every user, with a pending-job cap per user's ledger"""
+        if self._jobs is None:
+            from report_jobs import JobManager
+            self._jobs = JobManager(max_pending=app_config.SERVICE_MAX_PENDING_REPORT_JOBS)
+        return self._jobs
+
+    @property
+    def asr_pool(self):
+        if self._asr_pool is None:
+            from batch_transcribe import _init_worker
+            self._asr_pool = ProcessPoolExecutor(max_workers=self.asr_workers, initializer=_init_worker,
+                                                 initargs=(app_config.VOSK_MODEL_PATH,),
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._asr_pool
+
+    def _session(self, user_id):
+        """Open (or reuse) a user's session and hold it until _release(); past max_users the least
+        recently used idle sessions are closed.
+
+        Runs on the database pool, since opening a ledger runs migrations.
+        """
+        with self._sessions_lock:
+            session = self.sessions.get(user_id)
+            if session is not None:
+                self.sessions.move_to_end(user_id)
+                session.active += 1
+                return session
+        session = UserSession(user_id, os.path.join(self.data_dir, f"{user_id}.db"), self.jobs,
+                              self.background_reports)
+        with self._sessions_lock:
+            existing = self.sessions.get(user_id)
+            if existing is not None:
+                existing.active += 1
+            else:
+                session.active += 1
+                self.sessions[user_id] = session
+            evicted = self._evict_idle()
+        if existing is not None:
+            session.close()
+            session = existing
+        for old in evicted:
+            old.close()
+        return session
+
+    def _release(self, session):
+        """End a request's hold on its session; idle sessions past max_users are closed now"""
+        with self._sessions_lock:
+            session.active -= 1
+            evicted = self._evict_idle()
+        for old in evicted:
+            old.close()
+
+    def _evict_idle(self):
+        # Caller holds _sessions_lock. Sessions held by a request are never closed under it;
+        # they are reconsidered when they are released.
+        evicted = []
+        for old in list(self.sessions.values()):
+            if len(self.sessions) <= self.max_users:
+                break
+            if old.active == 0:
+                del self.sessions[old.user_id]
+                evicted.append(old)
+        return evicted
+
+    # --- commands ------------------------------------------------------------------------
+
+    async def handle_command(self, user_id, text=None, audio=None):
+        loop = asyncio.get_running_loop()
+        transcript = text
+        if audio is not None:
+            from batch_transcribe import transcribe_bytes
+            result = await loop.run_in_executor(self.asr_pool, transcribe_bytes, audio, user_id,
+                                                app_config.ASR_GRAMMAR)
+            if result['error']:
+                raise HttpError(400, result['error'])
+            transcript = result['transcript']
+        if not transcript:
+            raise HttpError(400, "No command text")
+
+        session = await loop.run_in_executor(self.db_pool, self._session, user_id)
+        try:
+            async with session.lock:
+                response = await loop.run_in_executor(self.db_pool, session.logic.process_command, transcript)
+        finally:
+            await loop.run_in_executor(self.db_pool, self._release, session)
+        return {'user': user_id, 'transcript': transcript, 'response': response}
+
+    def stats(self):
+        ordered = sorted(self.latencies)
+
+        def percentile(fraction):
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+        return {
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'in_flight': self.in_flight,
+            'open_users': len(self.sessions),
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+        }
+
+    # --- HTTP ----------------------------------------------------------------------------
+
+    async def dispatch(self, method, path, headers, body):
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, self.stats()
+
+        match = ROUTE.match(path)
+        if not match:
+            raise HttpError(404, f"No route for {path}")
+        user_id, action = match.groups()
+        if not USER_ID.match(user_id):
+            raise HttpError(400, "User ids are 1-64 letters, digits, '-' or '_'")
+
+        if action == 'messages':
+            if method != 'GET':
+                raise HttpError(405, "Use GET")
+            session = self.sessions.get(user_id)
+            messages = []
+            while session is not None and session.messages:
+                messages.append(session.messages.popleft())
+            return 200, {'user': user_id, 'messages': messages}
+
+        if method != 'POST':
+            raise HttpError(405, "Use POST")
+        # Backpressure: refuse rather than queue without bound
+        if self.in_flight >= self.max_queued:
+            self.rejected += 1
+            raise HttpError(503, "Too many requests in flight, retry shortly")
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            if headers.get('content-type', '').startswith('audio/'):
+                result = await self.handle_command(user_id, audio=body)
+            else:
+                try:
+                    payload = json.loads(body or b'{}')
+                except ValueError:
+                    payload = None
+                text = payload.get('text') if isinstance(payload, dict) else None
+                if not isinstance(text, str) or not text.strip():
+                    raise HttpError(400, "Expected a JSON body like {\"text\": \"what's my balance\"}")
+                result = await self.handle_command(user_id, text=text.lower())
+        finally:
+            self.in_flight -= 1
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.requests += 1
+        self.latencies.append(elapsed_ms)
+        result['ms'] = elapsed_ms
+        return 200, result
+
+    async def handle_connection(self, reader, writer):
+        """HTTP/1.1 with keep-alive; one request at a time per connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0) or 0)
+                try:
+                    if length > app_config.SERVICE_MAX_BODY_BYTES:
+                        raise HttpError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self.dispatch(method, path.split('?')[0], headers, body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                data = json.dumps(payload).encode('utf-8')
+                writer.write((f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1')
+                             + data)
+                await writer.drain()
+                if not keep_alive or status == 413:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=None, port=None, ready=None):
+        server = await asyncio.start_server(self.handle_connection, host or app_config.SERVICE_HOST,
+                                            port if port is not None else app_config.SERVICE_PORT)
+        address = server.sockets[0].getsockname()
+        print(f"🌐 Finance service listening on http://{address[0]}:{address[1]}")
+        if ready is not None:
+            ready(address)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        with self._sessions_lock:
+            sessions, self.sessions = list(self.sessions.values()), OrderedDict()
+        for session in sessions:
+            session.close()
+        if self._jobs is not None:
+            self._jobs.shutdown()
+        if self._asr_pool is not None:
+            self._asr_pool.shutdown(cancel_futures=True)
+        self.db_pool.shutdown()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python service.py [PORT]
+    service = FinanceService()
+    try:
+        asyncio.run(service.serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else None))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,44 @@
+# startup_profile.py - Import/init timing breakdown for the coach's cold start
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """Records how long each start-up stage took, relative to process start"""
+
+    def __init__(self, started_at=None, enabled=True):
+        self.started_at = started_at or time.perf_counter()
+        self.enabled = enabled
+        self.stages = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                self.stages.append((name, threading.current_thread().name,
+                                    (start - self.started_at) * 1000, (end - start) * 1000))
+
+    def timed_import(self, module_name):
+        with self.stage(f"import {module_name}"):
+            return importlib.import_module(module_name)
+
+    def mark(self, name, at=None):
+        """Record an instant event (e.g. first audio) with zero duration"""
+        at = at or time.perf_counter()
+        with self.lock:
+            self.stages.append((name, threading.current_thread().name, (at - self.started_at) * 1000, 0.0))
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("⏱️ Startup profile (ms since process start)")
+        print(f"  {'stage':<40} {'thread':<16} {'start':>9} {'duration':>9}")
+        for name, thread, start_ms, duration_ms in sorted(self.stages, key=lambda s: s[2]):
+            print(f"  {name:<40} {thread:<16} {start_ms:>9.1f} {duration_ms:>9.1f}")
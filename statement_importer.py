@@ -0,0 +1,231 @@
+# statement_importer.py - Stream bank statements (CSV / OFX / QFX) into the transactions table
+import csv
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+
+from Config import app_config
+from database import Database
+from category_classifier import get_classifier
+
+INSERT_SQL = '''
+    INSERT OR IGNORE INTO transactions (amount, category, description, date, type, source)
+    VALUES (?, ?, ?, ?, ?, 'import')
+'''
+
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%Y/%m/%d', '%d-%b-%Y', '%d %b %Y', '%b %d, %Y', '%Y%m%d']
+
+# Header names seen in common bank exports, lower-cased
+DATE_COLUMNS = ('date', 'transaction date', 'posted date', 'posting date', 'trans. date')
+AMOUNT_COLUMNS = ('amount', 'transaction amount', 'amount (usd)')
+DEBIT_COLUMNS = ('debit', 'withdrawal', 'withdrawals')
+CREDIT_COLUMNS = ('credit', 'deposit', 'deposits')
+DESCRIPTION_COLUMNS = ('description', 'payee', 'name', 'memo', 'details', 'merchant')
+CATEGORY_COLUMNS = ('category', 'type')
+
+# Bank category labels -> our categories
+CATEGORY_MAP = {
+    'groceries': 'groceries', 'grocery': 'groceries', 'food & dining': 'groceries',
+    'supermarkets': 'groceries', 'restaurants': 'groceries',
+    'entertainment': 'entertainment', 'movies & dvds': 'entertainment',
+    'gas & fuel': 'transport', 'gas': 'transport', 'auto & transport': 'transport',
+    'public transportation': 'transport', 'travel': 'transport',
+    'rent': 'rent', 'mortgage & rent': 'rent', 'housing': 'rent',
+    'charity': 'charity', 'charitable giving': 'charity',
+    'medical': 'medical', 'health & fitness': 'medical', 'pharmacy': 'medical',
+    'education': 'education', 'tuition': 'education',
+    'business': 'business', 'business services': 'business',
+}
+
+AMOUNT_CLEANUP = re.compile(r'[$,\s]')
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+@lru_cache(maxsize=4096)
+def normalize_date(value):
+    """Bank date string -> ISO 'YYYY-MM-DD' (None if unparseable)"""
+    value = value.strip()
+    if len(value) >= 8 and value[:8].isdigit():
+        value = value[:8]  # OFX: 20240115120000[-5:EST]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_amount(value):
+    """'$1,250.75', '(45.00)', '-45' -> signed float (None if empty or malformed)"""
+    if value is None:
+        return None
+    value = AMOUNT_CLEANUP.sub('', value)
+    if not value:
+        return None
+    negative = value.startswith('(') and value.endswith(')')
+    if negative:
+        value = value[1:-1]
+    try:
+        amount = float(value)
+    except ValueError:
+        return None
+    return -amount if negative else amount
+
+
+def map_category(label, description, is_income, classifier):
+    if is_income:
+        return 'income'
+    if label:
+        mapped = CATEGORY_MAP.get(label.strip().lower())
+        if mapped:
+            # The bank told us this merchant's category; unlabelled rows from it will follow
+            classifier.observe(description, mapped)
+            return mapped
+    return classifier.classify(description)
+
+
+def _find_column(fieldnames, candidates):
+    lowered = {name.strip().lower(): name for name in fieldnames if name}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def iter_csv(path):
+    """Yield (date, signed_amount, description, category_label) from a CSV export, one row at a time"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        date_col = _find_column(fields, DATE_COLUMNS)
+        amount_col = _find_column(fields, AMOUNT_COLUMNS)
+        debit_col = _find_column(fields, DEBIT_COLUMNS)
+        credit_col = _find_column(fields, CREDIT_COLUMNS)
+        desc_col = _find_column(fields, DESCRIPTION_COLUMNS)
+        category_col = _find_column(fields, CATEGORY_COLUMNS)
+        if date_col is None or (amount_col is None and debit_col is None and credit_col is None):
+            raise ValueError(f"Unrecognized CSV header in {path}: {fields}")
+
+        for row in reader:
+            if amount_col is not None:
+                amount = normalize_amount(row.get(amount_col))
+            else:
+                debit = normalize_amount(row.get(debit_col)) if debit_col else None
+                credit = normalize_amount(row.get(credit_col)) if credit_col else None
+                amount = (credit or 0) - abs(debit or 0)
+            yield (row.get(date_col) or '', amount,
+                   (row.get(desc_col) or '').strip() if desc_col else '',
+                   row.get(category_col) if category_col else None)
+
+
+def _iter_ofx_tags(f, chunk_size=1 << 16):
+    """Stream (closing, tag, value) triples from SGML or XML OFX without reading the whole file"""
+    pending = ''
+    while True:
+        chunk = f.read(chunk_size)
+        pending += chunk
+        # Only parse up to the last '<' - the tag after it may be incomplete
+        cut = len(pending) if not chunk else pending.rfind('<')
+        if cut > 0:
+            for match in OFX_TAG.finditer(pending, 0, cut):
+                yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+            pending = pending[cut:]
+        if not chunk:
+            return
+
+
+def iter_ofx(path):
+    """Yield (date, signed_amount, description, category_label) for each <STMTTRN> in an OFX/QFX file"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        current = None
+        for closing, tag, value in _iter_ofx_tags(f):
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    yield (current.get('DTPOSTED', ''), normalize_amount(current.get('TRNAMT')),
+                           current.get('NAME') or current.get('MEMO') or current.get('PAYEE', ''), None)
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing and value:
+                current[tag] = value
+
+
+def iter_statement(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ofx', '.qfx'):
+        return iter_ofx(path)
+    return iter_csv(path)
+
+
+def import_statement(path, db=None, chunk_size=None, commit_rows=None, progress=True):
+    """Stream one statement file into the ledger; returns an import summary dict"""
+    chunk_size = chunk_size or app_config.IMPORT_CHUNK_SIZE
+    commit_rows = commit_rows or app_config.IMPORT_COMMIT_ROWS
+    owns_db = db is None
+    if owns_db:
+        db = Database()
+    conn = db.conn
+    classifier = get_classifier(db)
+
+    stats = {'file': path, 'read': 0, 'inserted': 0, 'duplicates': 0, 'skipped': 0}
+    start = time.perf_counter()
+    chunk = []
+    uncommitted = 0
+
+    def write_chunk():
+        cursor = conn.executemany(INSERT_SQL, chunk)
+        stats['inserted'] += cursor.rowcount
+        stats['duplicates'] += len(chunk) - cursor.rowcount
+        chunk.clear()
+
+    try:
+        for raw_date, amount, description, label in iter_statement(path):
+            stats['read'] += 1
+            date = normalize_date(raw_date) if raw_date else None
+            if date is None or not amount:
+                stats['skipped'] += 1
+                continue
+
+            is_income = amount > 0
+            chunk.append((abs(amount), map_category(label, description, is_income, classifier), description,
+                          date, 'income' if is_income else 'expense'))
+
+            if len(chunk) >= chunk_size:
+                uncommitted += len(chunk)
+                write_chunk()
+                if uncommitted >= commit_rows:
+                    conn.commit()
+                    uncommitted = 0
+                    if progress:
+                        elapsed = time.perf_counter() - start
+                        print(f"📥 {stats['read']:,} rows read ({stats['read'] / elapsed:,.0f} rows/sec)")
+
+        if chunk:
+            write_chunk()
+        conn.commit()
+        stats['learned'] = classifier.flush()
+    except Exception:
+        conn.rollback()
+        classifier.discard()
+        raise
+    finally:
+        if owns_db:
+            db.close()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['rows_per_sec'] = stats['read'] / stats['seconds'] if stats['seconds'] else 0
+    if progress:
+        print(f"✅ {path}: {stats['inserted']:,} imported, {stats['duplicates']:,} duplicates, "
+              f"{stats['skipped']:,} skipped ({stats['rows_per_sec']:,.0f} rows/sec)")
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python statement_importer.py <statement.csv|.ofx|.qfx> [...]")
+        sys.exit(1)
+    for statement_path in sys.argv[1:]:
+        import_statement(statement_path)
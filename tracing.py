@@ -0,0 +1,111 @@
+# tracing.py - Per-stage latency spans for a voice turn, kept in a ring buffer
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from Config import app_config
+
+
+class _NoSpan:
+    """Shared do-nothing context manager handed out while tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Tracer:
+    """Records (turn, span, start, duration) tuples; a disabled tracer costs one attribute check"""
+
+    def __init__(self, enabled=None, capacity=None):
+        self.enabled = app_config.TRACING if enabled is None else enabled
+        self.spans = deque(maxlen=capacity or app_config.TRACE_BUFFER_SIZE)
+        self.turn = 0
+        self._lock = threading.Lock()
+
+    def begin_turn(self):
+        """Start a new voice turn; later spans are tagged with its number"""
+        self.turn += 1
+        return self.turn
+
+    def span(self, name):
+        if not self.enabled:
+            return _NO_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, start)
+
+    def record(self, name, duration_ms, start=None):
+        """Add a span measured elsewhere (e.g. summed over many audio chunks)"""
+        if not self.enabled:
+            return
+        if start is None:
+            start = time.perf_counter() - duration_ms / 1000
+        entry = (self.turn, name, start, duration_ms,
+                 threading.current_thread().name)
+        with self._lock:
+            self.spans.append(entry)
+
+    def summary(self):
+        """{span: {count, p50_ms, p95_ms, p99_ms, max_ms}} over the buffer"""
+        with self._lock:
+            spans = list(self.spans)
+        durations = {}
+        for _, name, _, duration_ms, _ in spans:
+            durations.setdefault(name, []).append(duration_ms)
+        stats = {}
+        for name, values in durations.items():
+            values.sort()
+            stats[name] = {
+                'count': len(values),
+                'p50_ms': _percentile(values, 0.50),
+                'p95_ms': _percentile(values, 0.95),
+                'p99_ms': _percentile(values, 0.99),
+                'max_ms': values[-1],
+            }
+        return stats
+
+    def spoken_summary(self, names=('listen', 'recognize', 'route', 'execute', 'speak')):
+        """Short sentence with the median and p95 of the main stages"""
+        if not self.enabled:
+            return "Tracing is off. Set TRACING to True in the config to collect latency stats."
+        stats = self.summary()
+        parts = [f"{name} {stats[name]['p50_ms']:.1f} milliseconds median, {stats[name]['p95_ms']:.1f} p95"
+                 for name in names if name in stats]
+        if not parts:
+            return "No latency data yet"
+        return "Latency: " + ". ".join(parts) + "."
+
+    def export_jsonl(self, path):
+        """Write every buffered span as one JSON object per line; returns the number written"""
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, 'w') as f:
+            for turn, name, start, duration_ms, thread in spans:
+                f.write(json.dumps({'turn': turn, 'span': name, 'start': start,
+                                    'duration_ms': round(duration_ms, 3), 'thread': thread}) + "\n")
+        return len(spans)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+tracer = Tracer()
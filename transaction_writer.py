@@ -0,0 +1,101 @@
+# transaction_writer.py - Group-commit write path for the transactions table
+import atexit
+import threading
+import time
+from datetime import datetime
+from Config import app_config
+from db_schema import durable_transaction
+
+INSERT_SQL = 'INSERT INTO transactions (amount, category, description, date, type) VALUES (?, ?, ?, ?, ?)'
+
+
+class TransactionWriter:
+    """Buffers inserts and commits them in groups (size or time threshold)"""
+
+    def __init__(self, db, batch_size=None, flush_interval=None):
+        self.db = db
+        self.batch_size = batch_size or app_config.WRITE_BATCH_SIZE
+        self.flush_interval = app_config.WRITE_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.buffer = []
+        self.lock = threading.RLock()
+        self._wakeup = threading.Condition(self.lock)
+        self._deadline = None
+        self._flusher = None
+        self._closed = False
+        self.rows_written = 0
+        self.commits = 0
+        atexit.register(self.close)
+
+    @staticmethod
+    def normalize(amount, category, description, type="expense", date=None):
+        if date is None:
+            date = datetime.now().strftime("%Y-%m-%d")
+        return (float(amount), category, description, date, type)
+
+    def add(self, rows, durable=False):
+        """Queue normalized rows; with durable=True they are committed before returning"""
+        with self.lock:
+            self.buffer.extend(rows)
+            if durable or len(self.buffer) >= self.batch_size or self.flush_interval <= 0:
+                self.flush(durable)
+            elif self._deadline is None:
+                self._deadline = time.monotonic() + self.flush_interval
+                self._start_flusher()
+                self._wakeup.notify()
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="ledger-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        """Background thread: commit whatever is buffered once its deadline passes"""
+        with self._wakeup:
+            while not self._closed:
+                if self._deadline is None:
+                    self._wakeup.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"❌ Background flush failed: {e}")
+                    self._deadline = None
+
+    def flush(self, durable=False):
+        """Write and commit everything buffered; returns the number of rows committed.
+
+        Group commits are not fsynced (synchronous=NORMAL); durable=True fsyncs this commit,
+        which also makes every earlier commit in the WAL durable.
+        """
+        with self.lock:
+            self._deadline = None
+            if not self.buffer:
+                return 0
+
+            rows = self.buffer
+            self.buffer = []
+            conn = self.db.conn
+            try:
+                with durable_transaction(conn) if durable else conn:
+                    conn.executemany(INSERT_SQL, rows)
+            except Exception:
+                self.buffer = rows + self.buffer
+                raise
+            self.rows_written += len(rows)
+            self.commits += 1
+            return len(rows)
+
+    def close(self):
+        """Flush pending rows and stop the background flusher; safe to call more than once"""
+        with self.lock:
+            self.flush()
+            self._closed = True
+            self._wakeup.notify()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+            self._flusher = None
+        atexit.unregister(self.close)
@@ -0,0 +1,120 @@
+# tts_cache.py - Pre-synthesized speech for fixed and frequently repeated responses
+import multiprocessing
+import threading
+import wave
+from collections import Counter, deque
+
+from Config import app_config
+from chart_cache import ChartCache
+
+# Frames written to the output stream at a time; barge-in is checked between writes
+PLAYBACK_FRAMES = 2048
+
+_render_engine = None  # the render process's own pyttsx3 engine
+
+
+def render_phrase(text, path, voice, rate, volume):
+    """Runs in the render process: synthesize text to a WAV file with that process's own engine"""
+    global _render_engine
+    if _render_engine is None:
+        import pyttsx3
+        _render_engine = pyttsx3.init()
+    if voice is not None:
+        _render_engine.setProperty('voice', voice)
+    _render_engine.setProperty('rate', rate)
+    _render_engine.setProperty('volume', volume)
+    _render_engine.save_to_file(text, path)
+    _render_engine.runAndWait()
+
+
+class SpeechCache:
+    """WAV renderings of spoken text, keyed by the text and the voice settings, with LRU eviction.
+
+    Phrases are queued in `pending` by warm() or once they have been spoken
+    TTS_CACHE_MIN_USES times. They are rendered one at a time in a separate process with its
+    own pyttsx3 engine (one engine cannot be shared between threads), so a response queued
+    during a render never waits for it.
+    """
+
+    def __init__(self, directory=None, max_entries=None, min_uses=None):
+        self.files = ChartCache(directory or app_config.TTS_CACHE_DIR,
+                                max_entries or app_config.TTS_CACHE_SIZE, extension='.wav')
+        self.min_uses = min_uses or app_config.TTS_CACHE_MIN_USES
+        self.voice = None  # id of the pyttsx3 voice in use; part of the key
+        self.uses = Counter()
+        self.pending = deque()
+        self._lock = threading.Lock()
+        self._renderer = None
+
+    def _data(self, text):
+        return (text, self.voice, app_config.VOICE_RATE, app_config.VOICE_VOLUME)
+
+    def lookup(self, text):
+        return self.files.get('speech', self._data(text))
+
+    def warm(self, phrases):
+        """Queue phrases for rendering ahead of their first use"""
+        with self._lock:
+            for text in phrases:
+                if text not in self.pending:
+                    self.pending.append(text)
+
+    def note_spoken(self, text):
+        """Count a synthesized utterance; frequent ones are queued for rendering"""
+        with self._lock:
+            self.uses[text] += 1
+            if self.uses[text] == self.min_uses and text not in self.pending:
+                self.pending.append(text)
+
+    @property
+    def renderer(self):
+        if self._renderer is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._renderer = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return self._renderer
+
+    def render_next(self):
+        """Render one pending phrase in the render process; returns False when nothing is pending"""
+        with self._lock:
+            if not self.pending:
+                return False
+            text = self.pending.popleft()
+
+        def render(path):
+            self.renderer.submit(render_phrase, text, path, self.voice,
+                                 app_config.VOICE_RATE, app_config.VOICE_VOLUME).result()
+
+        self.files.get_or_render('speech', self._data(text), render)
+        return True
+
+    def close(self):
+        if self._renderer is not None:
+            self._renderer.shutdown(cancel_futures=True)
+            self._renderer = None
+
+    def stats(self):
+        # Renders go through the same lookups, so the file cache's hit rate says little here;
+        # cached vs. synthesized playback is counted by the voice engine instead
+        stats = self.files.stats()
+        return {'entries': stats['entries'], 'evictions': stats['evictions'], 'pending': len(self.pending)}
+
+
+def play_wav(path, stop_event, on_start=None):
+    """Play a cached WAV through sounddevice; returns False if stopped early (barge-in)"""
+    import sounddevice as sd
+
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit PCM")
+        with sd.RawOutputStream(samplerate=wav.getframerate(), channels=wav.getnchannels(),
+                                dtype='int16') as stream:
+            first = True
+            while not stop_event.is_set():
+                frames = wav.readframes(PLAYBACK_FRAMES)
+                if not frames:
+                    return True
+                if first and on_start is not None:
+                    on_start()
+                    first = False
+                stream.write(frames)
+    return False
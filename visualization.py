@@ -1,31 +1,52 @@
 # visualization.py - Financial Charts and Graphs
-import matplotlib.pyplot as plt
-import pandas as pd
-import sqlite3
+# matplotlib, pandas and numpy are imported inside the chart methods so that
+# importing this module (and starting the coach) stays cheap.
 import os
 from datetime import datetime
-import numpy as np
+from database import Database
+from chart_cache import ChartCache
+import ledger_aggregates
+
+SPENDING_QUERY = '''
+SELECT category, SUM(total) as total 
+FROM category_month_totals 
+WHERE type = 'expense'
+GROUP BY category
+HAVING SUM(count) > 0
+ORDER BY total DESC
+'''
+
+BUDGET_QUERY = '''
+SELECT category, monthly_limit, current_spent 
+FROM budget
+WHERE monthly_limit > 0
+ORDER BY category
+'''
+
+CHART_DPI = 100
 
 
 class FinanceVisualizer:
-    def __init__(self):
-        self.conn = sqlite3.connect('data/user_finance.db')
+    def __init__(self, db=None, cache=None):
+        self.owns_db = db is None
+        self.db = db or Database()
+        self.cache = cache or ChartCache()
         print("📊 Finance Visualizer initialized!")
 
     def create_spending_chart(self):
         """Create spending by category pie chart"""
-        query = '''
-        SELECT category, SUM(amount) as total 
-        FROM transactions 
-        WHERE type = 'expense'
-        GROUP BY category
-        ORDER BY total DESC
-        '''
+        rows = self.conn.execute(SPENDING_QUERY).fetchall()
+        if not rows:
+            return None
+        return self.cache.get_or_render('spending_chart', (rows, CHART_DPI),
+                                        lambda path: self._render_spending_chart(rows, path))
 
-        df = pd.read_sql_query(query, self.conn)
+    def _render_spending_chart(self, rows, chart_path):
+        import matplotlib.pyplot as plt
+        import pandas as pd
+        import numpy as np
 
-        if df.empty:
-            return None
+        df = pd.DataFrame(rows, columns=['category', 'total'])
 
         plt.figure(figsize=(10, 6))
         colors = plt.cm.Set3(np.arange(len(df)))
@@ -36,24 +57,22 @@ class FinanceVisualizer:
         plt.axis('equal')
 
         # Save chart
-        chart_path = 'data/spending_chart.png'
-        plt.savefig(chart_path, dpi=100, bbox_inches='tight')
+        plt.savefig(chart_path, dpi=CHART_DPI, bbox_inches='tight')
         plt.close()
 
-        return chart_path
-
     def create_income_expense_chart(self):
         """Create income vs expense bar chart"""
-        query = '''
-        SELECT type, SUM(amount) as total 
-        FROM transactions 
-        GROUP BY type
-        '''
+        rows = self.conn.execute("SELECT type, total FROM type_totals WHERE count > 0 ORDER BY type").fetchall()
+        if not rows:
+            return None
+        return self.cache.get_or_render('income_expense_chart', (rows, CHART_DPI),
+                                        lambda path: self._render_income_expense_chart(rows, path))
 
-        df = pd.read_sql_query(query, self.conn)
+    def _render_income_expense_chart(self, rows, chart_path):
+        import matplotlib.pyplot as plt
+        import pandas as pd
 
-        if df.empty:
-            return None
+        df = pd.DataFrame(rows, columns=['type', 'total'])
 
         plt.figure(figsize=(8, 5))
         colors = ['green' if t == 'income' else 'red' for t in df['type']]
@@ -70,30 +89,26 @@ class FinanceVisualizer:
                      f'${height:,.0f}', ha='center', va='bottom')
 
         # Save chart
-        chart_path = 'data/income_expense_chart.png'
-        plt.savefig(chart_path, dpi=100, bbox_inches='tight')
+        plt.savefig(chart_path, dpi=CHART_DPI, bbox_inches='tight')
         plt.close()
 
-        return chart_path
-
     def create_budget_chart(self):
         """Create budget vs actual spending chart"""
-        query_budget = '''
-        SELECT category, monthly_limit, current_spent 
-        FROM budget
-        WHERE monthly_limit > 0
-        '''
-
-        df = pd.read_sql_query(query_budget, self.conn)
-
-        if df.empty:
+        rows = self.conn.execute(BUDGET_QUERY).fetchall()
+        if not rows:
             return None
+        return self.cache.get_or_render('budget_chart', (rows, CHART_DPI),
+                                        lambda path: self._render_budget_chart(rows, path))
 
+    def _render_budget_chart(self, rows, chart_path):
+        import matplotlib.pyplot as plt
+        import pandas as pd
+        import numpy as np
+
+        df = pd.DataFrame(rows, columns=['category', 'monthly_limit', 'current_spent'])
         df['remaining'] = df['monthly_limit'] - df['current_spent']
         df['percentage_used'] = (df['current_spent'] / df['monthly_limit']) * 100
 
-        plt.figure(figsize=(10, 6))
-
         x = np.arange(len(df))
         width = 0.35
 
@@ -117,30 +132,34 @@ class FinanceVisualizer:
                         f'${height:,.0f}', ha='center', va='bottom', fontsize=9)
 
         # Save chart
-        chart_path = 'data/budget_chart.png'
-        plt.savefig(chart_path, dpi=100, bbox_inches='tight')
-        plt.close()
-
-        return chart_path
+        plt.savefig(chart_path, dpi=CHART_DPI, bbox_inches='tight')
+        plt.close(fig)
 
     def show_financial_summary(self):
         """Create comprehensive financial report"""
-        # Get financial data
-        income_query = "SELECT SUM(amount) FROM transactions WHERE type='income'"
-        expense_query = "SELECT SUM(amount) FROM transactions WHERE type='expense'"
+        totals = sorted(ledger_aggregates.get_type_totals(self.conn).items())
+        spending = self.conn.execute(SPENDING_QUERY).fetchall()
+        budget = self.conn.execute(BUDGET_QUERY).fetchall()
+        data = (totals, spending, budget)
+        return self.cache.get_or_render('financial_summary', (data, CHART_DPI),
+                                        lambda path: self._render_financial_summary(data, path))
+
+    def _render_financial_summary(self, data, chart_path):
+        import matplotlib.pyplot as plt
+        import pandas as pd
 
-        income = pd.read_sql_query(income_query, self.conn).iloc[0, 0] or 0
-        expenses = pd.read_sql_query(expense_query, self.conn).iloc[0, 0] or 0
+        # Get financial data
+        type_totals, spending, budget = data
+        totals = dict(type_totals)
+        income = totals.get('income') or 0
+        expenses = totals.get('expense') or 0
         balance = income - expenses
 
         # Create summary figure
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 10))
 
         # Pie chart for spending
-        spending_df = pd.read_sql_query(
-            "SELECT category, SUM(amount) as total FROM transactions WHERE type='expense' GROUP BY category",
-            self.conn
-        )
+        spending_df = pd.DataFrame(spending, columns=['category', 'total'])
         if not spending_df.empty:
             ax1.pie(spending_df['total'], labels=spending_df['category'], autopct='%1.1f%%')
             ax1.set_title('Spending Distribution')
@@ -154,10 +173,7 @@ class FinanceVisualizer:
         ax2.set_ylabel('Amount ($)')
 
         # Budget progress
-        budget_df = pd.read_sql_query(
-            "SELECT category, monthly_limit, current_spent FROM budget WHERE monthly_limit > 0",
-            self.conn
-        )
+        budget_df = pd.DataFrame(budget, columns=['category', 'monthly_limit', 'current_spent'])
         if not budget_df.empty:
             budget_df['percentage'] = (budget_df['current_spent'] / budget_df['monthly_limit']) * 100
             ax3.barh(budget_df['category'], budget_df['percentage'], color='orange')
@@ -172,11 +188,17 @@ class FinanceVisualizer:
         ax4.set_ylabel('Amount ($)')
 
         plt.tight_layout()
-        chart_path = 'data/financial_summary.png'
-        plt.savefig(chart_path, dpi=100, bbox_inches='tight')
-        plt.close()
+        plt.savefig(chart_path, dpi=CHART_DPI, bbox_inches='tight')
+        plt.close(fig)
+
+    def cache_stats(self):
+        """Hit/miss/eviction counters for the rendered-chart cache"""
+        return self.cache.stats()
 
-        return chart_path
+    @property
+    def conn(self):
+        return self.db.conn
 
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        if self.owns_db:
+            self.db.close()
\ No newline at end of file
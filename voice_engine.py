@@ -1,78 +1,458 @@
 # voice_engine.py - Voice system with sounddevice only
-import sounddevice as sd
-import pyttsx3
-import soundfile as sf
-import tempfile
+# pyttsx3, sounddevice and vosk are imported where they are first needed so
+# constructing the engine does not pay for audio/ASR library start-up.
 import os
+import json
+import queue
+import threading
+import time
+from collections import deque
 from Config import app_config
+from tracing import tracer
+from endpointing import Endpointer, BargeInDetector, END
+from tts_cache import SpeechCache, play_wav
+from asr_grammar import grammar_json, make_recognizer, parse_result, needs_fallback, decode_open
+
+
+def _ttfa_summary(timings):
+    ordered = sorted(timings)
+    return {
+        'utterances': len(ordered),
+        'ttfa_avg_ms': sum(ordered) / len(ordered),
+        'ttfa_p50_ms': ordered[len(ordered) // 2],
+        'ttfa_max_ms': ordered[-1],
+    }
 
 
 class VoiceEngine:
     def __init__(self):
         print("🔊 Initializing Voice Engine...")
-        self.tts_engine = pyttsx3.init()
-        self.setup_voice()
+        # Speech output runs on its own worker so speak() never blocks the loop
+        self.tts_engine = None
+        self.speech_queue = queue.Queue()
+        self._pending_speech = 0  # queued or playing utterances; guarded by _speech_lock
+        self._speech_lock = threading.Lock()
+        self._generation = 0  # bumped by cancel_speech(); older utterances are dropped or stopped
+        self._playing_generation = None
+        self.tts_timings = []
+        self.tts_timings_by_source = {'cached': [], 'synthesized': []}
+        self._utterance_queued_at = None
+        self.speech_cache = SpeechCache() if app_config.TTS_CACHE else None
+        self._render_thread = None
+        self._closing = threading.Event()
+        self._stop_playback = threading.Event()
+        self._tts_ready = threading.Event()
+        self._speech_thread = threading.Thread(target=self._speech_worker, name="tts-worker", daemon=True)
+        self.first_audio_at = None
+        self._speech_thread.start()
+
+        # Long-lived recognition session (model, recognizer and mic stream)
+        self.model = None
+        self.recognizer = None
+        self.open_recognizer = None  # only set in grammar mode, for low-confidence fallback
+        self.grammar_fallbacks = 0
+        self.stream = None
+        self.audio_queue = queue.Queue()
+        self._model_lock = threading.Lock()
+        self._preload_thread = None
+        self.model_load_ms = None
+        self.turn_latencies = []
+
+        # Endpointing and speculative routing
+        self.endpointer = Endpointer()
+        self.barge_in = BargeInDetector()
+        self.on_stable_partial = None  # called with a partial hypothesis once it stops changing
+        self.last_speech_end_at = None
+        self.response_latencies = []
         print("✅ Voice Engine ready!")
 
     def setup_voice(self):
         voices = self.tts_engine.getProperty('voices')
         if len(voices) > 1:
             self.tts_engine.setProperty('voice', voices[1].id)
+        if self.speech_cache is not None:
+            self.speech_cache.voice = self.tts_engine.getProperty('voice')
         self.tts_engine.setProperty('rate', app_config.VOICE_RATE)
         self.tts_engine.setProperty('volume', app_config.VOICE_VOLUME)
 
+    @property
+    def is_speaking(self):
+        """True from the moment an utterance is queued until it has finished playing"""
+        return self._pending_speech > 0
+
     def speak(self, text):
+        """Queue text for the speech worker and return immediately"""
         print(f"🤖 AI: {text}")
-        self.tts_engine.say(text)
-        self.tts_engine.runAndWait()
+        with self._speech_lock:
+            self._pending_speech += 1
+            self.speech_queue.put((text, time.perf_counter(), self._generation))
 
-    def listen(self):
-        print("🎤 Speak now! (I'm listening...)")
+    def _speech_worker(self):
+        """Own the pyttsx3 engine and play queued utterances one by one"""
+        try:
+            import pyttsx3
+            self.tts_engine = pyttsx3.init()
+            self.setup_voice()
+            self.tts_engine.connect('started-utterance', self._on_utterance_started)
+            self.tts_engine.connect('started-word', self._on_word_started)
+        except Exception as e:
+            print(f"❌ Speech output unavailable: {e}")
+            self.tts_engine = None
+        finally:
+            self._tts_ready.set()
 
+        cache = self.speech_cache if self.tts_engine is not None else None
+        if cache is not None:
+            self._render_thread = threading.Thread(target=self._render_worker, name="tts-render", daemon=True)
+            self._render_thread.start()
+        while True:
+            item = self.speech_queue.get()
+            try:
+                if item is None:
+                    return
+                text, queued_at, generation = item
+                if self.tts_engine is None or generation != self._generation:
+                    continue  # cancelled before it started
+                started = time.perf_counter()
+                path = cache.lookup(text) if cache is not None else None
+                if path is None or not self._play_cached(path, queued_at, generation):
+                    self._utterance_queued_at = queued_at
+                    self._playing_generation = generation
+                    self.tts_engine.say(text)
+                    self.tts_engine.runAndWait()
+                    if cache is not None:
+                        cache.note_spoken(text)
+                tracer.record('speak.playback', (time.perf_counter() - started) * 1000, started)
+            except Exception as e:
+                print(f"❌ Speech output error: {e}")
+            finally:
+                self._playing_generation = None
+                if item is not None:
+                    with self._speech_lock:
+                        self._pending_speech -= 1
+                self.speech_queue.task_done()
+
+    def _play_cached(self, path, queued_at, generation):
+        """Play a pre-rendered utterance; False if it could not be played (the caller synthesizes instead)"""
+        self._stop_playback.clear()
+        if generation != self._generation:
+            return True  # cancelled while we were looking it up
         try:
-            import sounddevice as sd
-            import json
-            import queue
+            play_wav(path, self._stop_playback,
+                     on_start=lambda: self._record_ttfa((time.perf_counter() - queued_at) * 1000, 'cached'))
+            return True
+        except Exception as e:
+            print(f"⚠️ Cached speech unavailable ({e}), synthesizing instead")
+            return False
+
+    def _render_worker(self):
+        """Render pending cache phrases in the render process, starting each one while nothing is playing"""
+        while not self._closing.wait(0.5):
+            try:
+                while not self.is_speaking and not self._closing.is_set() and self.speech_cache.render_next():
+                    pass
+            except Exception as e:
+                print(f"⚠️ Could not pre-render speech: {e}")
+
+    def warm_speech_cache(self, phrases):
+        """Have fixed phrases rendered to audio in idle time, so they play without synthesis"""
+        if self.speech_cache is not None:
+            self.speech_cache.warm(phrases)
+
+    def _on_word_started(self, name, location, length):
+        # pyttsx3 may only be stopped from its own thread: cancel_speech() leaves it to us
+        if self._playing_generation is not None and self._playing_generation != self._generation:
+            self.tts_engine.stop()
+
+    def _on_utterance_started(self, name):
+        self._on_word_started(name, 0, 0)
+        if self._utterance_queued_at is None:
+            return
+        ttfa_ms = (time.perf_counter() - self._utterance_queued_at) * 1000
+        self._utterance_queued_at = None
+        self._record_ttfa(ttfa_ms, 'synthesized')
+
+    def _record_ttfa(self, ttfa_ms, source):
+        if self.first_audio_at is None:
+            self.first_audio_at = time.perf_counter()
+        self.tts_timings.append(ttfa_ms)
+        self.tts_timings_by_source[source].append(ttfa_ms)
+        tracer.record('speak', ttfa_ms)
+        tracer.record(f'speak.{source}', ttfa_ms)
+        if app_config.TTS_TIMING:
+            print(f"⏱️ Time to first audio: {ttfa_ms:.1f} ms ({source})")
+
+    def wait_until_done(self):
+        """Block until every queued utterance has been spoken"""
+        self.speech_queue.join()
+
+    def cancel_speech(self):
+        """Drop queued utterances and cut off the one currently playing.
+
+        Safe from any thread: the speech worker stops a synthesized utterance itself at its
+        next word, and cached playback checks the stop event between writes.
+        """
+        with self._speech_lock:
+            self._generation += 1
+            while True:
+                try:
+                    item = self.speech_queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.speech_queue.task_done()
+                if item is None:
+                    # Keep the shutdown request for the worker
+                    self.speech_queue.put(None)
+                    break
+                self._pending_speech -= 1
+        self._stop_playback.set()
+
+    def get_tts_stats(self):
+        """Summarize time-to-first-audio for spoken responses, overall and cached vs. synthesized"""
+        if not self.tts_timings:
+            return None
+        stats = _ttfa_summary(self.tts_timings)
+        for source, timings in self.tts_timings_by_source.items():
+            if timings:
+                stats[source] = _ttfa_summary(timings)
+        if self.speech_cache is not None:
+            stats['cache'] = self.speech_cache.stats()
+        return stats
+
+    def preload_model(self, background=True):
+        """Load the speech model ahead of the first listen() call"""
+        if self.model is not None:
+            return
+        if not background:
+            self._ensure_model()
+            return
+
+        def _load():
+            try:
+                self._ensure_model()
+            except Exception as e:
+                print(f"❌ Could not preload speech model: {e}")
+
+        self._preload_thread = threading.Thread(target=_load, name="vosk-preload", daemon=True)
+        self._preload_thread.start()
+
+    def _ensure_model(self):
+        """Load the Vosk model and recognizer once per engine"""
+        with self._model_lock:
+            if self.recognizer is not None:
+                return
+
             import vosk
 
-            # Initialize Vosk model (will download small model)
-            model_path = "vosk-model-small-en-us-0.15"
+            model_path = app_config.VOSK_MODEL_PATH
             if not os.path.exists(model_path):
                 print("📥 Downloading speech model...")
                 import urllib.request
                 import zipfile
-                url = "https://alphacephei.com/vosk/models/vosk-model-small-en-us-0.15.zip"
-                urllib.request.urlretrieve(url, "model.zip")
+                urllib.request.urlretrieve(app_config.VOSK_MODEL_URL, "model.zip")
                 with zipfile.ZipFile("model.zip", 'r') as zip_ref:
                     zip_ref.extractall(".")
                 os.remove("model.zip")
 
-            model = vosk.Model(model_path)
-            recognizer = vosk.KaldiRecognizer(model, 16000)
+            start = time.perf_counter()
+            self.model = vosk.Model(model_path)
+            if app_config.ASR_GRAMMAR:
+                self.recognizer = make_recognizer(self.model, app_config.SAMPLE_RATE, grammar_json())
+                self.open_recognizer = make_recognizer(self.model, app_config.SAMPLE_RATE)
+            else:
+                self.recognizer = make_recognizer(self.model, app_config.SAMPLE_RATE)
+            self.model_load_ms = (time.perf_counter() - start) * 1000
+            print(f"🧠 Speech model loaded in {self.model_load_ms:.0f} ms")
+
+    def _ensure_stream(self):
+        """Open the microphone stream once and keep it running between turns"""
+        if self.stream is not None:
+            return
+        import sounddevice as sd
+
+        def callback(indata, frames, time_info, status):
+            if status:
+                print(status)
+            self.audio_queue.put((time.perf_counter(), bytes(indata)))
 
-            # Record audio
-            q = queue.Queue()
+        self.stream = sd.RawInputStream(samplerate=app_config.SAMPLE_RATE,
+                                        blocksize=app_config.BLOCK_SIZE, dtype='int16',
+                                        channels=1, callback=callback)
+        self.stream.start()
 
-            def callback(indata, frames, time, status):
-                if status:
-                    print(status)
-                q.put(bytes(indata))
+    def _drain_audio_queue(self):
+        """Drop audio captured while we were not listening (e.g. while speaking)"""
+        while True:
+            try:
+                self.audio_queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def listen(self):
+        print("🎤 Speak now! (I'm listening...)")
+        self.last_speech_end_at = None
+
+        try:
+            turn_start = time.perf_counter()
+            self._ensure_model()
+            self._ensure_stream()
+            self._drain_audio_queue()
+            self.recognizer.Reset()
+            setup_ms = (time.perf_counter() - turn_start) * 1000
+            tracer.record('listen.setup', setup_ms, turn_start)
+            capture_ms = decode_ms = 0.0
+            timing = tracer.enabled
 
             print("🔊 Recording... Speak now!")
-            with sd.RawInputStream(samplerate=16000, blocksize=8000, dtype='int16',
-                                   channels=1, callback=callback):
-                rec = []
-                while True:
-                    data = q.get()
-                    if recognizer.AcceptWaveform(data):
-                        result = json.loads(recognizer.Result())
-                        if result['text']:
-                            print(f"👤 You said: {result['text']}")
-                            return result['text'].lower()
-                    rec.append(data)
+            self.endpointer.reset()
+            last_partial, stable_blocks = None, 0
+            utterance = []  # audio since the last result, kept for open-vocabulary fallback
+            playing = barged_in = False
+            playback_blocks = deque(maxlen=app_config.BARGE_IN_BLOCKS)
+            while True:
+                t0 = time.perf_counter() if timing else 0.0
+                captured_at, data = self.audio_queue.get()
+                if timing:
+                    capture_ms += (time.perf_counter() - t0) * 1000
 
+                if self.is_speaking and not barged_in:
+                    # The mic hears our own playback: never decode it, only watch for the user
+                    # clearly talking over it
+                    if not playing:
+                        playing = True
+                        self.barge_in.start()
+                        playback_blocks.clear()
+                    playback_blocks.append((captured_at, data))
+                    if not (app_config.BARGE_IN and self.barge_in.feed(data)):
+                        continue
+                    print("✋ Barge-in detected, stopping playback")
+                    self.cancel_speech()
+                    barged_in = True
+                    blocks = list(playback_blocks)  # the user's first words
+                else:
+                    playing = False
+                    blocks = [(captured_at, data)]
+
+                text = ''
+                for captured_at, data in blocks:
+                    if timing:
+                        t1 = time.perf_counter()
+                        accepted = self.recognizer.AcceptWaveform(data)
+                        decode_ms += (time.perf_counter() - t1) * 1000
+                    else:
+                        accepted = self.recognizer.AcceptWaveform(data)
+                    # The VAD always runs so end-of-speech latency is measured with endpointing off too
+                    vad_state = self.endpointer.feed(data, captured_at)
+                    if self.open_recognizer is not None:
+                        utterance.append(data)
+
+                    if accepted:
+                        text = self._final_text(self.recognizer.Result(), utterance)
+                        utterance = []
+                    else:
+                        partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+                        if partial and partial == last_partial:
+                            stable_blocks += 1
+                            if stable_blocks == app_config.PARTIAL_STABLE_BLOCKS and self.on_stable_partial:
+                                self.on_stable_partial(partial)
+                        else:
+                            last_partial, stable_blocks = partial, 1
+                        if vad_state == END and app_config.ENDPOINTING:
+                            # Trailing silence: don't wait for the recognizer's own end-of-speech timeout
+                            text = self._final_text(self.recognizer.FinalResult(), utterance)
+                            utterance = []
+                            if not text:
+                                self.endpointer.reset()  # it was noise, keep listening
+                    if text:
+                        break
+
+                if text:
+                    tracer.record('listen.capture', capture_ms)
+                    tracer.record('recognize', decode_ms)
+                    self.last_speech_end_at = self.endpointer.speech_end_at
+                    self._record_latency(setup_ms, turn_start, time.perf_counter())
+                    print(f"👤 You said: {text}")
+                    return text.lower()
         except Exception as e:
             print(f"❌ Speech recognition error: {e}")
             print("🔧 Using text input instead...")
             command = input("👤 Type your command: ")
-            return command.lower()
\ No newline at end of file
+            return command.lower()
+
+    def _final_text(self, raw, blocks):
+        """Text of a finished utterance; unsure grammar results are re-decoded with the open vocabulary"""
+        text, confidence = parse_result(raw)
+        if self.open_recognizer is None or not needs_fallback(text, confidence):
+            return text
+        start = time.perf_counter()
+        text, _ = decode_open(self.open_recognizer, blocks)
+        self.grammar_fallbacks += 1
+        tracer.record('recognize.fallback', (time.perf_counter() - start) * 1000, start)
+        return text
+
+    def _record_latency(self, setup_ms, turn_start, result_time):
+        """Keep per-turn timings so the cold-load cost can be checked"""
+        latency = {
+            'setup_ms': setup_ms,
+            'turn_ms': (result_time - turn_start) * 1000,
+        }
+        self.turn_latencies.append(latency)
+        if app_config.SHOW_LISTEN_LATENCY:
+            print(f"⏱️ Listen setup: {setup_ms:.1f} ms (turn {len(self.turn_latencies)})")
+
+    def record_response(self):
+        """Call once the answer to the last utterance is queued: end of speech -> response latency"""
+        if self.last_speech_end_at is None:
+            return None
+        latency_ms = (time.perf_counter() - self.last_speech_end_at) * 1000
+        self.last_speech_end_at = None
+        self.response_latencies.append(latency_ms)
+        tracer.record('end_of_speech_to_response', latency_ms)
+        return latency_ms
+
+    def get_response_latency_stats(self):
+        """Median/p95 end-of-speech to response, labelled with the endpointing mode it was measured in"""
+        if not self.response_latencies:
+            return None
+        ordered = sorted(self.response_latencies)
+        return {
+            'endpointing': app_config.ENDPOINTING,
+            'turns': len(ordered),
+            'median_ms': ordered[len(ordered) // 2],
+            'p95_ms': ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        }
+
+    @property
+    def last_turn_latency(self):
+        return self.turn_latencies[-1] if self.turn_latencies else None
+
+    def get_latency_stats(self):
+        """Summarize listen() setup cost: first turn vs. warm turns"""
+        if not self.turn_latencies:
+            return None
+        setups = [t['setup_ms'] for t in self.turn_latencies]
+        warm = setups[1:]
+        return {
+            'turns': len(setups),
+            'model_load_ms': self.model_load_ms,
+            'first_setup_ms': setups[0],
+            'warm_setup_avg_ms': sum(warm) / len(warm) if warm else None,
+            'warm_setup_max_ms': max(warm) if warm else None,
+        }
+
+    def close(self):
+        """Stop speech output, the microphone stream and release the recognizer"""
+        self.speech_queue.put(None)
+        self._speech_thread.join(timeout=5)
+        self._closing.set()
+        if self._render_thread is not None:
+            self._render_thread.join(timeout=5)
+        if self.speech_cache is not None:
+            self.speech_cache.close()
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        self.recognizer = None
+        self.open_recognizer = None
+        self.model = None
\ No newline at end of file